@@ -8,5 +8,11 @@ classdef MESSAGE_TYPE < uint8
         GUIDANCE_TOGGLE  (6)  % Server->Client: toggle guidance mode on/off
         REQUEST_POSITION (7)  % Server->Client: respond with current ENU position
         POSITION         (8)  % Client->Server: current ENU position (3 doubles)
+        GUIDANCE_STREAM  (9)  % Server->Client: toggle streaming guidance (unACKed targets) on/off
+        TELEMETRY_RATE   (10) % Server->Client: push TELEMETRY at this rate in Hz (1 double, 0 = off)
+        TELEMETRY        (11) % Client->Server: unsolicited time, ENU position, ENU velocity (7 doubles)
+        TARGET_BATCH     (12) % Server->Client: count (uint16), flags (uint8), count x 3 doubles
+        WAYPOINT_REACHED (13) % Client->Server: batch waypoint index (uint16) reached
+        FRAMING          (14) % Server->Client: switch to extended framing (seq ID + send time), ACKed
     end
 end
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Stand-in controller timing how fast UAVRunner answers while it flies.
+
+Start it in place of the compiled controller, then start one UAV against
+SITL (``./run_uav.sh local``).  After takeoff it enters guidance mode and
+sends --targets guidance TARGETs, each --distance metres east or west of the
+start position.  While every flight is in progress it sends
+REQUEST_POSITION every --interval seconds and times each POSITION reply.
+It then leaves guidance mode, lands the UAV and ends the mission::
+
+    cd /root/miSim/aerpaw
+    python3 -m client.latency_check --port 5000 --targets 3 --distance 30
+
+Exits with status 1 if a reply took longer than --max-latency milliseconds or
+no query was answered during a flight.
+"""
+
+import asyncio
+import struct
+import sys
+import time
+from argparse import ArgumentParser
+
+from client.uav_runner import TELEMETRY_FRAME, MessageType, recv_exactly, recv_message_type
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q / 100 * len(values)), len(values) - 1)]
+
+
+class StandInController(object):
+    """One UAV connection: a reader task routes POSITION replies and all
+    other messages to separate queues and keeps the latest TELEMETRY
+    frame."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.positions = asyncio.Queue()
+        self.events = asyncio.Queue()
+        self.telemetry = None
+        self._reader_task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            msg_type = await recv_message_type(self.reader)
+            if msg_type == MessageType.POSITION:
+                self.positions.put_nowait(struct.unpack('<ddd', await recv_exactly(self.reader, 24)))
+            elif msg_type == MessageType.TELEMETRY:
+                self.telemetry = TELEMETRY_FRAME.unpack(
+                    await recv_exactly(self.reader, TELEMETRY_FRAME.size))
+            else:
+                self.events.put_nowait(msg_type)
+
+    async def send(self, msg_type, payload=b''):
+        self.writer.write(bytes([msg_type]) + payload)
+        await self.writer.drain()
+
+    async def expect(self, msg_type):
+        received = await self.events.get()
+        if received != msg_type:
+            raise RuntimeError(f"expected {msg_type.name}, got {received.name}")
+
+    async def position(self):
+        """(ENU position, seconds until the reply arrived)."""
+        t0 = time.monotonic()
+        await self.send(MessageType.REQUEST_POSITION)
+        enu = await self.positions.get()
+        return enu, time.monotonic() - t0
+
+    async def fly(self, target, interval):
+        """Send a guidance TARGET and query the position until its ACK.
+        Returns (flight seconds, reply latencies during the flight)."""
+        t0 = time.monotonic()
+        await self.send(MessageType.TARGET, struct.pack('<ddd', *target))
+        arrived = asyncio.create_task(self.expect(MessageType.ACK))
+        latencies = []
+        while not arrived.done():
+            _, latency = await self.position()
+            if not arrived.done():
+                latencies.append(latency)
+            await asyncio.wait([arrived], timeout=interval)
+        arrived.result()
+        return time.monotonic() - t0, latencies
+
+    async def close(self):
+        self._reader_task.cancel()
+        await asyncio.gather(self._reader_task, return_exceptions=True)
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def run(options):
+    connected = asyncio.get_running_loop().create_future()
+
+    async def on_connect(reader, writer):
+        if not connected.done():
+            connected.set_result((reader, writer))
+
+    server = await asyncio.start_server(on_connect, options.host, options.port)
+    print(f"[CHECK] Waiting for a UAV on {options.host}:{options.port}")
+    controller = StandInController(*await connected)
+    server.close()
+    print("[CHECK] UAV connected")
+
+    try:
+        start, latency = await controller.position()
+        print(f"[CHECK] Start position E={start[0]:.1f} N={start[1]:.1f} U={start[2]:.1f} "
+              f"({1e3 * latency:.1f} ms)")
+        await controller.send(MessageType.GUIDANCE_TOGGLE)
+        latencies = []
+        for i in range(options.targets):
+            east = start[0] + (options.distance if i % 2 == 0 else 0.0)
+            target = (east, start[1], start[2])
+            duration, flight = await controller.fly(target, options.interval)
+            latencies.extend(flight)
+            print(f"[CHECK] Target {i + 1}/{options.targets}: arrived after {duration:.1f} s, "
+                  f"{len(flight)} in-flight replies, max {1e3 * max(flight, default=0):.1f} ms")
+        await controller.send(MessageType.GUIDANCE_TOGGLE)
+        await controller.expect(MessageType.ACK)
+        await controller.send(MessageType.LAND)
+        await controller.expect(MessageType.ACK)
+        await controller.expect(MessageType.READY)
+        await controller.send(MessageType.READY)
+    finally:
+        await controller.close()
+
+    if not latencies:
+        print("[CHECK] FAIL: no REQUEST_POSITION was answered during a flight")
+        return 1
+    ms = [1e3 * v for v in latencies]
+    print(f"[CHECK] {len(ms)} in-flight replies: median {percentile(ms, 50):.1f} ms, "
+          f"p99 {percentile(ms, 99):.1f} ms, max {max(ms):.1f} ms")
+    if max(ms) > options.max_latency:
+        print(f"[CHECK] FAIL: slowest reply exceeds {options.max_latency} ms")
+        return 1
+    print("[CHECK] PASS")
+    return 0
+
+
+def argument_parser():
+    description = 'Stand-in controller timing UAVRunner position replies during flight'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "--host", dest="host", type=str, default='127.0.0.1',
+        help="Address to listen on [default=%(default)r]")
+    parser.add_argument(
+        "--port", dest="port", type=int, default=5000,
+        help="Port the UAV connects to (controller.port) [default=%(default)r]")
+    parser.add_argument(
+        "--targets", dest="targets", type=int, default=3,
+        help="Guidance targets to fly [default=%(default)r]")
+    parser.add_argument(
+        "--distance", dest="distance", type=float, default=30.0,
+        help="Metres between consecutive targets [default=%(default)r]")
+    parser.add_argument(
+        "--interval", dest="interval", type=float, default=0.1,
+        help="Seconds between position queries in flight [default=%(default)r]")
+    parser.add_argument(
+        "--max-latency", dest="max_latency", type=float, default=50.0,
+        help="Slowest acceptable reply in milliseconds [default=%(default)r]")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    sys.exit(asyncio.run(run(options)))
+
+
+if __name__ == '__main__':
+    main()
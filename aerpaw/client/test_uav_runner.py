@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Dispatch tests for UAVRunner without a vehicle or controller.
+
+The runner reads commands from an in-memory stream and sends its replies to
+a recording writer; the Drone is a stand-in whose goto_coordinates only
+returns when the test lets it arrive, so replies can be checked while a
+navigation is still in progress::
+
+    cd /root/miSim/aerpaw
+    python3 -m unittest client.test_uav_runner
+
+Needs aerpawlib (for Coordinate and VectorNED); skipped without it.
+"""
+
+import asyncio
+import importlib.util
+import struct
+import unittest
+
+if importlib.util.find_spec('aerpawlib') is None:
+    raise unittest.SkipTest("aerpawlib is not installed")
+
+from aerpawlib.util import Coordinate
+
+from client.uav_runner import MessageType, UAVRunner
+
+ORIGIN = Coordinate(35.72595214250436, -78.69917609299937, 0.0)
+
+# Payload bytes following each client -> controller message type
+REPLY_SIZES = {
+    MessageType.POSITION: 24,
+    MessageType.TELEMETRY: 56,
+    MessageType.WAYPOINT_REACHED: 2,
+}
+
+
+class StandInDrone(object):
+    """Drone whose goto_coordinates waits for arrive(); every call is
+    logged in *calls*."""
+
+    def __init__(self):
+        self.position = ORIGIN
+        self.home_coords = ORIGIN
+        self.calls = []
+        self.moving = asyncio.Event()
+        self._arrived = None
+
+    async def goto_coordinates(self, target, tolerance=2):
+        self.calls.append(('goto', (target.lat, target.lon, target.alt)))
+        self._arrived = asyncio.Event()
+        self.moving.set()
+        await self._arrived.wait()
+        self.position = target
+
+    def arrive(self):
+        self.moving.clear()
+        self._arrived.set()
+
+    async def land(self):
+        self.calls.append(('land',))
+
+
+class RecordingWriter(object):
+    """StreamWriter stand-in keeping everything written."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def replies(self):
+        """The written messages as a list of (MessageType, payload)."""
+        out, i = [], 0
+        while i < len(self.data):
+            msg_type = MessageType(self.data[i])
+            size = REPLY_SIZES.get(msg_type, 0)
+            out.append((msg_type, bytes(self.data[i + 1:i + 1 + size])))
+            i += 1 + size
+        return out
+
+    def types(self):
+        return [msg_type for msg_type, _ in self.replies()]
+
+
+def target(x, y, z):
+    return bytes([MessageType.TARGET]) + struct.pack('<ddd', x, y, z)
+
+
+class DispatchTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.drone = StandInDrone()
+        self.writer = RecordingWriter()
+        self.reader = asyncio.StreamReader()
+        self.runner = UAVRunner()
+        self.runner.origin = ORIGIN
+        self.runner._start_session(self.drone, self.writer)
+        self.reader_task = asyncio.create_task(self.runner._read_commands(self.reader))
+        self.motion_task = asyncio.create_task(self.runner._run_motion_jobs())
+
+    async def asyncTearDown(self):
+        for task in (self.reader_task, self.motion_task):
+            task.cancel()
+        await asyncio.gather(self.reader_task, self.motion_task, return_exceptions=True)
+
+    async def until(self, predicate, timeout=2.0):
+        """Wait for *predicate* to hold, failing after *timeout* seconds."""
+        async def poll():
+            while not predicate():
+                await asyncio.sleep(0.001)
+        await asyncio.wait_for(poll(), timeout)
+
+    async def test_position_answered_before_ready(self):
+        self.reader.feed_data(target(10.0, 20.0, 30.0))
+        await asyncio.wait_for(self.drone.moving.wait(), 2.0)
+        self.reader.feed_data(bytes([MessageType.REQUEST_POSITION]))
+        await self.until(lambda: MessageType.POSITION in self.writer.types())
+
+        # Still flying: POSITION has been served, READY not yet sent
+        self.assertEqual(self.writer.types(), [MessageType.ACK, MessageType.POSITION])
+        self.assertEqual(struct.unpack('<ddd', self.writer.replies()[1][1]), (0.0, 0.0, 0.0))
+
+        self.drone.arrive()
+        await self.until(lambda: MessageType.READY in self.writer.types())
+        self.assertEqual(self.writer.types(),
+                         [MessageType.ACK, MessageType.POSITION, MessageType.READY])
+
+        self.reader.feed_data(bytes([MessageType.READY]))
+        await asyncio.wait_for(self.reader_task, 2.0)
+
+    async def test_jobs_run_in_queue_order(self):
+        self.reader.feed_data(target(10.0, 0.0, 30.0) + target(20.0, 0.0, 30.0)
+                              + bytes([MessageType.RTL, MessageType.LAND]))
+        # Every command is ACKed at once, before any job has finished
+        await self.until(lambda: self.writer.types().count(MessageType.ACK) == 4)
+        await asyncio.wait_for(self.drone.moving.wait(), 2.0)
+        self.assertEqual(len(self.drone.calls), 1)
+
+        for flights in (2, 3):
+            self.drone.arrive()
+            await asyncio.wait_for(self.drone.moving.wait(), 2.0)
+            # The next job starts only once the previous one is done
+            self.assertEqual(len(self.drone.calls), flights)
+            self.assertEqual(self.writer.types().count(MessageType.READY), flights - 1)
+        self.drone.arrive()
+        await self.until(lambda: self.writer.types().count(MessageType.READY) == 4)
+
+        # Waypoint 1, waypoint 2, home at the RTL altitude, then land
+        self.assertEqual([call[0] for call in self.drone.calls], ['goto', 'goto', 'goto', 'land'])
+        first, second, home = (call[1] for call in self.drone.calls[:3])
+        self.assertLess(first[1], second[1])
+        self.assertEqual(home, (ORIGIN.lat, ORIGIN.lon, 25))
+        self.assertEqual(self.writer.types(), [MessageType.ACK] * 4 + [MessageType.READY] * 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
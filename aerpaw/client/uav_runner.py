@@ -17,14 +17,55 @@ Binary Protocol:
         Server sends: RTL (1 byte) → Client: ACK, return home, READY
         Server sends: LAND (1 byte) → Client: ACK, land, READY
         Server sends: READY (1 byte) - mission complete, disconnect
+    Guidance mode (between two GUIDANCE_TOGGLEs):
+        Server sends: TARGET + x,y,z → Client (after moving): ACK
+        Server sends: REQUEST_POSITION → Client: POSITION + x,y,z (24 bytes)
+        The second toggle is ACKed once the last navigation has finished.
+    Streaming guidance mode (between two GUIDANCE_STREAMs):
+        Server sends: TARGET + x,y,z (no reply) at its own rate; the client
+        follows the latest target with rate-limited velocity setpoints
+        (config "guidance" section) instead of stopping at each one.
+        REQUEST_POSITION is answered as above.  The second GUIDANCE_STREAM
+        stops the UAV and is ACKed.
+    Waypoint batch (sequential mode):
+        Server sends: TARGET_BATCH + count (uint16) + flags (uint8) +
+                      count * x,y,z (24 bytes each)
+        Client sends: ACK, then WAYPOINT_REACHED + index (uint16) on each
+        arrival and READY after the last one.  With flags bit 0 set the
+        intermediate waypoints are passed through within pass_radius
+        (config "waypoints" section) instead of stopped at.
+    Telemetry (opt-in, any mode):
+        Server sends: TELEMETRY_RATE + rate in Hz (1 double, 0 = off)
+        Client then sends, unsolicited, at that rate: TELEMETRY + time,
+        ENU position and ENU velocity (7 doubles, 56 bytes), interleaved
+        with its other replies; the controller keeps the latest frame
+        instead of asking with REQUEST_POSITION.
+    Extended framing (opt-in, from the start of the mission):
+        Server sends: FRAMING → Client: ACK; from that ACK on, in both
+        directions, every type byte is followed by a 24-byte header:
+        sequence ID (uint32) and monotonic send time (double, s) of the
+        message, then those of the message it answers (0 if unsolicited).
+
+Commands are read and dispatched as they arrive: navigation runs in the
+background, so REQUEST_POSITION is answered at once even mid-flight and a
+new guidance TARGET replaces the one in progress.  Check the response time
+against a local stand-in controller with client/latency_check.py; the
+dispatch order itself is tested without a vehicle in client/test_uav_runner.py.
+
+Latency histograms per message type (receive-to-ACK, ACK-to-arrival,
+POSITION serve time) are printed and written to
+$RESULTS_DIR/<LOG_PREFIX>_latency.txt at mission end, and on demand with
+``kill -USR1 <pid>``.
 """
 from enum import IntEnum
 from pathlib import Path
 import asyncio
+import bisect
 import csv
 import datetime
 import os
 import platform
+import signal
 import struct
 import time
 import yaml
@@ -44,7 +85,49 @@ class MessageType(IntEnum):
     GUIDANCE_TOGGLE  = 6
     REQUEST_POSITION = 7
     POSITION         = 8
-
+    GUIDANCE_STREAM  = 9
+    TELEMETRY_RATE   = 10
+    TELEMETRY        = 11
+    TARGET_BATCH     = 12
+    WAYPOINT_REACHED = 13
+    FRAMING          = 14
+
+
+# Payload bytes following each server -> client message type
+PAYLOAD_SIZES = {
+    MessageType.TARGET: 24,
+    MessageType.TELEMETRY_RATE: 8,
+    MessageType.TARGET_BATCH: 3,
+}
+
+# TARGET_BATCH header: waypoint count, flags; count * 3 doubles follow
+BATCH_HEADER = struct.Struct('<HB')
+BATCH_PASS_THROUGH = 0x01
+# WAYPOINT_REACHED payload: 1-based index of the waypoint in its batch
+WAYPOINT_EVENT = struct.Struct('<H')
+
+# TELEMETRY payload: host time (s), ENU position (m), ENU velocity (m/s)
+TELEMETRY_FRAME = struct.Struct('<7d')
+
+# Extended framing header after every type byte once FRAMING is ACKed:
+# sequence ID and monotonic send time of this message, then those of the
+# message it answers
+FRAME_HEADER = struct.Struct('<IdId')
+
+# Streaming guidance defaults (config "guidance" section): setpoint rate in Hz,
+# speed in m/s, acceleration in m/s^2 and speed per metre of remaining distance
+STREAM_DEFAULTS = {
+    'rate': 10.0,
+    'max_speed': 5.0,
+    'max_accel': 2.0,
+    'gain': 0.5,
+}
+
+# Waypoint batch defaults (config "waypoints" section): metres from an
+# intermediate waypoint at which a pass-through batch moves on to the next
+WAYPOINT_DEFAULTS = {
+    'pass_radius': 5.0,
+}
 
 AERPAW_DIR = Path('/root/miSim/aerpaw')
 CONFIG_FILE = Path(os.environ.get('AERPAW_CLIENT_CONFIG',
@@ -90,6 +173,12 @@ async def send_message_type(writer: asyncio.StreamWriter, msg_type: MessageType)
     await writer.drain()
 
 
+def _clip(vector: VectorNED, limit: float) -> VectorNED:
+    """Scale *vector* down to at most *limit* in magnitude."""
+    norm = vector.hypot()
+    return vector if norm <= limit else vector * (limit / norm)
+
+
 def _gps_log_row(vehicle, line_num, writer):
     """Sample vehicle state and write one CSV row (matches gps_logger.py format)."""
     pos = vehicle.position
@@ -116,9 +205,7 @@ def _gps_log_row(vehicle, line_num, writer):
 
 async def _gps_log_loop(drone):
     """Background async task that logs GPS data at 1Hz."""
-    results_dir = os.environ.get('RESULTS_DIR', '/root/Results')
-    log_prefix = os.environ.get('LOG_PREFIX', datetime.datetime.now().strftime('%Y-%m-%d_%H_%M_%S'))
-    filename = os.path.join(results_dir, f"{log_prefix}_gps_log.csv")
+    filename = _results_file("gps_log.csv")
     print(f"[UAV] GPS logging to {filename}")
     line_num = 1
     try:
@@ -139,6 +226,65 @@ async def _gps_log_loop(drone):
         print(f"[UAV] GPS logging error: {e}")
 
 
+def _results_file(suffix):
+    """Path of a mission log file in $RESULTS_DIR."""
+    results_dir = os.environ.get('RESULTS_DIR', '/root/Results')
+    log_prefix = os.environ.get('LOG_PREFIX', datetime.datetime.now().strftime('%Y-%m-%d_%H_%M_%S'))
+    return os.path.join(results_dir, f"{log_prefix}_{suffix}")
+
+
+class Request(object):
+    """A received command: *key* names it in the latency histograms, *seq*
+    and *sent* are its extended framing sequence ID and send time (0
+    without framing); receive and ACK times are local monotonic."""
+
+    def __init__(self, msg_type, seq=0, sent=0.0):
+        self.msg_type = msg_type
+        self.key = msg_type.name
+        self.seq = seq
+        self.sent = sent
+        self.received = time.monotonic()
+        self.acked = None
+
+
+class LatencyHistograms(object):
+    """Latency histograms in seconds per (message key, stage) on
+    log-spaced bins from 100 us to 1000 s, five per decade."""
+
+    EDGES = [10 ** (e / 5) for e in range(-20, 16)]
+
+    def __init__(self):
+        self._hists = {}
+
+    def record(self, key, stage, seconds):
+        h = self._hists.setdefault((key, stage), {
+            'counts': [0] * (len(self.EDGES) + 1), 'n': 0, 'sum': 0.0, 'max': 0.0})
+        h['counts'][bisect.bisect_left(self.EDGES, seconds)] += 1
+        h['n'] += 1
+        h['sum'] += seconds
+        h['max'] = max(h['max'], seconds)
+
+    def _percentile(self, h, q):
+        """Upper bin edge at or below which *q* of the samples lie."""
+        need, seen = q * h['n'], 0
+        for i, count in enumerate(h['counts']):
+            seen += count
+            if seen >= need:
+                return min(self.EDGES[i], h['max']) if i < len(self.EDGES) else h['max']
+        return h['max']
+
+    def text(self):
+        lines = ["message stage n mean_ms p50_ms p90_ms p99_ms max_ms | bins (upper edge ms:count)"]
+        for (key, stage), h in sorted(self._hists.items()):
+            ms = [1e3 * v for v in (h['sum'] / h['n'], self._percentile(h, 0.5),
+                                    self._percentile(h, 0.9), self._percentile(h, 0.99), h['max'])]
+            bins = ' '.join(f"{1e3 * self.EDGES[i]:.3g}:{c}" if i < len(self.EDGES) else f"inf:{c}"
+                            for i, c in enumerate(h['counts']) if c)
+            lines.append(f"{key} {stage} {h['n']} "
+                         + ' '.join(f"{v:.2f}" for v in ms) + f" | {bins}")
+        return '\n'.join(lines) + '\n'
+
+
 class UAVRunner(BasicRunner):
     def initialize_args(self, extra_args):
         """Load configuration from YAML config file."""
@@ -157,6 +303,330 @@ class UAVRunner(BasicRunner):
         self.server_port = env_config['controller']['port']
         print(f"[UAV] Controller: {self.server_ip}:{self.server_port}")
 
+        # Streaming guidance setpoint limits
+        self.stream = dict(STREAM_DEFAULTS, **(config.get('guidance') or {}))
+        print(f"[UAV] Streaming guidance: {self.stream['rate']:g} Hz, "
+              f"max {self.stream['max_speed']:g} m/s, {self.stream['max_accel']:g} m/s^2")
+        self.waypoints = dict(WAYPOINT_DEFAULTS, **(config.get('waypoints') or {}))
+
+    async def _send(self, msg_type: MessageType, payload: bytes = b'', reply_to: Request = None):
+        """Send one message, answering the command *reply_to* if given.
+        Handlers and navigation tasks share the connection, so each message
+        goes out in a single write."""
+        header = b''
+        if self.framing:
+            self._seq += 1
+            echo = (reply_to.seq, reply_to.sent) if reply_to is not None else (0, 0.0)
+            header = FRAME_HEADER.pack(self._seq, time.monotonic(), *echo)
+        self._writer.write(bytes([msg_type]) + header + payload)
+        async with self._drain_lock:
+            await self._writer.drain()
+        if reply_to is not None:
+            self._record_latency(reply_to, msg_type)
+
+    def _record_latency(self, request, reply):
+        now = time.monotonic()
+        if reply == MessageType.ACK:
+            self.latency.record(request.key, 'receive-to-ACK', now - request.received)
+            request.acked = now
+        elif reply == MessageType.POSITION:
+            self.latency.record(request.key, 'serve', now - request.received)
+        elif request.acked is not None:
+            stage = 'ACK-to-arrival' if reply == MessageType.READY else 'ACK-to-waypoint'
+            self.latency.record(request.key, stage, now - request.acked)
+
+    def dump_latency(self):
+        """Print the latency histograms and write them to the results
+        directory."""
+        text = self.latency.text()
+        print("[UAV] Latency histograms:")
+        for line in text.splitlines():
+            print(f"[UAV]   {line}")
+        try:
+            with open(_results_file("latency.txt"), "w") as f:
+                f.write(text)
+        except OSError as e:
+            print(f"[UAV] Could not write latency histograms: {e}")
+
+    def _track(self, coro, name):
+        """Run *coro* as a background task whose failure is reported."""
+        task = asyncio.create_task(coro, name=name)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[UAV] {task.get_name()} failed: {task.exception()!r}")
+
+    def _target(self, payload):
+        """ENU target of a TARGET payload as (enu, Coordinate)."""
+        enu_x, enu_y, enu_z = struct.unpack('<ddd', payload)
+        # Convert ENU to lat/lon (ENU: x=East, y=North, z=Up)
+        return (enu_x, enu_y, enu_z), self.origin + VectorNED(north=enu_y, east=enu_x, down=-enu_z)
+
+    async def _read_commands(self, reader: asyncio.StreamReader):
+        """Reader task: read each message with its payload and dispatch it.
+        Handlers return at once; anything that waits on the vehicle runs as
+        a navigation task or a queued motion job, so the connection is
+        always being read.  Returns when the controller sends READY."""
+        while True:
+            msg_type = await recv_message_type(reader)
+            seq, sent = 0, 0.0
+            if self.framing:
+                seq, sent, _, _ = FRAME_HEADER.unpack(await recv_exactly(reader, FRAME_HEADER.size))
+            request = Request(msg_type, seq, sent)
+            payload = await recv_exactly(reader, PAYLOAD_SIZES.get(msg_type, 0))
+            if msg_type == MessageType.TARGET_BATCH:
+                count, _ = BATCH_HEADER.unpack(payload)
+                payload += await recv_exactly(reader, 24 * count)
+            print(f"[UAV] Received: {msg_type.name}")
+            handler = self._handlers.get(msg_type)
+            if handler is None:
+                print(f"[UAV] Unknown command: {msg_type}")
+                continue
+            if await handler(payload, request) is False:
+                return
+
+    async def _run_motion_jobs(self):
+        """Run queued motion jobs (sequential waypoints, RTL, LAND, leaving
+        guidance) one after another, in the order they were received."""
+        while True:
+            job = await self._jobs.get()
+            try:
+                await job()
+            finally:
+                self._jobs.task_done()
+
+    async def _handle_guidance_toggle(self, payload, request):
+        self.in_guidance = not self.in_guidance
+        print(f"[UAV] Guidance mode: {'ON' if self.in_guidance else 'OFF'}")
+        if not self.in_guidance:
+            self._jobs.put_nowait(lambda: self._leave_guidance(request))
+
+    async def _leave_guidance(self, request):
+        # Wait for the current navigation to finish before resuming
+        # sequential (ACK/READY) mode
+        if self._nav_task is not None and not self._nav_task.done():
+            print("[UAV] Waiting for current navigation to complete...")
+            await asyncio.gather(self._nav_task, return_exceptions=True)
+        self._nav_task = None
+        # Acknowledge that we are ready for sequential commands
+        await self._send(MessageType.ACK, reply_to=request)
+        print("[UAV] Sent ACK (guidance mode exited, ready for sequential commands)")
+
+    async def _handle_guidance_stream(self, payload, request):
+        self.streaming = not self.streaming
+        print(f"[UAV] Streaming guidance mode: {'ON' if self.streaming else 'OFF'}")
+        if self.streaming:
+            self._stream_target = None
+            self._stream_task = self._track(self._stream_setpoints(), 'setpoint stream')
+        else:
+            self._jobs.put_nowait(lambda: self._leave_stream(request))
+
+    async def _stream_setpoints(self):
+        """Follow the latest streamed target with velocity setpoints at the
+        fixed control rate.  The commanded velocity points at the target,
+        scales with the remaining distance up to max_speed and changes by at
+        most max_accel, so each new target is blended into rather than
+        stopped for.  However the loop ends (cancelled or failed) the UAV is
+        stopped rather than left flying its last setpoint."""
+        period = 1.0 / self.stream['rate']
+        max_dv = self.stream['max_accel'] * period
+        velocity = VectorNED(0, 0, 0)
+        next_tick = time.monotonic()
+        try:
+            while True:
+                if self._stream_target is not None:
+                    error = self._stream_target - self._drone.position
+                    desired = _clip(error * self.stream['gain'], self.stream['max_speed'])
+                    velocity = velocity + _clip(desired - velocity, max_dv)
+                    await self._drone.set_velocity(velocity)
+                next_tick += period
+                await asyncio.sleep(max(next_tick - time.monotonic(), 0.0))
+        finally:
+            await self._drone.set_velocity(VectorNED(0, 0, 0))
+
+    async def _leave_stream(self, request):
+        if self._stream_task is not None:
+            self._stream_task.cancel()
+            await asyncio.gather(self._stream_task, return_exceptions=True)
+            self._stream_task = None
+        await self._send(MessageType.ACK, reply_to=request)
+        print("[UAV] Sent ACK (streaming guidance exited, UAV stopped)")
+
+    async def _handle_request_position(self, payload, request):
+        # Respond immediately with current ENU position relative to origin,
+        # also while a navigation is in progress
+        enu = self._drone.position - self.origin  # VectorNED(north, east, down)
+        await self._send(MessageType.POSITION, struct.pack('<ddd', enu.east, enu.north, -enu.down),
+                         reply_to=request)
+        print(f"[UAV] Sent POSITION: E={enu.east:.1f} N={enu.north:.1f} U={-enu.down:.1f}")
+
+    async def _handle_telemetry_rate(self, payload, request):
+        rate, = struct.unpack('<d', payload)
+        if self._telemetry_task is not None:
+            self._telemetry_task.cancel()
+            await asyncio.gather(self._telemetry_task, return_exceptions=True)
+            self._telemetry_task = None
+        if rate > 0:
+            self._telemetry_task = self._track(self._push_telemetry(rate), 'telemetry push')
+            print(f"[UAV] Pushing TELEMETRY at {rate:g} Hz")
+        else:
+            print("[UAV] TELEMETRY push stopped")
+
+    async def _push_telemetry(self, rate):
+        """Send a TELEMETRY frame every 1/*rate* seconds."""
+        period = 1.0 / rate
+        next_tick = time.monotonic()
+        while True:
+            enu = self._drone.position - self.origin
+            vel = self._drone.velocity  # VectorNED
+            await self._send(MessageType.TELEMETRY, TELEMETRY_FRAME.pack(
+                time.time(), enu.east, enu.north, -enu.down, vel.east, vel.north, -vel.down))
+            next_tick += period
+            await asyncio.sleep(max(next_tick - time.monotonic(), 0.0))
+
+    async def _handle_target(self, payload, request):
+        (enu_x, enu_y, enu_z), target = self._target(payload)
+        if self.streaming:
+            # Streaming guidance: the setpoint loop picks the target up on
+            # its next tick; no reply
+            print(f"[UAV] Stream TARGET: E={enu_x:.1f} N={enu_y:.1f} U={enu_z:.1f}")
+            self._stream_target = target
+        elif self.in_guidance:
+            # Guidance mode (event-triggered): navigate to target in the
+            # background and send ACK once arrived, so the controller knows
+            # all UAVs have reached their targets before it requests
+            # positions and computes the next step.  A new target replaces
+            # the one in progress, which then sends no ACK.
+            print(f"[UAV] Guidance TARGET: E={enu_x:.1f} N={enu_y:.1f} U={enu_z:.1f}")
+            request.key = 'TARGET/guidance'
+            if self._nav_task is not None and not self._nav_task.done():
+                self._nav_task.cancel()
+                await asyncio.gather(self._nav_task, return_exceptions=True)
+            self._nav_task = self._track(self._guidance_nav(target, request), 'guidance navigation')
+        else:
+            # Sequential mode: ACK → navigate → READY
+            self.waypoint_num += 1
+            waypoint_num = self.waypoint_num
+            print(f"[UAV] TARGET (waypoint {waypoint_num}): x={enu_x:.1f}, y={enu_y:.1f}, z={enu_z:.1f}")
+            print(f"[UAV] Target coord: {target.lat:.6f}, {target.lon:.6f}, {target.alt:.1f}")
+            await self._send(MessageType.ACK, reply_to=request)
+            print("[UAV] Sent ACK")
+
+            async def fly():
+                print(f"[UAV] Moving to waypoint {waypoint_num}...")
+                await self._drone.goto_coordinates(target)
+                print(f"[UAV] Arrived at waypoint {waypoint_num}")
+                await self._send(MessageType.READY, reply_to=request)
+                print("[UAV] Sent READY")
+
+            self._jobs.put_nowait(fly)
+
+    async def _handle_target_batch(self, payload, request):
+        count, flags = BATCH_HEADER.unpack_from(payload)
+        targets = [self._target(payload[i:i + 24])
+                   for i in range(BATCH_HEADER.size, BATCH_HEADER.size + 24 * count, 24)]
+        pass_through = bool(flags & BATCH_PASS_THROUGH)
+        first = self.waypoint_num + 1
+        self.waypoint_num += count
+        last_num = self.waypoint_num
+        print(f"[UAV] TARGET_BATCH: {count} waypoints ({first}-{last_num}), "
+              f"{'pass-through' if pass_through else 'stop at each'}")
+        await self._send(MessageType.ACK, reply_to=request)
+        print("[UAV] Sent ACK")
+
+        async def fly():
+            # Queued as one job: the waypoints are flown back to back
+            for index, ((enu_x, enu_y, enu_z), target) in enumerate(targets, 1):
+                last = index == count
+                print(f"[UAV] Moving to waypoint {first + index - 1} "
+                      f"(batch {index}/{count}): x={enu_x:.1f}, y={enu_y:.1f}, z={enu_z:.1f}")
+                if pass_through and not last:
+                    await self._drone.goto_coordinates(target, tolerance=self.waypoints['pass_radius'])
+                else:
+                    await self._drone.goto_coordinates(target)
+                await self._send(MessageType.WAYPOINT_REACHED, WAYPOINT_EVENT.pack(index),
+                                 reply_to=request)
+            print(f"[UAV] Arrived at waypoint {last_num}, batch complete")
+            await self._send(MessageType.READY, reply_to=request)
+            print("[UAV] Sent READY")
+
+        self._jobs.put_nowait(fly)
+
+    async def _guidance_nav(self, target, request):
+        await self._drone.goto_coordinates(target)
+        await self._send(MessageType.ACK, reply_to=request)
+        print("[UAV] Sent ACK (arrived at guidance target)")
+
+    async def _handle_rtl(self, payload, request):
+        await self._send(MessageType.ACK, reply_to=request)
+        print(f"[UAV] Sent ACK")
+        self._jobs.put_nowait(lambda: self._return_home(request))
+
+    async def _return_home(self, request):
+        print("[UAV] Returning to home...")
+        home = self._drone.home_coords
+        safe_alt = 25
+        rtl_target = Coordinate(home.lat, home.lon, safe_alt)
+        print(f"[UAV] RTL to {home.lat:.6f}, {home.lon:.6f} at {safe_alt:.1f}m")
+        await self._drone.goto_coordinates(rtl_target)
+        print("[UAV] Arrived at home position")
+        await self._send(MessageType.READY, reply_to=request)
+        print(f"[UAV] Sent READY")
+
+    async def _handle_land(self, payload, request):
+        await self._send(MessageType.ACK, reply_to=request)
+        print(f"[UAV] Sent ACK")
+        self._jobs.put_nowait(lambda: self._land(request))
+
+    async def _land(self, request):
+        print("[UAV] Landing...")
+        await self._drone.land()
+        print("[UAV] Landed and disarmed")
+        await self._send(MessageType.READY, reply_to=request)
+        print(f"[UAV] Sent READY")
+
+    async def _handle_framing(self, payload, request):
+        # The ACK is the first message with the extended header
+        self.framing = True
+        await self._send(MessageType.ACK, reply_to=request)
+        print("[UAV] Extended framing ON, sent ACK")
+
+    async def _handle_ready(self, payload, request):
+        print("[UAV] Mission complete")
+        return False
+
+    def _start_session(self, drone, writer):
+        """Reset the per-connection state and handler table; called once
+        connected to the controller, inside the event loop."""
+        self._drone = drone
+        self._writer = writer
+        self._drain_lock = asyncio.Lock()
+        self.framing = False
+        self._seq = 0
+        self.latency = LatencyHistograms()
+        self._jobs = asyncio.Queue()
+        self._nav_task = None
+        self.in_guidance = False
+        self.streaming = False
+        self._stream_task = None
+        self._stream_target = None
+        self._telemetry_task = None
+        self.waypoint_num = 0
+        self._handlers = {
+            MessageType.GUIDANCE_TOGGLE: self._handle_guidance_toggle,
+            MessageType.GUIDANCE_STREAM: self._handle_guidance_stream,
+            MessageType.REQUEST_POSITION: self._handle_request_position,
+            MessageType.TELEMETRY_RATE: self._handle_telemetry_rate,
+            MessageType.TARGET: self._handle_target,
+            MessageType.TARGET_BATCH: self._handle_target_batch,
+            MessageType.RTL: self._handle_rtl,
+            MessageType.LAND: self._handle_land,
+            MessageType.FRAMING: self._handle_framing,
+            MessageType.READY: self._handle_ready,
+        }
+
     @entrypoint
     async def run_mission(self, drone: Drone):
         """Main mission entry point."""
@@ -181,8 +651,12 @@ class UAVRunner(BasicRunner):
             print("[UAV] Failed to connect to controller after 10 attempts")
             return
 
+        self._start_session(drone, writer)
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGUSR1, self.dump_latency)
+
         log_task = None
-        nav_task = None
+        tasks = []
         try:
             # Takeoff to above AERPAW minimum altitude
             print("[UAV] Taking off...")
@@ -192,109 +666,35 @@ class UAVRunner(BasicRunner):
             # Start GPS logging in background
             log_task = asyncio.create_task(_gps_log_loop(drone))
 
-            # Command loop - handle all messages from controller
-            waypoint_num = 0
-            in_guidance = False
-            while True:
-                msg_type = await recv_message_type(reader)
-                print(f"[UAV] Received: {msg_type.name}")
-
-                if msg_type == MessageType.GUIDANCE_TOGGLE:
-                    in_guidance = not in_guidance
-                    print(f"[UAV] Guidance mode: {'ON' if in_guidance else 'OFF'}")
-                    if not in_guidance:
-                        # Exiting guidance: wait for current navigation to finish
-                        # before resuming sequential (ACK/READY) mode
-                        if nav_task and not nav_task.done():
-                            print("[UAV] Waiting for current navigation to complete...")
-                            await nav_task
-                            nav_task = None
-                        # Acknowledge that we are ready for sequential commands
-                        await send_message_type(writer, MessageType.ACK)
-                        print("[UAV] Sent ACK (guidance mode exited, ready for sequential commands)")
-
-                elif msg_type == MessageType.REQUEST_POSITION:
-                    # Respond immediately with current ENU position relative to origin
-                    pos = drone.position
-                    enu = pos - self.origin  # VectorNED(north, east, down)
-                    await send_message_type(writer, MessageType.POSITION)
-                    writer.write(struct.pack('<ddd', enu.east, enu.north, -enu.down))
-                    await writer.drain()
-                    print(f"[UAV] Sent POSITION: E={enu.east:.1f} N={enu.north:.1f} U={-enu.down:.1f}")
-
-                elif msg_type == MessageType.TARGET:
-                    # Read 24 bytes of coordinates (3 little-endian doubles)
-                    data = await recv_exactly(reader, 24)
-                    enu_x, enu_y, enu_z = struct.unpack('<ddd', data)
-
-                    # Convert ENU to lat/lon (ENU: x=East, y=North, z=Up)
-                    target = self.origin + VectorNED(north=enu_y, east=enu_x, down=-enu_z)
-
-                    if in_guidance:
-                        # Guidance mode (event-triggered): navigate to target,
-                        # then send ACK once arrived so the controller knows
-                        # all UAVs have reached their targets before it
-                        # requests positions and computes the next step.
-                        print(f"[UAV] Guidance TARGET: E={enu_x:.1f} N={enu_y:.1f} U={enu_z:.1f}")
-                        if nav_task and not nav_task.done():
-                            nav_task.cancel()
-                            await asyncio.gather(nav_task, return_exceptions=True)
-                        await drone.goto_coordinates(target)
-                        await send_message_type(writer, MessageType.ACK)
-                        print("[UAV] Sent ACK (arrived at guidance target)")
-                        nav_task = None
-                    else:
-                        # Sequential mode: ACK → navigate → READY
-                        waypoint_num += 1
-                        print(f"[UAV] TARGET (waypoint {waypoint_num}): x={enu_x:.1f}, y={enu_y:.1f}, z={enu_z:.1f}")
-                        print(f"[UAV] Target coord: {target.lat:.6f}, {target.lon:.6f}, {target.alt:.1f}")
-                        await send_message_type(writer, MessageType.ACK)
-                        print("[UAV] Sent ACK")
-                        print(f"[UAV] Moving to waypoint {waypoint_num}...")
-                        await drone.goto_coordinates(target)
-                        print(f"[UAV] Arrived at waypoint {waypoint_num}")
-                        await send_message_type(writer, MessageType.READY)
-                        print("[UAV] Sent READY")
-
-                elif msg_type == MessageType.RTL:
-                    await send_message_type(writer, MessageType.ACK)
-                    print(f"[UAV] Sent ACK")
-                    print("[UAV] Returning to home...")
-                    home = drone.home_coords
-                    safe_alt = 25
-                    rtl_target = Coordinate(home.lat, home.lon, safe_alt)
-                    print(f"[UAV] RTL to {home.lat:.6f}, {home.lon:.6f} at {safe_alt:.1f}m")
-                    await drone.goto_coordinates(rtl_target)
-                    print("[UAV] Arrived at home position")
-                    await send_message_type(writer, MessageType.READY)
-                    print(f"[UAV] Sent READY")
-
-                elif msg_type == MessageType.LAND:
-                    await send_message_type(writer, MessageType.ACK)
-                    print(f"[UAV] Sent ACK")
-                    print("[UAV] Landing...")
-                    await drone.land()
-                    print("[UAV] Landed and disarmed")
-                    await send_message_type(writer, MessageType.READY)
-                    print(f"[UAV] Sent READY")
-
-                elif msg_type == MessageType.READY:
-                    print("[UAV] Mission complete")
-                    break
-
-                else:
-                    print(f"[UAV] Unknown command: {msg_type}")
+            # Command loop: the reader dispatches every message from the
+            # controller while the motion worker flies queued jobs.  Either
+            # one ending (mission complete or an error) ends the mission.
+            reader_task = asyncio.create_task(self._read_commands(reader), name='command reader')
+            motion_task = asyncio.create_task(self._run_motion_jobs(), name='motion worker')
+            tasks = [reader_task, motion_task]
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
 
         except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
             print(f"[UAV] Error: {e}")
 
         finally:
-            if nav_task is not None and not nav_task.done():
-                nav_task.cancel()
-                await asyncio.gather(nav_task, return_exceptions=True)
+            for task in tasks + [self._nav_task, self._stream_task, self._telemetry_task]:
+                if task is not None and not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+            if self.streaming:
+                # Never leave the UAV on its last streamed setpoint
+                try:
+                    await drone.set_velocity(VectorNED(0, 0, 0))
+                except Exception as e:
+                    print(f"[UAV] Error stopping the UAV: {e}")
             if log_task is not None:
                 log_task.cancel()
                 await asyncio.gather(log_task, return_exceptions=True)
+            loop.remove_signal_handler(signal.SIGUSR1)
+            self.dump_latency()
             writer.close()
             await writer.wait_closed()
             print("[UAV] Connection closed")
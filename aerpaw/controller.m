@@ -92,54 +92,96 @@ for i = 1:numClients
     end
 end
 
-% Waypoint loop: send each waypoint to all clients, wait for all to arrive
-for w = 1:numWaypoints
-    % Send TARGET for waypoint w to each client
+% Extended framing: every message carries a sequence ID and send time that
+% replies echo, so the log shows per-reply round trips and the clients keep
+% per-message latency histograms with the same IDs
+EXTENDED_FRAMING = false;
+if EXTENDED_FRAMING && ~coder.target('MATLAB')
+    coder.ceval('enableExtendedFraming', int32(numClients));
+end
+
+% Waypoint batches: send each client all of its waypoints in one TARGET_BATCH
+% and wait once for every UAV to fly them back to back, instead of a
+% TARGET/ACK/READY round trip per waypoint.  With BATCH_PASS_THROUGH the
+% UAVs do not stop at intermediate waypoints.
+BATCH_WAYPOINTS    = false;
+BATCH_PASS_THROUGH = false;
+if BATCH_WAYPOINTS && ~coder.target('MATLAB')
     for i = 1:numClients
-        % Targets are grouped by client: client i's waypoints are at rows
-        % (i-1)*numWaypoints+1 through i*numWaypoints
-        targetIdx = (i - 1) * numWaypoints + w;
-        target = targets(targetIdx, :);
+        coder.ceval('sendTargetBatch', int32(i), coder.ref(targets), int32(MAX_TARGETS), ...
+                    (int32(i) - 1) * numWaypoints, numWaypoints, int32(BATCH_PASS_THROUGH));
+    end
+    coder.ceval('waitForAllMessageType', int32(numClients), int32(MESSAGE_TYPE.ACK));
+    coder.ceval('waitForAllMessageType', int32(numClients), int32(MESSAGE_TYPE.READY));
+else
+    % Waypoint loop: send each waypoint to all clients, wait for all to arrive
+    for w = 1:numWaypoints
+        % Send TARGET for waypoint w to each client
+        for i = 1:numClients
+            % Targets are grouped by client: client i's waypoints are at rows
+            % (i-1)*numWaypoints+1 through i*numWaypoints
+            targetIdx = (i - 1) * numWaypoints + w;
+            target = targets(targetIdx, :);
+
+            if coder.target('MATLAB')
+                disp(['Sending TARGET to client ', num2str(i), ' (waypoint ', num2str(w), '): ', ...
+                      num2str(target(1)), ',', num2str(target(2)), ',', num2str(target(3))]);
+            else
+                coder.ceval('sendTarget', int32(i), coder.ref(target));
+            end
+        end
 
+        % Wait for ACK from all clients
         if coder.target('MATLAB')
-            disp(['Sending TARGET to client ', num2str(i), ' (waypoint ', num2str(w), '): ', ...
-                  num2str(target(1)), ',', num2str(target(2)), ',', num2str(target(3))]);
+            disp('Waiting for ACK from all clients...');
         else
-            coder.ceval('sendTarget', int32(i), coder.ref(target));
+            coder.ceval('waitForAllMessageType', int32(numClients), ...
+                        int32(MESSAGE_TYPE.ACK));
         end
-    end
 
-    % Wait for ACK from all clients
-    if coder.target('MATLAB')
-        disp('Waiting for ACK from all clients...');
-    else
-        coder.ceval('waitForAllMessageType', int32(numClients), ...
-                    int32(MESSAGE_TYPE.ACK));
-    end
-
-    % Wait for READY from all clients (all arrived at waypoint w)
-    if coder.target('MATLAB')
-        disp(['All UAVs arrived at waypoint ', num2str(w)]);
-    else
-        coder.ceval('waitForAllMessageType', int32(numClients), ...
-                    int32(MESSAGE_TYPE.READY));
+        % Wait for READY from all clients (all arrived at waypoint w)
+        if coder.target('MATLAB')
+            disp(['All UAVs arrived at waypoint ', num2str(w)]);
+        else
+            coder.ceval('waitForAllMessageType', int32(numClients), ...
+                        int32(MESSAGE_TYPE.READY));
+        end
     end
 end
 
 % ---- Phase 2: miSim guidance loop ----------------------------------------
 % Guidance parameters (adjust here and recompile as needed)
 MAX_GUIDANCE_STEPS = int32(100); % number of guidance iterations
+% Streaming guidance: clients follow each target with rate-limited velocity
+% setpoints (client.yaml "guidance" section) instead of flying to it and
+% stopping, and the loop runs every STREAM_PERIOD_MS instead of waiting for
+% every UAV to arrive.
+STREAM_GUIDANCE  = false;
+STREAM_PERIOD_MS = int32(500);
+% Telemetry push: with a rate > 0 (Hz) clients send their position
+% unsolicited and each iteration reads the latest sample instead of a
+% REQUEST_POSITION/POSITION round trip per client.
+TELEMETRY_RATE_HZ = 0;
 
 % Enter guidance mode on all clients
 if ~coder.target('MATLAB')
-    coder.ceval('sendGuidanceToggle', int32(numClients));
+    if STREAM_GUIDANCE
+        coder.ceval('sendGuidanceStream', int32(numClients));
+    else
+        coder.ceval('sendGuidanceToggle', int32(numClients));
+    end
 end
 
 % Request initial GPS positions and initialise guidance algorithm
 positions = zeros(MAX_CLIENTS, 3);
 if ~coder.target('MATLAB')
-    coder.ceval('sendRequestPositions', int32(numClients));
-    coder.ceval('recvPositions', int32(numClients), coder.ref(positions), int32(MAX_CLIENTS));
+    if TELEMETRY_RATE_HZ > 0
+        coder.ceval('sendTelemetryRate', int32(numClients), double(TELEMETRY_RATE_HZ));
+        coder.ceval('readTelemetry', int32(numClients), coder.ref(positions), int32(MAX_CLIENTS));
+    else
+        coder.ceval('sendRequestPositions', int32(numClients));
+        coder.ceval('recvPositions', int32(numClients), coder.ref(positions), int32(MAX_CLIENTS));
+    end
 else
     % Simulation: seed positions from CSV waypoints so agents don't start at origin
     positions(1:totalLoaded, :) = targets(1:totalLoaded, :);
@@ -167,18 +209,29 @@ for step = 1:MAX_GUIDANCE_STEPS
         end
     end
 
-    % Wait for ACK from all clients (each UAV ACKs when it arrives at its target)
+    % Wait for ACK from all clients (each UAV ACKs when it arrives at its
+    % target), or in streaming mode for one control period while the UAVs
+    % keep moving
     if ~coder.target('MATLAB')
-        coder.ceval('waitForAllMessageType', int32(numClients), ...
-                    int32(MESSAGE_TYPE.ACK));
+        if STREAM_GUIDANCE
+            coder.ceval('sleepMs', STREAM_PERIOD_MS);
+        else
+            coder.ceval('waitForAllMessageType', int32(numClients), ...
+                        int32(MESSAGE_TYPE.ACK));
+        end
     else
         disp(['[guidance] step ', num2str(step), ': all UAVs arrived']);
     end
 
-    % Request current GPS positions from all clients
+    % Request current GPS positions from all clients (or take the latest
+    % pushed ones)
     if ~coder.target('MATLAB')
-        coder.ceval('sendRequestPositions', int32(numClients));
-        coder.ceval('recvPositions', int32(numClients), coder.ref(positions), int32(MAX_CLIENTS));
+        if TELEMETRY_RATE_HZ > 0
+            coder.ceval('readTelemetry', int32(numClients), coder.ref(positions), int32(MAX_CLIENTS));
+        else
+            coder.ceval('sendRequestPositions', int32(numClients));
+            coder.ceval('recvPositions', int32(numClients), coder.ref(positions), int32(MAX_CLIENTS));
+        end
     else
         % Simulation: advance positions to guidance outputs for closed-loop feedback
         positions(1:numClients, :) = nextPositions(1:numClients, :);
@@ -187,11 +240,19 @@ end
 
 % Exit guidance mode on all clients (second toggle)
 if ~coder.target('MATLAB')
-    coder.ceval('sendGuidanceToggle', int32(numClients));
+    if STREAM_GUIDANCE
+        coder.ceval('sendGuidanceStream', int32(numClients));
+    else
+        coder.ceval('sendGuidanceToggle', int32(numClients));
+    end
     % Wait for ACK from all clients: confirms each client has finished its
-    % last guidance navigation and is back in sequential (ACK/READY) mode.
+    % last guidance navigation (streaming: has stopped) and is back in
+    % sequential (ACK/READY) mode.
     coder.ceval('waitForAllMessageType', int32(numClients), ...
                 int32(MESSAGE_TYPE.ACK));
+    if TELEMETRY_RATE_HZ > 0
+        coder.ceval('sendTelemetryRate', int32(numClients), double(0));
+    end
     % Reset step counter so post-guidance logging carries no step prefix.
     coder.ceval('setGuidanceStep', int32(0), int32(MAX_GUIDANCE_STEPS));
 end
@@ -20,6 +20,28 @@ static int guidanceStep = 0;
 static int guidanceTotalSteps = 0;
 static struct timespec lastStepTime = {0, 0};
 
+// Latest TELEMETRY frame per client (time, ENU position, ENU velocity) and
+// the number of frames received from it
+#define TELEMETRY_FIELDS 7
+static std::vector<std::vector<double>> telemetry;
+static std::vector<long> telemetryCount;
+
+// Extended framing (enableExtendedFraming): every message's type byte is
+// followed by a 24-byte header -- uint32 sequence ID and double monotonic
+// send time of the message, then those of the message it answers.  Replies
+// echo our send time, so lastRtt is the controller-side round trip of the
+// last reply from each client.
+#define FRAME_HEADER_SIZE 24
+static bool extendedFraming = false;
+static uint32_t frameSeq = 0;
+static std::vector<double> lastRtt;
+
+static double monotonicNow() {
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return now.tv_sec + now.tv_nsec * 1e-9;
+}
+
 // During guidance returns "(%d/%d) "; outside guidance returns "HH:MM:SS ".
 static std::string logPrefix() {
     if (guidanceStep > 0) {
@@ -87,6 +109,9 @@ void acceptClient(int clientId) {
     int clientSock = accept(serverSocket, (sockaddr*)&clientAddr, &addrLen);
     if(clientSock < 0) { std::cerr << "Accept failed for client " << clientId << "\n"; return; }
     clientSockets.push_back(clientSock);
+    telemetry.push_back(std::vector<double>(TELEMETRY_FIELDS, 0.0));
+    telemetryCount.push_back(0);
+    lastRtt.push_back(-1.0);
     std::cout << "Client " << clientId << " connected\n";
 }
 
@@ -485,22 +510,109 @@ static const char* messageTypeName(uint8_t msgType) {
         case 6: return "GUIDANCE_TOGGLE";
         case 7: return "REQUEST_POSITION";
         case 8: return "POSITION";
+        case 9: return "GUIDANCE_STREAM";
+        case 10: return "TELEMETRY_RATE";
+        case 11: return "TELEMETRY";
+        case 12: return "TARGET_BATCH";
+        case 13: return "WAYPOINT_REACHED";
+        case 14: return "FRAMING";
         default: return "UNKNOWN";
     }
 }
 
-// Send a single-byte message type to a client (no logging)
-static int sendMessageTypeRaw(int clientId, int msgType) {
+// Read the 56-byte payload of a TELEMETRY frame from client index i
+// (0-based) into its latest sample
+static int recvTelemetryPayload(int i) {
+    double frame[TELEMETRY_FIELDS];
+    if (recv(clientSockets[i], frame, sizeof(frame), MSG_WAITALL) != (ssize_t)sizeof(frame)) {
+        std::cerr << "recvTelemetry: failed to read frame from client " << (i + 1) << "\n";
+        return 0;
+    }
+    memcpy(telemetry[i].data(), frame, sizeof(frame));
+    telemetryCount[i]++;
+    return 1;
+}
+
+// Payload size of each message a client may send (0 for none), or -1 for
+// types clients never send
+static int clientPayloadSize(uint8_t msgType) {
+    switch (msgType) {
+        case 2: return 0;                                      // ACK
+        case 3: return 0;                                      // READY
+        case 8: return 3 * sizeof(double);                     // POSITION
+        case 11: return TELEMETRY_FIELDS * sizeof(double);     // TELEMETRY
+        case 13: return sizeof(uint16_t);                      // WAYPOINT_REACHED
+        default: return -1;
+    }
+}
+
+// Read and drop the payload of an unexpected message from client index i
+// (0-based) so the next read starts on a type byte.  Fails for types
+// clients never send, whose size is unknown.
+static int skipUnexpected(const char* caller, int i, uint8_t msgType, uint8_t expected) {
+    int size = clientPayloadSize(msgType);
+    if (size < 0) {
+        std::cerr << caller << ": unknown message type " << (int)msgType
+                  << " from client " << (i + 1) << "\n";
+        return 0;
+    }
+    uint8_t payload[TELEMETRY_FIELDS * sizeof(double)];
+    if (size > 0 && recv(clientSockets[i], payload, size, MSG_WAITALL) != (ssize_t)size) {
+        std::cerr << caller << ": failed to read " << messageTypeName(msgType)
+                  << " from client " << (i + 1) << "\n";
+        return 0;
+    }
+    std::cerr << logPrefix() << "Unexpected " << messageTypeName(msgType)
+              << " from client " << (i + 1)
+              << " (expected " << messageTypeName(expected) << ")\n";
+    return 1;
+}
+
+// Read the extended framing header following a type byte from client
+// index i (0-based), if framing is on, and note the round trip it echoes
+static int recvFrameHeader(int i) {
+    if (!extendedFraming) return 1;
+    uint8_t header[FRAME_HEADER_SIZE];
+    if (recv(clientSockets[i], header, sizeof(header), MSG_WAITALL) != (ssize_t)sizeof(header)) {
+        std::cerr << "recvFrameHeader: failed to read header from client " << (i + 1) << "\n";
+        return 0;
+    }
+    uint32_t echoSeq;
+    double echoSent;
+    memcpy(&echoSeq, header + 12, sizeof(echoSeq));
+    memcpy(&echoSent, header + 16, sizeof(echoSent));
+    if (echoSeq != 0) lastRtt[i] = monotonicNow() - echoSent;
+    return 1;
+}
+
+// Send one message (type byte, framing header if on, payload) to a client
+// in a single send()
+static int sendFrame(int clientId, uint8_t msgType, const void* payload, size_t len) {
     if (clientId <= 0 || clientId > (int)clientSockets.size()) return 0;
-    uint8_t msg = (uint8_t)msgType;
-    ssize_t sent = send(clientSockets[clientId - 1], &msg, 1, 0);
-    if (sent != 1) {
-        std::cerr << "Send failed for client " << clientId << "\n";
+    std::vector<uint8_t> buffer(1 + (extendedFraming ? FRAME_HEADER_SIZE : 0) + len);
+    buffer[0] = msgType;
+    if (extendedFraming) {
+        uint32_t seq = ++frameSeq, noEcho = 0;
+        double sent = monotonicNow(), noSent = 0.0;
+        memcpy(&buffer[1], &seq, sizeof(seq));
+        memcpy(&buffer[5], &sent, sizeof(sent));
+        memcpy(&buffer[13], &noEcho, sizeof(noEcho));
+        memcpy(&buffer[17], &noSent, sizeof(noSent));
+    }
+    if (len > 0) memcpy(&buffer[buffer.size() - len], payload, len);
+    ssize_t sent = send(clientSockets[clientId - 1], buffer.data(), buffer.size(), 0);
+    if (sent != (ssize_t)buffer.size()) {
+        std::cerr << "Send " << messageTypeName(msgType) << " failed for client " << clientId << "\n";
         return 0;
     }
     return 1;
 }
 
+// Send a single-byte message type to a client (no logging)
+static int sendMessageTypeRaw(int clientId, int msgType) {
+    return sendFrame(clientId, (uint8_t)msgType, nullptr, 0);
+}
+
 // Send a single-byte message type to a client
 int sendMessageType(int clientId, int msgType) {
     if (!sendMessageTypeRaw(clientId, msgType)) return 0;
@@ -512,22 +624,40 @@ int sendMessageType(int clientId, int msgType) {
 int sendTarget(int clientId, const double* coords) {
     if (clientId <= 0 || clientId > (int)clientSockets.size()) return 0;
 
-    // Build message: 1 byte type + 3 doubles (little-endian)
-    uint8_t buffer[1 + 3 * sizeof(double)];
-    buffer[0] = 1;  // TARGET = 1
-    memcpy(buffer + 1, coords, 3 * sizeof(double));
-
-    ssize_t sent = send(clientSockets[clientId - 1], buffer, sizeof(buffer), 0);
-    if (sent != sizeof(buffer)) {
-        std::cerr << "Send target failed for client " << clientId << "\n";
-        return 0;
-    }
+    // 1 byte type + 3 doubles (little-endian)
+    if (!sendFrame(clientId, 1, coords, 3 * sizeof(double))) return 0;  // TARGET = 1
 
     std::cout << logPrefix() << "Sent TARGET to client " << clientId << ": "
               << coords[0] << "," << coords[1] << "," << coords[2] << "\n";
     return 1;
 }
 
+// Send TARGET_BATCH with count waypoints of one client: 1 byte type + count
+// (uint16) + flags (uint8, bit 0 = pass through intermediate waypoints) +
+// count * 3 doubles.  The waypoints are rows firstRow..firstRow+count-1
+// (0-based) of the column-major targets array with ldTargets rows.
+int sendTargetBatch(int clientId, const double* targets, int ldTargets,
+                    int firstRow, int count, int passThrough) {
+    if (clientId <= 0 || clientId > (int)clientSockets.size()) return 0;
+    if (count <= 0 || count > 65535) return 0;
+
+    std::vector<uint8_t> payload(3 + count * 3 * sizeof(double));
+    uint16_t n = (uint16_t)count;
+    memcpy(&payload[0], &n, sizeof(n));
+    payload[2] = passThrough ? 1 : 0;
+    for (int k = 0; k < count; k++) {
+        int r = firstRow + k;
+        double coords[3] = {targets[r], targets[r + ldTargets], targets[r + 2 * ldTargets]};
+        memcpy(&payload[3 + k * sizeof(coords)], coords, sizeof(coords));
+    }
+
+    if (!sendFrame(clientId, 12, payload.data(), payload.size())) return 0;  // TARGET_BATCH = 12
+
+    std::cout << logPrefix() << "Sent TARGET_BATCH to client " << clientId << ": "
+              << count << " waypoints" << (passThrough ? " (pass-through)" : "") << "\n";
+    return 1;
+}
+
 // Wait for a specific message type from ALL clients simultaneously using select()
 // Returns 1 if all clients responded with expected message type, 0 on failure
 int waitForAllMessageType(int numClients, int expectedType) {
@@ -570,20 +700,42 @@ int waitForAllMessageType(int numClients, int expectedType) {
                               << " while waiting for " << messageTypeName(expected) << "\n";
                     return 0;
                 }
+                if (!recvFrameHeader(i)) return 0;
+
+                if (msgType == 11) {  // TELEMETRY, pushed between replies
+                    if (!recvTelemetryPayload(i)) return 0;
+                    continue;
+                }
+
+                if (msgType == 13) {  // WAYPOINT_REACHED: batch progress
+                    uint16_t index;
+                    if (recv(clientSockets[i], &index, sizeof(index), MSG_WAITALL) != (ssize_t)sizeof(index)) {
+                        std::cerr << "waitForAllMessageType: failed to read WAYPOINT_REACHED from client "
+                                  << (i + 1) << "\n";
+                        return 0;
+                    }
+                    std::cout << logPrefix() << "Client " << (i + 1) << " reached batch waypoint "
+                              << index << "\n";
+                    continue;
+                }
 
                 if (msgType == expected) {
                     completed[i] = true;
                     completedCount++;
-                } else {
-                    std::cerr << logPrefix() << "Unexpected " << messageTypeName(msgType)
-                              << " from client " << (i + 1)
-                              << " (expected " << messageTypeName(expected) << ")\n";
+                } else if (!skipUnexpected("waitForAllMessageType", i, msgType, expected)) {
+                    return 0;
                 }
             }
         }
     }
 
-    std::cout << logPrefix() << "Received " << messageTypeName(expected) << " from all clients\n";
+    std::cout << logPrefix() << "Received " << messageTypeName(expected) << " from all clients";
+    if (extendedFraming) {
+        double maxRtt = 0.0;
+        for (int i = 0; i < numClients; i++) if (lastRtt[i] > maxRtt) maxRtt = lastRtt[i];
+        std::cout << " (max RTT " << maxRtt << " s)";
+    }
+    std::cout << "\n";
     return 1;
 }
 
@@ -595,6 +747,14 @@ void sendGuidanceToggle(int numClients) {
     std::cout << logPrefix() << "Sent GUIDANCE_TOGGLE to clients\n";
 }
 
+// Broadcast GUIDANCE_STREAM to all clients
+void sendGuidanceStream(int numClients) {
+    for (int i = 1; i <= numClients; i++) {
+        sendMessageTypeRaw(i, 9);  // GUIDANCE_STREAM = 9
+    }
+    std::cout << logPrefix() << "Sent GUIDANCE_STREAM to clients\n";
+}
+
 // Send REQUEST_POSITION to all clients
 int sendRequestPositions(int numClients) {
     for (int i = 1; i <= numClients; i++) {
@@ -614,15 +774,18 @@ int recvPositions(int numClients, double* positions, int maxClients) {
     for (int i = 0; i < numClients; i++) {
         // Expect: POSITION byte (1) + 3 doubles (24)
         uint8_t msgType;
-        if (recv(clientSockets[i], &msgType, 1, MSG_WAITALL) != 1) {
-            std::cerr << "recvPositions: failed to read msg type from client " << (i + 1) << "\n";
-            return 0;
-        }
-        if (msgType != 8) {  // POSITION = 8
-            std::cerr << "recvPositions: expected POSITION(8), got " << (int)msgType
-                      << " from client " << (i + 1) << "\n";
-            return 0;
-        }
+        do {
+            if (recv(clientSockets[i], &msgType, 1, MSG_WAITALL) != 1) {
+                std::cerr << "recvPositions: failed to read msg type from client " << (i + 1) << "\n";
+                return 0;
+            }
+            if (!recvFrameHeader(i)) return 0;
+            if (msgType == 11) {  // TELEMETRY
+                if (!recvTelemetryPayload(i)) return 0;
+            } else if (msgType != 8 && !skipUnexpected("recvPositions", i, msgType, 8)) {
+                return 0;
+            }
+        } while (msgType != 8);  // POSITION = 8
 
         double coords[3];
         if (recv(clientSockets[i], coords, sizeof(coords), MSG_WAITALL) != (ssize_t)sizeof(coords)) {
@@ -636,11 +799,87 @@ int recvPositions(int numClients, double* positions, int maxClients) {
         positions[i + 2 * maxClients] = coords[2];  // up    (z)
 
         std::cout << logPrefix() << "Position from client " << (i + 1) << ": "
-                  << coords[0] << "," << coords[1] << "," << coords[2] << "\n";
+                  << coords[0] << "," << coords[1] << "," << coords[2];
+        if (extendedFraming) std::cout << " (RTT " << lastRtt[i] << " s)";
+        std::cout << "\n";
+    }
+    return 1;
+}
+
+// Ask all clients to push TELEMETRY frames at rateHz (0 stops them)
+int sendTelemetryRate(int numClients, double rateHz) {
+    for (int i = 1; i <= numClients; i++) {
+        if (!sendFrame(i, 10, &rateHz, sizeof(rateHz))) return 0;  // TELEMETRY_RATE = 10
+    }
+    std::cout << logPrefix() << "Sent TELEMETRY_RATE " << rateHz << " Hz to clients\n";
+    return 1;
+}
+
+// Latest pushed position of all clients, in the same column-major layout as
+// recvPositions.  Takes in every TELEMETRY frame already received without
+// blocking and waits only for clients that have not reported yet.
+int readTelemetry(int numClients, double* positions, int maxClients) {
+    if (numClients <= 0 || numClients > (int)clientSockets.size()) return 0;
+
+    while (true) {
+        fd_set readfds;
+        FD_ZERO(&readfds);
+        int maxfd = -1;
+        bool waiting = false;
+        for (int i = 0; i < numClients; i++) {
+            FD_SET(clientSockets[i], &readfds);
+            if (clientSockets[i] > maxfd) maxfd = clientSockets[i];
+            if (telemetryCount[i] == 0) waiting = true;
+        }
+
+        struct timeval noWait = {0, 0};
+        int ready = select(maxfd + 1, &readfds, nullptr, nullptr, waiting ? nullptr : &noWait);
+        if (ready < 0) return 0;
+        if (ready == 0) break;  // nothing more buffered
+
+        for (int i = 0; i < numClients; i++) {
+            if (!FD_ISSET(clientSockets[i], &readfds)) continue;
+            uint8_t msgType;
+            if (recv(clientSockets[i], &msgType, 1, 0) != 1) {
+                std::cerr << "readTelemetry: client " << (i + 1) << " disconnected\n";
+                return 0;
+            }
+            if (!recvFrameHeader(i)) return 0;
+            if (msgType != 11) {  // TELEMETRY = 11
+                if (!skipUnexpected("readTelemetry", i, msgType, 11)) return 0;
+                continue;
+            }
+            if (!recvTelemetryPayload(i)) return 0;
+        }
+    }
+
+    struct timespec now;
+    clock_gettime(CLOCK_REALTIME, &now);
+    double nowSec = now.tv_sec + now.tv_nsec * 1e-9;
+    for (int i = 0; i < numClients; i++) {
+        const std::vector<double>& t = telemetry[i];
+        positions[i + 0 * maxClients] = t[1];  // east  (x)
+        positions[i + 1 * maxClients] = t[2];  // north (y)
+        positions[i + 2 * maxClients] = t[3];  // up    (z)
+
+        std::cout << logPrefix() << "Telemetry from client " << (i + 1) << ": "
+                  << t[1] << "," << t[2] << "," << t[3]
+                  << " (age " << (nowSec - t[0]) << " s)\n";
     }
     return 1;
 }
 
+// Switch every client to extended framing: FRAMING goes out plain, and
+// each client's ACK is the first framed message back
+int enableExtendedFraming(int numClients) {
+    for (int i = 1; i <= numClients; i++) {
+        if (!sendMessageTypeRaw(i, 14)) return 0;  // FRAMING = 14
+    }
+    extendedFraming = true;
+    std::cout << logPrefix() << "Sent FRAMING to clients\n";
+    return waitForAllMessageType(numClients, 2);  // ACK = 2
+}
+
 // Sleep for the given number of milliseconds
 void sleepMs(int ms) {
     struct timespec ts;
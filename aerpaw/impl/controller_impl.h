@@ -57,17 +57,26 @@ int loadObstacles(const char* filename,
                   int maxObstacles);
 
 // Binary protocol operations
+int enableExtendedFraming(int numClients);  // sequence ID + send time on every message
 int sendMessageType(int clientId, int msgType);
 int sendTarget(int clientId, const double* coords);
+// Waypoints firstRow..firstRow+count-1 (0-based) of a column-major [ldTargets x 3] array
+int sendTargetBatch(int clientId, const double* targets, int ldTargets,
+                    int firstRow, int count, int passThrough);
 int waitForAllMessageType(int numClients, int expectedType);
 
 // Guidance loop operations
 void setGuidanceStep(int step, int totalSteps);  // call at the top of each guidance iteration
 void sendGuidanceToggle(int numClients);
+void sendGuidanceStream(int numClients);  // streaming mode: targets are followed, not ACKed
 int  sendRequestPositions(int numClients);
 int  recvPositions(int numClients, double* positions, int maxClients); // column-major maxClients x 3
 void sleepMs(int ms);
 
+// Telemetry push (alternative to sendRequestPositions + recvPositions)
+int sendTelemetryRate(int numClients, double rateHz);  // 0 stops the push
+int readTelemetry(int numClients, double* positions, int maxClients);  // latest sample, column-major
+
 #ifdef __cplusplus
 }
 #endif
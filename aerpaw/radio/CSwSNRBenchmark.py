@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#
+# SPDX-License-Identifier: GPL-3.0
+#
+# Hardware-free channel sounder benchmark: the CSwSNRTX waveform chain feeds
+# the CSwSNRRX processing chain through a software channel (per-transmitter
+# TDM gating and path loss, AWGN, frequency offset).  No UHD blocks are used.
+#
+# Reports sustained samples/s, per-block work time from the GNU Radio
+# performance counters, end-to-end latency and CPU use, and fails (exit 1)
+# when the SNR measured by the RX chain is off from the injected SNR.
+#
+#   python3 CSwSNRBenchmark.py --num-uavs 2 --snr 10 --path-loss 0,6
+#
+
+import os
+# Performance counters have to be switched on before GNU Radio is loaded
+os.environ.setdefault('GR_CONF_PERFCOUNTERS_ON', 'True')
+
+from gnuradio import blocks
+from gnuradio import channels
+from gnuradio import gr
+import sys
+import math
+import resource
+import tempfile
+import time
+from argparse import ArgumentParser
+from gnuradio.eng_arg import eng_float, intx
+import numpy
+import pmt
+
+from CSwSNRRX import CSwSNRRX, RX_TIME, tdm_slot_ids
+from CSwSNRTX import CSwSNRWaveform
+import radio_performance
+
+
+class TdmGateSource(gr.sync_block):
+    """TDM gain envelope of one transmitter, standing in for the TX mute
+    thread.
+
+    Emits *gain* while *uav_id* owns the current slot (outside the guard
+    interval) and 0 otherwise.  Items are spaced 1/*gate_rate* seconds apart
+    in sample time, starting at *start_time*, so the schedule is exact
+    regardless of how fast the flowgraph runs; expand to samp_rate with
+    blocks.repeat.  With *tag_time* the first item carries an rx_time tag of
+    *start_time* so the RX attributes slots against the same clock.
+    """
+
+    def __init__(self, uav_id, num_uavs, slot_duration, guard_interval, gate_rate,
+                 start_time=0.0, gain=1.0, tag_time=False):
+        gr.sync_block.__init__(
+            self,
+            name='TDM Gate Source',
+            in_sig=None,
+            out_sig=[numpy.complex64])
+        self._uav_id = uav_id
+        self._num_uavs = num_uavs
+        self._slot_duration = slot_duration
+        self._guard_interval = guard_interval
+        self._gate_rate = gate_rate
+        self._gain = gain
+        self._tag_time = tag_time
+        self.start_time = start_time
+
+    def work(self, input_items, output_items):
+        out = output_items[0]
+        start = self.nitems_written(0)
+        if self._tag_time and start == 0:
+            secs = int(self.start_time)
+            self.add_item_tag(0, 0, RX_TIME, pmt.make_tuple(
+                pmt.from_uint64(secs), pmt.from_double(self.start_time - secs)))
+        times = self.start_time + numpy.arange(start, start + len(out)) / self._gate_rate
+        tx_ids = tdm_slot_ids(times, self._num_uavs, self._slot_duration, self._guard_interval)
+        out[:] = numpy.where(tx_ids == self._uav_id, self._gain, 0)
+        return len(out)
+
+
+class LoopbackChannel(gr.hier_block2):
+    """*num_uavs* channel sounder transmitters, each TDM-gated and attenuated
+    by its entry of *path_loss* (dB), summed and passed through
+    channels.channel_model for AWGN and *freq_offset* (Hz).
+
+    *snr* is the per-sample SNR (dB, over the full samp_rate bandwidth) of an
+    unattenuated transmitter at the output.  With *nsamples* the output stops
+    after that many samples; with *throttle* it is paced to that many
+    samples/s.
+    """
+
+    def __init__(self, samp_rate=2e6, sps=16, offset=250e3, num_uavs=1, slot_duration=0.5,
+                 guard_interval=0.05, path_loss=(0,), snr=10, freq_offset=0,
+                 gate_rate=1000, nsamples=0, throttle=0, seed=0, precompute=False):
+        gr.hier_block2.__init__(
+            self, "LoopbackChannel",
+            gr.io_signature(0, 0, 0),
+            gr.io_signature(1, 1, gr.sizeof_gr_complex*1),
+        )
+        gate_decim = max(int(round(samp_rate / gate_rate)), 1)
+
+        self.waveforms = []
+        self.gates = []
+        self.repeats = []
+        self.multiplies = []
+        self.blocks_add_0 = blocks.add_vcc(1)
+        for k in range(num_uavs):
+            waveform = CSwSNRWaveform(offset, samp_rate, sps, precompute=precompute)
+            gate = TdmGateSource(
+                k, num_uavs, slot_duration, guard_interval, samp_rate / gate_decim,
+                gain=10 ** (-path_loss[k] / 20), tag_time=(k == 0))
+            repeat = blocks.repeat(gr.sizeof_gr_complex*1, gate_decim)
+            multiply = blocks.multiply_vcc(1)
+            self.connect((waveform, 0), (multiply, 0))
+            self.connect((gate, 0), (repeat, 0))
+            self.connect((repeat, 0), (multiply, 1))
+            self.connect((multiply, 0), (self.blocks_add_0, k))
+            self.waveforms.append(waveform)
+            self.gates.append(gate)
+            self.repeats.append(repeat)
+            self.multiplies.append(multiply)
+
+        self.injected_snr = [snr - path_loss[k] for k in range(num_uavs)]
+        noise_voltage = math.sqrt(self.waveforms[0].power() / 10 ** (snr / 10))
+        self.channels_channel_model_0 = channels.channel_model(
+            noise_voltage=noise_voltage,
+            frequency_offset=freq_offset / samp_rate,
+            epsilon=1.0,
+            taps=[1.0 + 0.0j],
+            noise_seed=seed,
+            block_tags=False)
+        self.connect((self.blocks_add_0, 0), (self.channels_channel_model_0, 0))
+
+        last = self.channels_channel_model_0
+        if nsamples > 0:
+            self.blocks_head_0 = blocks.head(gr.sizeof_gr_complex*1, int(nsamples))
+            self.connect((last, 0), (self.blocks_head_0, 0))
+            last = self.blocks_head_0
+        if throttle > 0:
+            self.blocks_throttle_0 = blocks.throttle(gr.sizeof_gr_complex*1, throttle, True)
+            self.connect((last, 0), (self.blocks_throttle_0, 0))
+            last = self.blocks_throttle_0
+        self.connect((last, 0), (self, 0))
+
+    def set_start_time(self, start_time):
+        """Anchor the TDM schedule and the rx_time tag; call before start()."""
+        for gate in self.gates:
+            gate.start_time = start_time
+
+
+def perf_counters(root):
+    """Per-block (name, work seconds, items) from the GNU Radio performance
+    counters, for every block reachable from *root*'s attributes.  Items are
+    those written on output 0, or read on input 0 for sinks."""
+    try:
+        tps = gr.high_res_timer_tps()
+    except AttributeError:
+        tps = 1e9
+    rows = []
+    for name, b in radio_performance.iter_blocks(root):
+        try:
+            work = b.pc_work_time_total() / tps
+        except (AttributeError, RuntimeError):
+            continue
+        try:
+            nitems = b.nitems_written(0)
+        except (AttributeError, RuntimeError, IndexError):
+            nitems = b.nitems_read(0)
+        rows.append((name, work, int(nitems)))
+    return sorted(rows, key=lambda r: -r[1])
+
+
+def load_metrics(path, settle):
+    """Metrics rows (aligned CSV layout) after the first *settle* seconds."""
+    data = numpy.genfromtxt(path, delimiter=',', names=True)
+    data = numpy.atleast_1d(data)
+    if len(data) == 0:
+        return data
+    return data[data['timestamp'] >= data['timestamp'][0] + settle]
+
+
+def run(options, nsamples, throttle):
+    """Build and run one loopback flowgraph; returns (top block, channel,
+    wall seconds, CPU seconds, latency samples)."""
+    chan = LoopbackChannel(
+        samp_rate=options.samp_rate, sps=options.sps, offset=options.offset,
+        num_uavs=options.num_uavs, slot_duration=options.slot_duration,
+        guard_interval=options.guard_interval, path_loss=options.path_loss,
+        snr=options.snr, freq_offset=options.freq_offset,
+        nsamples=nsamples, throttle=throttle, seed=options.seed,
+        precompute=options.precompute)
+    tb = CSwSNRRX(
+        noise=0, gainrx=0, offset=options.offset, samp_rate=options.samp_rate,
+        sps=options.sps, num_uavs=options.num_uavs,
+        slot_duration=options.slot_duration, guard_interval=options.guard_interval,
+        metric_format='csv', metrics_layout='aligned',
+        output_dir=options.output_dir, source=chan,
+        moving_average_max_iter=options.performance['moving_average_max_iter'])
+    radio_performance.apply(tb, options.performance)
+
+    latencies = []
+    ru0 = resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.time()
+    chan.set_start_time(t0)
+    radio_performance.start(tb, options.performance)
+    if throttle > 0:
+        # The throttle releases sample n at about t0 + n/samp_rate, which is
+        # also its rx_time, so host time minus the newest sample time seen by
+        # the metrics sink is the end-to-end latency.
+        while time.time() - t0 < nsamples / options.samp_rate:
+            last = tb.metric_sinks[0].last_sample_time
+            if last is not None:
+                latencies.append(time.time() - last)
+            time.sleep(0.01)
+    tb.wait()
+    wall = time.time() - t0
+    ru1 = resource.getrusage(resource.RUSAGE_SELF)
+    cpu = (ru1.ru_utime - ru0.ru_utime) + (ru1.ru_stime - ru0.ru_stime)
+    return tb, chan, wall, cpu, numpy.asarray(latencies)
+
+
+def argument_parser():
+    description = 'Hardware-free TX -> channel -> RX channel sounder benchmark'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "--samp-rate", dest="samp_rate", type=eng_float, default="2.0M",
+        help="Set samp_rate [default=%(default)r]")
+    parser.add_argument(
+        "--sps", dest="sps", type=intx, default=16,
+        help="Set sps [default=%(default)r]")
+    parser.add_argument(
+        "--offset", dest="offset", type=eng_float, default="250.0k",
+        help="Set offset [default=%(default)r]")
+    parser.add_argument(
+        "--num-uavs", dest="num_uavs", type=int, default=2,
+        help="Number of TDM-muted transmitters [default=%(default)r]")
+    parser.add_argument(
+        "--slot-duration", dest="slot_duration", type=float, default=0.5,
+        help="TDM slot duration in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--guard-interval", dest="guard_interval", type=float, default=0.05,
+        help="TDM guard interval in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--snr", dest="snr", type=float, default=10.0,
+        help="Per-sample SNR in dB of an unattenuated transmitter [default=%(default)r]")
+    parser.add_argument(
+        "--path-loss", dest="path_loss",
+        type=lambda s: [float(v) for v in s.split(',') if v.strip()], default=None,
+        help="Comma-separated path loss in dB per transmitter [default: 0 for all]")
+    parser.add_argument(
+        "--freq-offset", dest="freq_offset", type=eng_float, default="1.0k",
+        help="Carrier frequency offset in Hz [default=%(default)r]")
+    parser.add_argument(
+        "--duration", dest="duration", type=float, default=20.0,
+        help="Seconds of signal for the unthrottled throughput run [default=%(default)r]")
+    parser.add_argument(
+        "--latency-duration", dest="latency_duration", type=float, default=5.0,
+        help="Seconds of the real-time latency run, 0 to skip [default=%(default)r]")
+    parser.add_argument(
+        "--settle", dest="settle", type=float, default=2.0,
+        help="Seconds of metrics ignored while the loops converge [default=%(default)r]")
+    parser.add_argument(
+        "--calibration", dest="calibration", type=float, default=0.0,
+        help="dB subtracted from quality minus processing gain to get the "
+             "measured SNR [default=%(default)r]")
+    parser.add_argument(
+        "--tolerance", dest="tolerance", type=float, default=3.0,
+        help="Largest |measured - injected| SNR in dB that passes [default=%(default)r]")
+    parser.add_argument(
+        "--precompute", dest="precompute", action="store_true",
+        help="Play the transmitters' waveforms from precomputed periods")
+    parser.add_argument(
+        "--seed", dest="seed", type=int, default=0,
+        help="AWGN seed [default=%(default)r]")
+    parser.add_argument(
+        "--output-dir", dest="output_dir", type=str, default=None,
+        help="Directory for the RX metric files [default: a temporary directory]")
+    radio_performance.add_arguments(parser)
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    if options.path_loss is None:
+        options.path_loss = [0.0] * options.num_uavs
+    if len(options.path_loss) != options.num_uavs:
+        print(f"[BENCH] --path-loss needs {options.num_uavs} values")
+        sys.exit(2)
+    if options.output_dir is None:
+        options.output_dir = tempfile.mkdtemp(prefix='cswsnr_bench_')
+    # No client.yaml: flags or defaults only
+    options.performance = radio_performance.resolve(options, {})
+
+    nsamples = int(options.duration * options.samp_rate)
+    print(f"[BENCH] {options.num_uavs} TX, snr={options.snr} dB, "
+          f"path_loss={options.path_loss} dB, freq_offset={options.freq_offset} Hz, "
+          f"{nsamples} samples, metrics in {options.output_dir}")
+
+    ##################################################
+    # Throughput
+    ##################################################
+    tb, chan, wall, cpu, _ = run(options, nsamples, 0)
+    print(f"[BENCH] Throughput: {nsamples / wall / 1e6:.2f} MS/s "
+          f"({nsamples / wall / options.samp_rate:.1f}x real time), "
+          f"{wall:.2f} s wall, CPU {cpu / wall:.2f} cores")
+    counters = perf_counters(tb)
+    total = sum(r[1] for r in counters) or 1.0
+    print(f"[BENCH] {'block':<48} {'work s':>8} {'%':>6} {'items':>12}")
+    for name, work, nproduced in counters:
+        print(f"[BENCH] {name:<48} {work:8.3f} {100 * work / total:6.1f} {nproduced:12d}")
+
+    ##################################################
+    # SNR check
+    ##################################################
+    metrics = load_metrics(os.path.join(options.output_dir, 'Metrics'), options.settle)
+    processing_gain = 10 * math.log10(options.sps * 4095)
+    passed = True
+    for k, injected in enumerate(chan.injected_snr):
+        quality = metrics['quality'][metrics['tx_uav_id'] == k] if len(metrics) else []
+        quality = numpy.asarray(quality)[numpy.isfinite(quality)]
+        if len(quality) == 0:
+            print(f"[BENCH] TX {k}: no metrics  FAIL")
+            passed = False
+            continue
+        measured = quality.mean() - processing_gain - options.calibration
+        ok = abs(measured - injected) <= options.tolerance
+        passed = passed and ok
+        print(f"[BENCH] TX {k}: injected {injected:6.2f} dB, measured {measured:6.2f} dB "
+              f"(+/-{quality.std():.2f}, n={len(quality)})  {'PASS' if ok else 'FAIL'}")
+    if len(metrics):
+        freq = metrics['freq_offset'][numpy.isfinite(metrics['freq_offset'])]
+        if len(freq):
+            print(f"[BENCH] Frequency offset: injected {options.freq_offset:.1f} Hz, "
+                  f"FLL {numpy.median(freq):.1f} Hz")
+
+    ##################################################
+    # Latency
+    ##################################################
+    if options.latency_duration > 0:
+        _, _, wall, cpu, lat = run(
+            options, int(options.latency_duration * options.samp_rate), options.samp_rate)
+        if len(lat):
+            print(f"[BENCH] Latency: median {1e3 * numpy.median(lat):.1f} ms, "
+                  f"p95 {1e3 * numpy.percentile(lat, 95):.1f} ms, "
+                  f"max {1e3 * lat.max():.1f} ms; CPU at real time {cpu / wall:.2f} cores")
+        else:
+            print("[BENCH] Latency: no metrics produced")
+
+    print(f"[BENCH] {'PASS' if passed else 'FAIL'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
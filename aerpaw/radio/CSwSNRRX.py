@@ -12,8 +12,8 @@
 from gnuradio import analog
 from gnuradio import blocks
 from gnuradio import digital
-from gnuradio import filter
 from gnuradio.filter import firdes
+from gnuradio.filter import pfb
 from gnuradio import gr
 import sys
 import signal
@@ -23,7 +23,19 @@ from gnuradio import eng_notation
 from gnuradio import uhd
 import time
 import epy_block_0
+from tdm_schedule import TdmSchedule, MAX_SLOTS
+from radio_channel import fdma_channel, ClockTracker
+from metric_stream import MetricPublisher
+from metric_log import SegmentedFile
 import math
+import numpy
+import os
+import pmt
+import warnings
+from radio_control import ControlServer
+import radio_health
+import radio_performance
+import tempfile
 import threading
 
 
@@ -48,189 +60,833 @@ def derive_num_uavs_from_csv(csv_path=None):
     return n_vals // 3
 
 
+RX_TIME = pmt.intern('rx_time')
+
+
+def tdm_slot_ids(times, num_uavs, slot_duration, guard_interval):
+    """Map wall-clock times (seconds, scalar or array) to the TX UAV ID whose
+    TDM slot contains them, or -1 inside the guard interval.
+
+    Slot assignment:  current_slot = floor(utc_time / slot_duration) % num_uavs
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    slot_time = numpy.mod(times, slot_duration * num_uavs)
+    current_slot = numpy.floor(slot_time / slot_duration)
+    time_into_slot = slot_time - current_slot * slot_duration
+    return numpy.where(time_into_slot < guard_interval, -1, current_slot).astype(numpy.int8)
+
+
+def read_iq_metadata(hdr_path):
+    """Read the detached file_meta header written by ``--record``.
+
+    Returns ``(rx_rate, extras)`` where *extras* is the header's extra
+    dictionary as Python values (e.g. ``rx_clock_offset``).
+    """
+    from gnuradio.blocks import parse_file_metadata
+    with open(hdr_path, 'rb') as f:
+        header = pmt.deserialize_str(f.read(parse_file_metadata.HEADER_LENGTH))
+        info = parse_file_metadata.parse_header(header, False)
+        extras = {}
+        if info['extra_len'] > 0:
+            extra = pmt.deserialize_str(f.read(info['extra_len']))
+            extras = parse_file_metadata.parse_extra_dict(extra, {}, False)
+    return info['rx_rate'], {k: pmt.to_python(v) for k, v in extras.items()}
+
+
+class SlotAggregator(object):
+    """Reduce time-ordered tagged samples to one statistics record per
+    (TDM frame, tx_uav_id).
+
+    Samples are grouped by the global slot index of *schedule* (by default
+    floor(time / slot_duration)); a slot's record is emitted as soon as a
+    sample from a later slot arrives, so records lag the air interface by at
+    most one slot.  Guard-interval samples (tx_uav_id -1) are dropped.
+
+    Each record row is::
+
+        tx_uav_id, frame, timestamp, count, mean, median, min, max, p<q>...
+
+    where timestamp is the mean wall-clock capture time of the slot's samples
+    and p<q> are the requested *percentiles*.  With several metric *names* the
+    statistics repeat per metric, prefixed ``<name>_``.  NaN values (e.g.
+    freq_offset before the first FLL sample) are left out of their metric's
+    statistics, which are NaN only if the slot has no finite value at all;
+    count is the number of samples in the slot.
+    """
+
+    STATS = ['mean', 'median', 'min', 'max']
+
+    def __init__(self, num_uavs, slot_duration, percentiles=(5, 95), names=('value',),
+                 schedule=None):
+        self._schedule = schedule if schedule is not None else TdmSchedule(num_uavs, slot_duration, 0)
+        self._percentiles = [50] + list(percentiles)
+        self._slots = numpy.empty(0, dtype=numpy.int64)
+        self._tx_ids = numpy.empty(0, dtype=numpy.int8)
+        self._times = numpy.empty(0, dtype=numpy.float64)
+        self._vals = numpy.empty((0, len(names)), dtype=numpy.float32)
+        stats = self.STATS + [f'p{q:g}' for q in percentiles]
+        self._n_stats = len(stats)
+        if len(names) == 1:
+            stat_columns = stats
+        else:
+            stat_columns = [f'{name}_{stat}' for name in names for stat in stats]
+        self.columns = ['tx_uav_id', 'frame', 'timestamp', 'count'] + stat_columns
+
+    def add(self, times, tx_ids, vals):
+        """Append samples (*vals* of shape (n,) or (n, len(names))) and return
+        the rows of every completed slot as an (n_records, len(columns))
+        float64 array."""
+        keep = tx_ids >= 0
+        self._slots = numpy.concatenate(
+            (self._slots, self._schedule.slot_keys(times[keep])))
+        self._tx_ids = numpy.concatenate((self._tx_ids, tx_ids[keep]))
+        self._times = numpy.concatenate((self._times, times[keep]))
+        self._vals = numpy.concatenate(
+            (self._vals, numpy.reshape(vals, (len(keep), -1))[keep]))
+        if len(self._slots) == 0:
+            return self._reduce(0)
+        # The newest slot may still be filling
+        changes = numpy.flatnonzero(numpy.diff(self._slots))
+        return self._reduce(int(changes[-1]) + 1 if len(changes) else 0)
+
+    def flush(self):
+        """Return the rows of all pending slots, complete or not."""
+        return self._reduce(len(self._slots))
+
+    def _reduce(self, n_done):
+        slots, self._slots = self._slots[:n_done], self._slots[n_done:]
+        tx_ids, self._tx_ids = self._tx_ids[:n_done], self._tx_ids[n_done:]
+        times, self._times = self._times[:n_done], self._times[n_done:]
+        vals, self._vals = self._vals[:n_done], self._vals[n_done:]
+
+        # Runs of equal slot keys; keys only go backwards if the TDM
+        # schedule is reconfigured, which then just starts a new slot
+        starts = numpy.flatnonzero(numpy.diff(slots, prepend=slots[:1] - 1)) if n_done else []
+        bounds = numpy.append(starts, n_done)
+        rows = numpy.empty((len(starts), len(self.columns)), dtype=numpy.float64)
+        for i, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+            v = vals[a:b]
+            if numpy.isnan(v).any():
+                with warnings.catch_warnings():
+                    # All-NaN columns just give NaN statistics
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    pct = numpy.nanpercentile(v, self._percentiles, axis=0)
+                    stats = numpy.vstack((numpy.nanmean(v, axis=0), pct[0], numpy.nanmin(v, axis=0),
+                                          numpy.nanmax(v, axis=0), pct[1:]))
+            else:
+                pct = numpy.percentile(v, self._percentiles, axis=0)
+                stats = numpy.vstack((v.mean(axis=0), pct[0], v.min(axis=0), v.max(axis=0), pct[1:]))
+            rows[i, :4] = (tx_ids[a], slots[a] // MAX_SLOTS, times[a:b].mean(), b - a)
+            rows[i, 4:] = stats.T.ravel()
+        return rows
+
+
+class RxSampleClock(object):
+    """Wall-clock capture time of the samples arriving on one block input.
+
+    A sample's time is the most recent ``rx_time`` stream tag (device time,
+    converted to host wall-clock time with *clock_offset*) plus the samples
+    elapsed since that tag divided by *item_rate*, the sample rate at that
+    input.  Until the first rx_time tag arrives the clock is anchored once to
+    host time.  With a *clock* (radio_channel.ClockTracker) its current
+    offset replaces *clock_offset*, so the times follow device clock drift.
+    """
+
+    def __init__(self, item_rate, clock_offset=0.0, clock=None):
+        self.item_rate = item_rate
+        self._clock_offset = clock_offset
+        self._tracker = clock
+        # Device time of the latest anchor sample
+        self._anchor_offset = None
+        self._anchor_time = None
+
+    @property
+    def clock_offset(self):
+        if self._tracker is not None:
+            return self._tracker.update()
+        return self._clock_offset
+
+    def sample_times(self, block, port, n):
+        """Capture times of the next *n* items on input *port* of *block*."""
+        start = block.nitems_read(port)
+        clock_offset = self.clock_offset
+        offsets, times = [], []
+        if self._anchor_offset is not None:
+            offsets.append(self._anchor_offset)
+            times.append(self._anchor_time)
+        for tag in block.get_tags_in_window(port, 0, n, RX_TIME):
+            offsets.append(tag.offset)
+            times.append(pmt.to_uint64(pmt.tuple_ref(tag.value, 0))
+                         + pmt.to_double(pmt.tuple_ref(tag.value, 1)))
+        if not offsets or offsets[0] > start:
+            # No rx_time seen yet: count samples from host time instead.
+            offsets.insert(0, start)
+            times.insert(0, time.time() - clock_offset)
+
+        offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        times = numpy.asarray(times, dtype=numpy.float64)
+        samples = numpy.arange(start, start + n, dtype=numpy.int64)
+        idx = numpy.searchsorted(offsets, samples, side='right') - 1
+        self._anchor_offset, self._anchor_time = int(offsets[-1]), float(times[-1])
+        return times[idx] + (samples - offsets[idx]) / self.item_rate + clock_offset
+
+
+class MetricRecordWriter(object):
+    """Buffered file writer for TDM-tagged metric records.
+
+    Three record formats are supported:
+
+    * ``csv`` (default) -- one text row per sample, preceded by a header
+      line: ``[timestamp,]tx_uav_id,<names...>``.
+    * ``binary`` -- packed little-endian records of [float64 timestamp,]
+      int8 tx_uav_id and one float32 per metric, no header.
+    * ``aggregate`` -- one CSV row of slot statistics per (TDM frame,
+      tx_uav_id) instead of per sample; see :class:`SlotAggregator`.
+
+    Formatting is done on whole buffers at once, and the file is written
+    through a large buffer that is flushed at most every *flush_interval*
+    seconds, so callers never pay for per-sample Python work or per-call
+    flushes.
+
+    One writer may be shared by several sinks (e.g. the per-transmitter
+    chains of FDMA mode): each sink calls :meth:`attach` once and
+    :meth:`close` when it stops, writes are serialized, aggregation is kept
+    per *stream*, and the file is closed when the last sink detaches.
+
+    With a *publisher* (metric_stream.MetricPublisher) the slot aggregates
+    are also sent live, whatever the file format, under the file's name.
+
+    A *segment_size* (bytes) or *segment_seconds* bound writes the file as
+    indexed segments, compressed in the background with *compress*; see
+    metric_log.SegmentedFile.
+    """
+
+    FORMATS = ('csv', 'binary', 'aggregate')
+    # Sinks tag samples themselves; see RemoteMetricWriter
+    remote = False
+
+    def __init__(self, filepath, names, num_uavs, slot_duration, record_format='csv',
+                 timestamps=False, flush_interval=0.1, buffer_size=1 << 20,
+                 percentiles=(5, 95), schedule=None, publisher=None, segment_size=0,
+                 segment_seconds=0, compress='gzip'):
+        if record_format not in self.FORMATS:
+            raise ValueError(f"Unknown record format '{record_format}'; "
+                             f"expected 'csv', 'binary' or 'aggregate'")
+        self._record_format = record_format
+        self._timestamps = timestamps
+        self._flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._aggregators = {}
+        self._new_aggregator = lambda: SlotAggregator(num_uavs, slot_duration, percentiles, names, schedule)
+        self._lock = threading.Lock()
+        self._users = 0
+        self._closed = False
+        self._buffer_size = buffer_size
+        self._publisher = publisher
+        self._segment_size = segment_size
+        self._segment_seconds = segment_seconds
+        self._compress = compress
+        self.name = os.path.basename(filepath)
+        if publisher is not None:
+            publisher.register(self.name, self._new_aggregator().columns)
+
+        self._header = None
+        if record_format == 'aggregate':
+            columns = self._new_aggregator().columns
+            self._row = '%d,%d,%.6f,%d' + ',%.7g' * (len(columns) - 4) + '\n'
+            self._header = columns
+        elif record_format == 'binary':
+            fields = [('timestamp', '<f8')] if timestamps else []
+            fields += [('tx_uav_id', '<i1')] + [(name, '<f4') for name in names]
+            self._dtype = numpy.dtype(fields)
+        else:
+            self._row = ('%.6f,' if timestamps else '') + '%d' + ',%.7g' * len(names) + '\n'
+            self._header = (['timestamp'] if timestamps else []) + ['tx_uav_id'] + list(names)
+        self._f = None
+        self._open(filepath)
+
+    def _open(self, filepath):
+        self.filepath = filepath
+        if filepath is None:
+            return
+        header = (','.join(self._header) + '\n').encode('ascii') if self._header is not None else b''
+        if self._segment_size or self._segment_seconds:
+            self._f = SegmentedFile(filepath, header, self._buffer_size, self._segment_size,
+                                    self._segment_seconds, self._compress)
+            return
+        self._f = open(filepath, 'wb', buffering=self._buffer_size)
+        self._f.write(header)
+
+    def _close_file(self):
+        """Flush pending slot aggregates and close the current file."""
+        for aggregator in self._aggregators.values():
+            rows = aggregator.flush()
+            if self._publisher is not None:
+                self._publisher.publish(self.name, rows)
+            if self._record_format == 'aggregate' and self._f is not None:
+                self._emit(self._format_rows(rows), rows[:, 2], rows[:, 0])
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def reopen(self, filepath):
+        """Continue in a new file, or stop writing files (but keep
+        publishing) if *filepath* is None."""
+        with self._lock:
+            if self._closed:
+                return
+            self._close_file()
+            self._open(filepath)
+
+    def _format_rows(self, rows):
+        # One C-level %-format over the whole buffer instead of a Python
+        # f-string per row ('%d' truncates the float-typed integer columns).
+        return ((self._row * len(rows)) % tuple(rows.ravel().tolist())).encode('ascii')
+
+    def _emit(self, data, times, tx_ids):
+        self._f.write(data)
+        if isinstance(self._f, SegmentedFile):
+            self._f.note(times, tx_ids)
+
+    def attach(self):
+        with self._lock:
+            self._users += 1
+        return self
+
+    def write(self, times, tx_ids, vals, stream=0):
+        """Write samples: *vals* has shape (n,) or (n, len(names)).  *stream*
+        identifies the time-ordered sample stream, for aggregation."""
+        vals = numpy.reshape(vals, (len(tx_ids), -1))
+        with self._lock:
+            self._write(times, tx_ids, vals, stream)
+
+    def _write(self, times, tx_ids, vals, stream):
+        if self._record_format == 'aggregate' or self._publisher is not None:
+            if stream not in self._aggregators:
+                self._aggregators[stream] = self._new_aggregator()
+            rows = self._aggregators[stream].add(times, tx_ids, vals)
+            if self._publisher is not None:
+                self._publisher.publish(self.name, rows)
+
+        if self._f is None:
+            return
+        if self._record_format == 'aggregate':
+            self._emit(self._format_rows(rows), rows[:, 2], rows[:, 0])
+        elif self._record_format == 'binary':
+            rec = numpy.empty(len(tx_ids), dtype=self._dtype)
+            if self._timestamps:
+                rec['timestamp'] = times
+            rec['tx_uav_id'] = tx_ids
+            for i, name in enumerate(self._dtype.names[-vals.shape[1]:]):
+                rec[name] = vals[:, i]
+            self._emit(rec.tobytes(), times, tx_ids)
+        else:
+            cols = ([times] if self._timestamps else []) + [tx_ids]
+            rows = numpy.column_stack(cols + [vals]).astype(numpy.float64, copy=False)
+            self._emit(self._format_rows(rows), times, tx_ids)
+        if isinstance(self._f, SegmentedFile):
+            self._f.maybe_rotate()
+
+        now = time.monotonic()
+        if now - self._last_flush >= self._flush_interval:
+            self._f.flush()
+            self._last_flush = now
+
+    def close(self):
+        with self._lock:
+            self._users -= 1
+            if self._users > 0 or self._closed:
+                return
+            self._close_file()
+            self._closed = True
+
+
+class RemoteMetricWriter(object):
+    """Stand-in for a MetricRecordWriter that lives in a
+    :class:`MetricWriterProcess`.
+
+    Each :meth:`attach` returns a handle with its own shared-memory ring
+    (metric_ring.MetricRing), so every sink is the single producer of its
+    ring and :meth:`write` is a memory copy that never waits for the writer
+    process or the disk; blocks are dropped (and counted) if the ring is
+    full.  TDM slot tagging moves to the writer process too: sinks pass
+    *tx_ids* None instead of calling the schedule.
+    """
+
+    remote = True
+
+    def __init__(self, process, index, name, ring=None):
+        self._process = process
+        self._index = index
+        self._ring = ring
+        self.name = name
+
+    def attach(self):
+        return RemoteMetricWriter(self._process, self._index, self.name,
+                                  self._process.new_ring(self._index))
+
+    @property
+    def dropped(self):
+        return self._ring.dropped if self._ring is not None else 0
+
+    def write(self, times, tx_ids, vals, stream=0):
+        # A fixed tx_id (FDMA) is sent once per block, -1 asks the writer
+        # process to tag from the TDM schedule
+        tx_id = int(tx_ids[0]) if tx_ids is not None and len(tx_ids) else -1
+        self._ring.push(self._index, tx_id, 0, times, vals)
+
+    def reopen(self, filepath):
+        self._process.command('reopen', self._index, filepath)
+
+    def close(self):
+        if self._ring is not None:
+            self._process.release_ring(self._ring)
+            self._ring = None
+
+
+def _metric_writer_main(specs, schedule_args, publish, commands):
+    """Body of the metric writer process: MetricRecordWriter(**spec) for each
+    of *specs*, fed from the rings announced on the *commands* queue."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import queue
+    from metric_ring import MetricRing
+    schedule = TdmSchedule(*schedule_args)
+    publisher = MetricPublisher(publish) if publish else None
+    writers = [MetricRecordWriter(schedule=schedule, publisher=publisher, **spec) for spec in specs]
+    rings = {}
+
+    def drain(ring, until=None):
+        busy = False
+        while True:
+            msg = ring.pop(until)
+            if msg is None:
+                return busy
+            index, tx_id, _, times, vals = msg
+            if tx_id < 0:
+                tx_ids = schedule.slot_ids(times)
+            else:
+                tx_ids = numpy.full(len(times), tx_id, dtype=numpy.int8)
+            writers[index].write(times, tx_ids, vals, stream=ring.path)
+            busy = True
+
+    running = True
+    idle = False
+    while running:
+        # Heads are read before the queue, so a command queued after this
+        # check carries marks at or beyond them and blocks pushed after a
+        # command are never written before it
+        heads = [(ring, ring.head) for ring, _ in list(rings.values())]
+        try:
+            cmd = commands.get(timeout=0.005) if idle else commands.get_nowait()
+        except queue.Empty:
+            idle = True
+            for ring, head in heads:
+                if drain(ring, head):
+                    idle = False
+            continue
+        idle = False
+        # Everything a sink pushed before the command goes out first
+        marks, cmd = cmd[0], cmd[1:]
+        for path, head in marks.items():
+            if path in rings:
+                drain(rings[path][0], head)
+        if cmd[0] == 'ring':
+            _, path, index = cmd
+            rings[path] = (MetricRing(path), index)
+            writers[index].attach()
+        elif cmd[0] == 'release':
+            ring, index = rings.pop(cmd[1])
+            if ring.dropped:
+                print(f"[RX] Warning: {writers[index].name}: {ring.dropped} metric "
+                      f"blocks dropped, writer process fell behind")
+            ring.close()
+            writers[index].close()
+        elif cmd[0] == 'reopen':
+            writers[cmd[1]].reopen(cmd[2])
+        elif cmd[0] == 'set_static':
+            schedule.set_static(*cmd[1:])
+        elif cmd[0] == 'stop':
+            running = False
+    for ring, index in rings.values():
+        ring.close()
+        writers[index].close()
+    if publisher is not None:
+        publisher.close()
+
+
+class MetricWriterProcess(object):
+    """Separate process doing the TDM tagging, aggregation, publishing and
+    file I/O of the RX metric streams, so the flowgraph threads only copy
+    samples into shared memory (see :class:`RemoteMetricWriter`).
+
+    *schedule_args* are the TdmSchedule arguments (num_uavs, slot_duration,
+    guard_interval, path); the writer process keeps its own copy of the
+    schedule, updated through :meth:`set_static`.  Rings of *ring_size*
+    bytes are created in /dev/shm when available.
+    """
+
+    def __init__(self, schedule_args, publish=None, ring_size=16 << 20):
+        import multiprocessing
+        self._ctx = multiprocessing.get_context('spawn')
+        self._commands = self._ctx.Queue()
+        self._schedule_args = schedule_args
+        self._publish = publish
+        self._ring_size = ring_size
+        self._specs = []
+        self._dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        self._rings = 0
+        self._live = {}
+        self.process = None
+
+    def writer(self, filepath, names, **kwargs):
+        """RemoteMetricWriter for a MetricRecordWriter(filepath, names,
+        **kwargs) created in the writer process."""
+        self._specs.append(dict(filepath=filepath, names=names, **kwargs))
+        return RemoteMetricWriter(self, len(self._specs) - 1, os.path.basename(filepath))
+
+    def start(self):
+        self.process = self._ctx.Process(
+            target=_metric_writer_main, name='metric-writer',
+            args=(self._specs, self._schedule_args, self._publish, self._commands))
+        self.process.start()
+
+    def new_ring(self, index):
+        from metric_ring import MetricRing
+        path = os.path.join(self._dir, f'cswsnr_metrics_{os.getpid()}_{self._rings}')
+        self._rings += 1
+        ring = MetricRing(path, self._ring_size)
+        self.command('ring', path, index)
+        self._live[path] = ring
+        return ring
+
+    def release_ring(self, ring):
+        self.command('release', ring.path)
+        del self._live[ring.path]
+        ring.close()
+
+    def command(self, *cmd):
+        """Queue *cmd* for the writer process, which applies it after the
+        blocks already pushed to the rings."""
+        marks = {path: ring.head for path, ring in list(self._live.items())}
+        self._commands.put((marks,) + cmd)
+
+    def set_static(self, num_uavs, slot_duration, guard_interval):
+        self.command('set_static', num_uavs, slot_duration, guard_interval)
+
+    def backlog(self):
+        """Bytes pushed by the sinks and not yet taken by the writer process."""
+        return sum(ring.backlog() for ring in list(self._live.values()))
+
+    def dropped(self):
+        """Blocks dropped so far on full rings."""
+        return sum(ring.dropped for ring in list(self._live.values()))
+
+    def stop(self, timeout=10.0):
+        """Drain the rings, close the files and end the writer process."""
+        if self.process is None:
+            return
+        self.command('stop')
+        self.process.join(timeout)
+        for i in range(self._rings):
+            path = os.path.join(self._dir, f'cswsnr_metrics_{os.getpid()}_{i}')
+            if os.path.exists(path):
+                os.unlink(path)
+        self.process = None
+
+
 class TdmTaggedFileSink(gr.sync_block):
-    """GNU Radio sink that writes CSV rows tagged with the current TDM TX
-    slot ID.  Each row has the form:  tx_uav_id,value
+    """GNU Radio sink that writes rows tagged with the current TDM TX slot ID.
+
+    Each row has the form ``tx_uav_id,value`` (see :class:`MetricRecordWriter`
+    for the binary and aggregate formats).
+
+    Every sample is attributed to a TDM slot individually from its capture
+    time (see :class:`RxSampleClock`), so buffers spanning a slot boundary or
+    guard interval are split sample-accurately.
 
-    During the guard interval the TX ID is written as -1.
+    During the guard interval the TX ID is written as -1.  With a fixed
+    *tx_id* (FDMA mode) every sample is attributed to that transmitter
+    instead.  Passing a shared *writer* makes *filepath* and the format
+    arguments unused.
     """
 
-    def __init__(self, filepath, num_uavs, slot_duration, guard_interval):
-        import numpy
+    def __init__(self, filepath, num_uavs, slot_duration, guard_interval, item_rate,
+                 clock_offset=0.0, record_format='csv', flush_interval=0.1,
+                 buffer_size=1 << 20, percentiles=(5, 95), tx_id=None, writer=None,
+                 schedule=None, clock=None):
         gr.sync_block.__init__(
             self,
             name='TDM Tagged File Sink',
             in_sig=[numpy.float32],
             out_sig=None)
-        self._num_uavs = num_uavs
-        self._slot_duration = slot_duration
-        self._guard_interval = guard_interval
-        self._frame_duration = slot_duration * num_uavs
-        self._f = open(filepath, 'w')
-        self._f.write('tx_uav_id,value\n')
+        self._clock = RxSampleClock(item_rate, clock_offset, clock)
+        self._schedule = schedule if schedule is not None else TdmSchedule(
+            num_uavs, slot_duration, guard_interval)
+        self._tx_id = tx_id
+        self.last_sample_time = None
+        if writer is None:
+            writer = MetricRecordWriter(
+                filepath, ['value'], num_uavs, slot_duration, record_format,
+                flush_interval=flush_interval, buffer_size=buffer_size,
+                percentiles=percentiles, schedule=self._schedule)
+        self._writer = writer.attach()
+
+    def set_item_rate(self, item_rate):
+        self._clock.item_rate = item_rate
 
     def work(self, input_items, output_items):
-        now = time.time()
-        slot_time = now % self._frame_duration
-        current_slot = int(slot_time / self._slot_duration)
-        time_into_slot = slot_time - current_slot * self._slot_duration
-
-        if time_into_slot < self._guard_interval:
-            tx_id = -1  # guard interval — ambiguous
+        vals = input_items[0]
+        n = len(vals)
+        if n == 0:
+            return 0
+
+        sample_times = self._clock.sample_times(self, 0, n)
+        self.last_sample_time = sample_times[-1]
+        if self._tx_id is not None:
+            tx_ids = numpy.full(n, self._tx_id, dtype=numpy.int8)
+        elif self._writer.remote:
+            # Tagged in the writer process
+            tx_ids = None
         else:
-            tx_id = current_slot
+            tx_ids = self._schedule.slot_ids(sample_times)
+        self._writer.write(sample_times, tx_ids, vals, stream=id(self))
+        return n
+
+    def stop(self):
+        self._writer.close()
+        return True
+
+
+class TdmMetricsSink(gr.basic_block):
+    """GNU Radio sink that writes all RX link metrics as row-aligned records
+    tagged with the current TDM TX slot ID::
 
-        for val in input_items[0]:
-            self._f.write(f'{tx_id},{val}\n')
+        timestamp,tx_uav_id,snr,power,quality,noise_floor,freq_offset
 
-        self._f.flush()
-        return len(input_items[0])
+    Inputs 0-3 (SNR, Power, Quality, NoiseFloor) share one rate and are
+    consumed in lockstep, so slot tags are computed once per buffer for all
+    four.  Input 4 carries the FLL frequency offset at its own rate
+    *freq_rate*; it is consumed as it arrives and each row takes the latest
+    frequency sample captured at or before the row's timestamp (NaN until
+    one exists).  This keeps the rows aligned without forcing the two rate
+    domains to produce exactly matching item counts.
+
+    During the guard interval the TX ID is written as -1.  *tx_id* and
+    *writer* work as for :class:`TdmTaggedFileSink`.
+    """
+
+    NAMES = ['snr', 'power', 'quality', 'noise_floor', 'freq_offset']
+
+    def __init__(self, filepath, num_uavs, slot_duration, guard_interval, item_rate,
+                 freq_rate, clock_offset=0.0, record_format='csv', flush_interval=0.1,
+                 buffer_size=1 << 20, percentiles=(5, 95), tx_id=None, writer=None,
+                 schedule=None, clock=None):
+        gr.basic_block.__init__(
+            self,
+            name='TDM Metrics Sink',
+            in_sig=[numpy.float32] * 5,
+            out_sig=None)
+        self._clock = RxSampleClock(item_rate, clock_offset, clock)
+        self._schedule = schedule if schedule is not None else TdmSchedule(
+            num_uavs, slot_duration, guard_interval)
+        self._freq_clock = RxSampleClock(freq_rate, clock_offset, clock)
+        self._freq_times = numpy.empty(0, dtype=numpy.float64)
+        self._freq_vals = numpy.empty(0, dtype=numpy.float32)
+        self._tx_id = tx_id
+        self.last_sample_time = None
+        if writer is None:
+            writer = MetricRecordWriter(
+                filepath, self.NAMES, num_uavs, slot_duration, record_format,
+                timestamps=True, flush_interval=flush_interval, buffer_size=buffer_size,
+                percentiles=percentiles, schedule=self._schedule)
+        self._writer = writer.attach()
+
+    def set_item_rate(self, item_rate):
+        self._clock.item_rate = item_rate
+
+    def set_freq_rate(self, freq_rate):
+        self._freq_clock.item_rate = freq_rate
+
+    def general_work(self, input_items, output_items):
+        nf = len(input_items[4])
+        if nf:
+            self._freq_times = numpy.concatenate(
+                (self._freq_times, self._freq_clock.sample_times(self, 4, nf)))
+            self._freq_vals = numpy.concatenate((self._freq_vals, input_items[4]))
+            self.consume(4, nf)
+
+        n = min(len(items) for items in input_items[:4])
+        if n == 0:
+            return 0
+
+        sample_times = self._clock.sample_times(self, 0, n)
+        self.last_sample_time = sample_times[-1]
+        if self._tx_id is not None:
+            tx_ids = numpy.full(n, self._tx_id, dtype=numpy.int8)
+        elif self._writer.remote:
+            # Tagged in the writer process
+            tx_ids = None
+        else:
+            tx_ids = self._schedule.slot_ids(sample_times)
+
+        rows = numpy.empty((n, 5), dtype=numpy.float32)
+        for i in range(4):
+            rows[:, i] = input_items[i][:n]
+        if len(self._freq_vals):
+            idx = numpy.searchsorted(self._freq_times, sample_times, side='right') - 1
+            rows[:, 4] = numpy.where(idx >= 0, self._freq_vals[numpy.maximum(idx, 0)], numpy.nan)
+            # Keep the newest frequency sample at or before this buffer for the next one
+            keep_from = max(int(idx[-1]), 0)
+            self._freq_times = self._freq_times[keep_from:]
+            self._freq_vals = self._freq_vals[keep_from:]
+        else:
+            rows[:, 4] = numpy.nan
+
+        self._writer.write(sample_times, tx_ids, rows, stream=id(self))
+        for i in range(4):
+            self.consume(i, n)
+        return 0
 
     def stop(self):
-        self._f.close()
+        self._writer.close()
         return True
 
 
-class CSwSNRRX(gr.top_block):
+class TdmRxGate(gr.basic_block):
+    """Drop the samples whose measurements would be discarded anyway: every
+    guard interval and, with several UAVs, this UAV's own TX slot.
 
-    def __init__(self, args='', freq=3.32e9, gainrx=30, noise=8, offset=250e3, samp_rate=2e6, sps=16,
-                 uav_id=0, num_uavs=1, slot_duration=0.5, guard_interval=0.05):
-        gr.top_block.__init__(self, "CSwSNRRX")
+    The downstream AGC, FLL, symbol sync and Costas loops never see the
+    gaps, so their state carries straight across them.  Slot decisions use
+    host time (device time plus *clock_offset*); an rx_time tag in device
+    time is placed on the first sample after every gap so RxSampleClock
+    downstream stays sample-accurate.  Other input tags are not propagated.
+    A *clock* (radio_channel.ClockTracker) keeps the offset current.
+    """
 
-        ##################################################
-        # Parameters
-        ##################################################
-        self.args = args
-        self.freq = freq
-        self.gainrx = gainrx
-        self.noise = noise
-        self.offset = offset
-        self.samp_rate = samp_rate
-        self.sps = sps
-        self.uav_id = uav_id
-        self.num_uavs = num_uavs
-        self.slot_duration = slot_duration
-        self.guard_interval = guard_interval
+    def __init__(self, uav_id, num_uavs, slot_duration, guard_interval, samp_rate,
+                 clock_offset=0.0, schedule=None, clock=None):
+        gr.basic_block.__init__(
+            self,
+            name='TDM RX Gate',
+            in_sig=[numpy.complex64],
+            out_sig=[numpy.complex64])
+        self.set_tag_propagation_policy(gr.TPP_DONT)
+        self._uav_id = uav_id
+        self._num_uavs = num_uavs
+        self._clock_offset = clock_offset
+        self._tracker = clock
+        self._schedule = schedule if schedule is not None else TdmSchedule(
+            num_uavs, slot_duration, guard_interval)
+        # Device time of each input sample
+        self._clock = RxSampleClock(samp_rate)
+        self._gapped = True
+        self.dropped = 0
 
-        ##################################################
-        # Variables
-        ##################################################
-        self.nfilts = nfilts = 32
-        self.alpha = alpha = 0.99
-        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(nfilts, nfilts*samp_rate,samp_rate/sps, alpha, 11*sps*nfilts)
-        self.lbc = lbc = 0.5
-        self.fun_prob = fun_prob = 0
+    def set_samp_rate(self, samp_rate):
+        self._clock.item_rate = samp_rate
 
-        ##################################################
-        # Blocks
-        ##################################################
-        self.AGCprob = blocks.probe_signal_f()
-        def _fun_prob_probe():
-            while True:
-
-                val = self.AGCprob.level()
-                try:
-                    self.set_fun_prob(val)
-                except AttributeError:
-                    pass
-                time.sleep(1.0 / (100))
-        _fun_prob_thread = threading.Thread(target=_fun_prob_probe)
-        _fun_prob_thread.daemon = True
-        _fun_prob_thread.start()
-
-        self.uhd_usrp_source_0 = uhd.usrp_source(
-            ",".join(("", args)),
-            uhd.stream_args(
-                cpu_format="fc32",
-                args='',
-                channels=list(range(0,1)),
-            ),
+    def set_uav_id(self, uav_id):
+        self._uav_id = uav_id
+
+    def set_num_uavs(self, num_uavs):
+        self._num_uavs = num_uavs
+
+    def forecast(self, noutput_items, ninput_items_required):
+        ninput_items_required[0] = noutput_items
+
+    def general_work(self, input_items, output_items):
+        n = min(len(input_items[0]), len(output_items[0]))
+        if n == 0:
+            return 0
+        dev_times = self._clock.sample_times(self, 0, n)
+        if self._tracker is not None:
+            self._clock_offset = self._tracker.update()
+        tx_ids = self._schedule.slot_ids(dev_times + self._clock_offset)
+        keep = tx_ids >= 0
+        if self._num_uavs > 1:
+            keep &= tx_ids != self._uav_id
+        kept = numpy.flatnonzero(keep)
+        nout = len(kept)
+        output_items[0][:nout] = input_items[0][kept]
+
+        # Kept samples that follow a dropped one start a new run
+        starts = numpy.flatnonzero(numpy.diff(kept, prepend=-2 if self._gapped else -1) != 1)
+        nwritten = self.nitems_written(0)
+        for pos in starts:
+            t = float(dev_times[kept[pos]])
+            secs = int(t)
+            self.add_item_tag(0, nwritten + int(pos), RX_TIME, pmt.make_tuple(
+                pmt.from_uint64(secs), pmt.from_double(t - secs)))
+        self._gapped = not keep[-1]
+        self.dropped += n - nout
+        self.consume(0, n)
+        return nout
+
+
+class SampleHoldMultiply(gr.basic_block):
+    """Multiply a complex stream by the latest sample of a slow float control
+    stream.
+
+    Input 0 is the signal and maps one-to-one onto the output.  Input 1 is
+    consumed as it arrives and its newest value is held until the next one,
+    so the control path may run at any (decimated) rate without having to
+    match the signal path's item count.  Only tags from input 0 are
+    propagated.
+    """
+
+    def __init__(self, initial=0.0):
+        gr.basic_block.__init__(
+            self,
+            name='Sample Hold Multiply',
+            in_sig=[numpy.complex64, numpy.float32],
+            out_sig=[numpy.complex64])
+        self.set_tag_propagation_policy(gr.TPP_ONE_TO_ONE)
+        self._level = numpy.float32(initial)
+
+    def level(self):
+        return float(self._level)
+
+    def forecast(self, noutput_items, ninput_items_required):
+        ninput_items_required[0] = noutput_items
+        ninput_items_required[1] = 0
+
+    def general_work(self, input_items, output_items):
+        nc = len(input_items[1])
+        if nc:
+            self._level = input_items[1][-1]
+            self.consume(1, nc)
+        n = min(len(input_items[0]), len(output_items[0]))
+        numpy.multiply(input_items[0][:n], self._level, out=output_items[0][:n])
+        self.consume(0, n)
+        return n
+
+
+class CSwSNRChain(gr.hier_block2):
+    """Channel sounder measurement chain for one received transmitter.
+
+    The input is complex baseband at *samp_rate* with the transmitter's PN
+    signal centred at DC, *sps* samples per chip.  The outputs carry one
+    item per PN period: 0 SNR, 1 Power, 2 Quality, 3 NoiseFloor (dB) and
+    4 the FLL frequency offset (Hz).  *max_iter* is the moving averages'
+    max_iter (items per call between exact re-summations).
+    """
+
+    def __init__(self, samp_rate=2e6, sps=16, gainrx=30, noise=8, nfilts=32, alpha=0.99,
+                 lbc=0.5, agc_ratio_rate=100, max_iter=4000):
+        gr.hier_block2.__init__(
+            self, "CSwSNRChain",
+            gr.io_signature(1, 1, gr.sizeof_gr_complex*1),
+            gr.io_signature(5, 5, gr.sizeof_float*1),
         )
-        self.uhd_usrp_source_0.set_center_freq(freq, 0)
-        self.uhd_usrp_source_0.set_gain(gainrx, 0)
-        self.uhd_usrp_source_0.set_antenna('RX2', 0)
-        self.uhd_usrp_source_0.set_samp_rate(samp_rate)
-        self.uhd_usrp_source_0.set_time_unknown_pps(uhd.time_spec())
-        self.freq_xlating_fft_filter_ccc_0_0 = filter.freq_xlating_fft_filter_ccc(1, (-1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,
-   1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,
-  -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,
-   1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,
-  -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,
-  -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,
-  -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,
-   1,     1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,
-  -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,
-  -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,
-  -1,    -1,    -1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,
-   1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,
-  -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,
-   1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,
-  -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,
-   1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,
-   1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,
-   1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,
-  -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,
-  -1,     1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,
-   1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,
-   1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,
-  -1,     1,     1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,
-   1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,
-   1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,
-   1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,
-  -1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,
-  -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,
-  -1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,
-  -1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,
-  -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,
-  -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,
-  -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,
-  -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,
-  -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,
-  -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,
-  -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,     1,
-   1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,    -1,    -1,
-   1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,
-   1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,
-  -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,
-   1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,
-  -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,     1,
-  -1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,
-  -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,
-   1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,    -1,
-   1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,
-  -1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,
-  -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,
-   1,     1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,     1,
-  -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,
-   1,    -1,    -1,    -1,     1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,
-  -1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,
-  -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,
-  -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,
-   1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,
-   1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,
-   1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,
-   1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,
-  -1,     1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,
-   1,     1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,
-   1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,
-   1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,     1,
-  -1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,
-   1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,
-  -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,
-  -1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,
-   1,     1,     1,    -1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,
-  -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,
-  -1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,
-   1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,
-  -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,
-  -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,
-  -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,
-  -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,     1,     1,     1,     1,    -1,
-   1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,
-   1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,    -1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,     1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,    -1,     1,     1,    -1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,     1,    -1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,    -1,     1,    -1,     1,     1,     1,    -1,    -1,     1,     1,     1,    -1,    -1,    -1,    -1,     1,    -1,    -1,     1,     1,    -1,     1,     1,     1,     1,     1,    -1,     1,     1,     1,    -1,     1,    -1,    -1,     1,    -1,     1,     1,     1,     1,     1,     1,     1,    -1,    -1,     1,     1,     1,    -1,     1,     1,     1,     1), 0, samp_rate/sps)
-        self.freq_xlating_fft_filter_ccc_0_0.set_nthreads(8)
-        self.freq_xlating_fft_filter_ccc_0_0.declare_sample_delay(0)
-        self.epy_block_0 = epy_block_0.blk(example_param=1)
+        self.samp_rate = samp_rate
+        self.sps = sps
+        self.agc_ratio_rate = agc_ratio_rate
+        rrc_taps = firdes.root_raised_cosine(nfilts, nfilts*samp_rate,samp_rate/sps, alpha, 11*sps*nfilts)
+
+        # PN correlator; the sequence comes from the same GLFSR as the TX's
+        # glfsr_source_b(12, True, 0, 1)
+        self.epy_block_0 = epy_block_0.blk(degree=12, mask=0, seed=1)
         self.digital_symbol_sync_xx_0 = digital.symbol_sync_cc(
             digital.TED_SIGNAL_TIMES_SLOPE_ML,
             sps,
@@ -250,27 +906,18 @@ class CSwSNRRX(gr.top_block):
         self.blocks_stream_to_vector_0_0 = blocks.stream_to_vector(gr.sizeof_gr_complex*1, 4095)
         self.blocks_nlog10_ff_0_0_0 = blocks.nlog10_ff(20, 1, 0)
         self.blocks_nlog10_ff_0_0 = blocks.nlog10_ff(20, 1, 0)
-        self.blocks_multiply_xx_1 = blocks.multiply_vcc(1)
-        self.blocks_multiply_xx_0 = blocks.multiply_vcc(1)
-        self.blocks_moving_average_xx_1_0 = blocks.moving_average_cc(1000, 1/1000, 4000, 1)
-        self.blocks_moving_average_xx_1 = blocks.moving_average_cc(3, 1, 4000, 1)
-        self.blocks_moving_average_xx_0_0 = blocks.moving_average_ff(sps, 1, 4000, 1)
-        self.blocks_moving_average_xx_0 = blocks.moving_average_ff(sps, 1, 4000, 1)
+        self.blocks_multiply_agc_ratio = SampleHoldMultiply(0)
+        self.blocks_moving_average_xx_1_0 = blocks.moving_average_cc(1000, 1/1000, max_iter, 1)
+        self.blocks_moving_average_xx_1 = blocks.moving_average_cc(3, 1, max_iter, 1)
+        self.blocks_moving_average_xx_0_0 = blocks.moving_average_ff(sps, 1, max_iter, 1)
+        self.blocks_moving_average_xx_0 = blocks.moving_average_ff(sps, 1, max_iter, 1)
         self.blocks_keep_m_in_n_1_0 = blocks.keep_m_in_n(gr.sizeof_gr_complex, 1, 1000, 999)
         self.blocks_keep_m_in_n_1 = blocks.keep_m_in_n(gr.sizeof_gr_complex, 1, 3, 2)
         self.blocks_keep_m_in_n_0_0 = blocks.keep_m_in_n(gr.sizeof_gr_complex, 1000, 4095, 2000)
         self.blocks_keep_m_in_n_0 = blocks.keep_m_in_n(gr.sizeof_gr_complex, 3, 4095, 1)
-        self.blocks_float_to_complex_0 = blocks.float_to_complex(1)
-        self.blocks_file_sink_0_0_0_0 = TdmTaggedFileSink(
-            '/root/SNR', num_uavs, slot_duration, guard_interval)
-        self.blocks_file_sink_0_0_0 = TdmTaggedFileSink(
-            '/root/Quality', num_uavs, slot_duration, guard_interval)
-        self.blocks_file_sink_0 = TdmTaggedFileSink(
-            '/root/Power', num_uavs, slot_duration, guard_interval)
-        self.blocks_file_sink_noisefloor = TdmTaggedFileSink(
-            '/root/NoiseFloor', num_uavs, slot_duration, guard_interval)
-        self._freqoffset_file = open('/root/FreqOffset', 'w')
-        self._freqoffset_file.write('tx_uav_id,value\n')
+        self.blocks_keep_one_in_n_agc = blocks.keep_one_in_n(gr.sizeof_float*1, max(int(samp_rate/agc_ratio_rate), 1))
+        self.blocks_keep_one_in_n_freq = blocks.keep_one_in_n(gr.sizeof_float*1, sps*4095)
+        self.blocks_multiply_const_freq = blocks.multiply_const_ff(samp_rate/(2*math.pi))
         self.blocks_divide_xx_0 = blocks.divide_ff(1)
         self.blocks_complex_to_real_0_0 = blocks.complex_to_real(1)
         self.blocks_complex_to_real_0 = blocks.complex_to_real(1)
@@ -278,28 +925,20 @@ class CSwSNRRX(gr.top_block):
         self.blocks_complex_to_mag_0_0 = blocks.complex_to_mag(1)
         self.blocks_add_const_vxx_0_0 = blocks.add_const_ff(-noise)
         self.blocks_add_const_vxx_0 = blocks.add_const_ff(-gainrx)
-        self.analog_sig_source_x_0 = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, -offset, 1, 0, 0)
-        self.analog_const_source_x_0_0 = analog.sig_source_f(0, analog.GR_CONST_WAVE, 0, 0, fun_prob)
-        self.analog_const_source_x_0 = analog.sig_source_f(0, analog.GR_CONST_WAVE, 0, 0, 0)
         self.analog_agc_xx_0 = analog.agc_cc(1e-4, 1.0, 1.0)
         self.analog_agc_xx_0.set_max_gain(65536)
-        ##################################################
-        # Connections
-        ##################################################
+
+        self.connect((self, 0), (self.analog_agc_xx_0, 0))
+        self.connect((self, 0), (self.blocks_complex_to_real_0_0, 0))
         self.connect((self.analog_agc_xx_0, 0), (self.blocks_complex_to_real_0, 0))
         self.connect((self.analog_agc_xx_0, 0), (self.digital_fll_band_edge_cc_0_0, 0))
-        self.connect((self.analog_const_source_x_0, 0), (self.blocks_float_to_complex_0, 1))
-        self.connect((self.analog_const_source_x_0_0, 0), (self.blocks_float_to_complex_0, 0))
-        self.connect((self.analog_sig_source_x_0, 0), (self.blocks_multiply_xx_0, 1))
         self.connect((self.blocks_add_const_vxx_0, 0), (self.blocks_add_const_vxx_0_0, 0))
-        self.connect((self.blocks_add_const_vxx_0, 0), (self.blocks_file_sink_0, 0))
-        self.connect((self.blocks_add_const_vxx_0_0, 0), (self.blocks_file_sink_0_0_0_0, 0))
         self.connect((self.blocks_complex_to_mag_0_0, 0), (self.blocks_nlog10_ff_0_0, 0))
         self.connect((self.blocks_complex_to_mag_0_0_0, 0), (self.blocks_nlog10_ff_0_0_0, 0))
         self.connect((self.blocks_complex_to_real_0, 0), (self.blocks_moving_average_xx_0_0, 0))
         self.connect((self.blocks_complex_to_real_0_0, 0), (self.blocks_moving_average_xx_0, 0))
-        self.connect((self.blocks_divide_xx_0, 0), (self.AGCprob, 0))
-        self.connect((self.blocks_float_to_complex_0, 0), (self.blocks_multiply_xx_1, 1))
+        self.connect((self.blocks_divide_xx_0, 0), (self.blocks_keep_one_in_n_agc, 0))
+        self.connect((self.blocks_keep_one_in_n_agc, 0), (self.blocks_multiply_agc_ratio, 1))
         self.connect((self.blocks_keep_m_in_n_0, 0), (self.blocks_moving_average_xx_1, 0))
         self.connect((self.blocks_keep_m_in_n_0_0, 0), (self.blocks_moving_average_xx_1_0, 0))
         self.connect((self.blocks_keep_m_in_n_1, 0), (self.blocks_complex_to_mag_0_0, 0))
@@ -308,44 +947,305 @@ class CSwSNRRX(gr.top_block):
         self.connect((self.blocks_moving_average_xx_0_0, 0), (self.blocks_divide_xx_0, 1))
         self.connect((self.blocks_moving_average_xx_1, 0), (self.blocks_keep_m_in_n_1, 0))
         self.connect((self.blocks_moving_average_xx_1_0, 0), (self.blocks_keep_m_in_n_1_0, 0))
-        self.connect((self.blocks_multiply_xx_0, 0), (self.analog_agc_xx_0, 0))
-        self.connect((self.blocks_multiply_xx_0, 0), (self.blocks_complex_to_real_0_0, 0))
-        self.connect((self.blocks_multiply_xx_1, 0), (self.freq_xlating_fft_filter_ccc_0_0, 0))
+        self.connect((self.blocks_multiply_agc_ratio, 0), (self.blocks_stream_to_vector_0_0, 0))
         self.connect((self.blocks_nlog10_ff_0_0, 0), (self.blocks_add_const_vxx_0, 0))
         self.connect((self.blocks_nlog10_ff_0_0, 0), (self.blocks_sub_xx_0, 0))
         self.connect((self.blocks_nlog10_ff_0_0_0, 0), (self.blocks_sub_xx_0, 1))
-        self.connect((self.blocks_nlog10_ff_0_0_0, 0), (self.blocks_file_sink_noisefloor, 0))
         self.connect((self.blocks_stream_to_vector_0_0, 0), (self.epy_block_0, 0))
-        self.connect((self.blocks_sub_xx_0, 0), (self.blocks_file_sink_0_0_0, 0))
         self.connect((self.blocks_vector_to_stream_0_0, 0), (self.blocks_keep_m_in_n_0, 0))
         self.connect((self.blocks_vector_to_stream_0_0, 0), (self.blocks_keep_m_in_n_0_0, 0))
-        self.connect((self.digital_costas_loop_cc_0, 0), (self.blocks_multiply_xx_1, 0))
+        self.connect((self.digital_costas_loop_cc_0, 0), (self.blocks_multiply_agc_ratio, 0))
         self.connect((self.digital_fll_band_edge_cc_0_0, 0), (self.digital_symbol_sync_xx_0, 0))
         self.connect((self.digital_symbol_sync_xx_0, 0), (self.digital_costas_loop_cc_0, 0))
         self.connect((self.epy_block_0, 0), (self.blocks_vector_to_stream_0_0, 0))
-        self.connect((self.freq_xlating_fft_filter_ccc_0_0, 0), (self.blocks_stream_to_vector_0_0, 0))
-        self.connect((self.uhd_usrp_source_0, 0), (self.blocks_multiply_xx_0, 0))
+        # FLL frequency estimate (rad/sample) decimated to the metric rate, in Hz
+        self.connect((self.digital_fll_band_edge_cc_0_0, 1), (self.blocks_keep_one_in_n_freq, 0))
+        self.connect((self.blocks_keep_one_in_n_freq, 0), (self.blocks_multiply_const_freq, 0))
+
+        self.connect((self.blocks_add_const_vxx_0_0, 0), (self, 0))
+        self.connect((self.blocks_add_const_vxx_0, 0), (self, 1))
+        self.connect((self.blocks_sub_xx_0, 0), (self, 2))
+        self.connect((self.blocks_nlog10_ff_0_0_0, 0), (self, 3))
+        self.connect((self.blocks_multiply_const_freq, 0), (self, 4))
+
+    def set_gainrx(self, gainrx):
+        self.blocks_add_const_vxx_0.set_k(-gainrx)
+
+    def set_noise(self, noise):
+        self.blocks_add_const_vxx_0_0.set_k(-noise)
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+        self.blocks_keep_one_in_n_agc.set_n(max(int(self.samp_rate/self.agc_ratio_rate), 1))
+        self.blocks_multiply_const_freq.set_k(self.samp_rate/(2*math.pi))
+
+    def set_sps(self, sps):
+        self.sps = sps
+        self.blocks_keep_one_in_n_freq.set_n(self.sps*4095)
+        self.blocks_moving_average_xx_0.set_length_and_scale(self.sps, 1)
+        self.blocks_moving_average_xx_0_0.set_length_and_scale(self.sps, 1)
+        self.digital_fll_band_edge_cc_0_0.set_loop_bandwidth(2*math.pi/self.sps/100)
+
+    def set_lbc(self, lbc):
+        self.digital_costas_loop_cc_0.set_loop_bandwidth(lbc)
+
+    def set_agc_ratio_rate(self, agc_ratio_rate):
+        self.agc_ratio_rate = agc_ratio_rate
+        self.blocks_keep_one_in_n_agc.set_n(max(int(self.samp_rate/self.agc_ratio_rate), 1))
+
+
+class CSwSNRRX(gr.top_block):
+
+    # Parameters exposed on the --control socket
+    CONTROL_PARAMS = ['freq', 'gainrx', 'noise', 'offset', 'lbc', 'agc_ratio_rate',
+                      'uav_id', 'num_uavs', 'slot_duration', 'guard_interval']
+    # Split-layout metric files, in CSwSNRChain output order
+    METRIC_FILES = ['SNR', 'Power', 'Quality', 'NoiseFloor', 'FreqOffset']
+
+    def __init__(self, args='', freq=3.32e9, gainrx=30, noise=8, offset=250e3, samp_rate=2e6, sps=16,
+                 uav_id=0, num_uavs=1, slot_duration=0.5, guard_interval=0.05,
+                 metric_format='csv', flush_interval=0.1, percentiles=(5, 95),
+                 metrics_layout='split', replay=None, throttle=0, record=None,
+                 output_dir='/root', source=None, tdm_gating=False,
+                 access='tdm', fdma_channels=8, fdma_oversample=2, tdm_schedule=None,
+                 publish=None, writer_process=False, ring_size=16 << 20,
+                 moving_average_max_iter=4000, health=False, segment_size=0,
+                 segment_seconds=0, compress='gzip', clock_interval=5.0):
+        gr.top_block.__init__(self, "CSwSNRRX")
 
         ##################################################
-        # Frequency offset polling thread
+        # Parameters
         ##################################################
-        def _freq_offset_probe():
-            frame_dur = slot_duration * num_uavs
-            while True:
-                val = self.digital_fll_band_edge_cc_0_0.get_frequency()
-                freq_hz = val * samp_rate / (2 * math.pi)
-                now = time.time()
-                slot_time = now % frame_dur
-                current_slot = int(slot_time / slot_duration)
-                time_into_slot = slot_time - current_slot * slot_duration
-                tx_id = -1 if time_into_slot < guard_interval else current_slot
-                self._freqoffset_file.write(f'{tx_id},{freq_hz}\n')
-                self._freqoffset_file.flush()
-                time.sleep(0.01)
-        _freq_offset_thread = threading.Thread(target=_freq_offset_probe)
-        _freq_offset_thread.daemon = True
-        _freq_offset_thread.start()
+        self.args = args
+        self.freq = freq
+        self.gainrx = gainrx
+        self.noise = noise
+        self.offset = offset
+        self.samp_rate = samp_rate
+        self.sps = sps
+        self.uav_id = uav_id
+        self.num_uavs = num_uavs
+        self.slot_duration = slot_duration
+        self.guard_interval = guard_interval
+        self.metric_format = metric_format
+        self.flush_interval = flush_interval
+        self.percentiles = percentiles
+        self.metrics_layout = metrics_layout
+        self.replay = replay
+        self.throttle = throttle
+        self.record = record
+        self.output_dir = output_dir
+        self.tdm_gating = tdm_gating and access == 'tdm'
+        self.access = access
+        self.fdma_channels = fdma_channels
+        self.fdma_oversample = fdma_oversample
+        self.moving_average_max_iter = moving_average_max_iter
+        # Static one-slot-per-UAV frame unless tdm_schedule names a schedule file
+        self.tdm_schedule = TdmSchedule(num_uavs, slot_duration, guard_interval, path=tdm_schedule)
+        # Tagging, aggregation, publishing and file I/O of the metric
+        # streams in a separate process, fed through shared-memory rings
+        self.metric_process = None
+        if writer_process:
+            self.metric_process = MetricWriterProcess(
+                (num_uavs, slot_duration, guard_interval, tdm_schedule), publish, ring_size)
+        # Live per-slot aggregates for online consumers
+        self.metric_publisher = MetricPublisher(publish) if publish and not writer_process else None
 
+        ##################################################
+        # Variables
+        ##################################################
+        self.nfilts = nfilts = 32
+        self.alpha = alpha = 0.99
+        self.rrc_taps = rrc_taps = firdes.root_raised_cosine(nfilts, nfilts*samp_rate,samp_rate/sps, alpha, 11*sps*nfilts)
+        self.lbc = lbc = 0.5
+        # Rate at which the AGC gain ratio is sampled into the correlator path
+        self.agc_ratio_rate = agc_ratio_rate = 100
+        # Rate of the metric streams: one correlation peak per 4095-chip PN
+        # period at samp_rate/sps symbols per second
+        self.metric_rate = metric_rate = samp_rate/sps/4095
+        chain_rate, chain_sps = self._chain_rate_sps()
+
+        ##################################################
+        # Blocks
+        ##################################################
+        if source is not None:
+            # Externally supplied complex sample stream at samp_rate (e.g. the
+            # software channel of CSwSNRBenchmark.py); any rx_time tags it
+            # carries are already host time.
+            self.uhd_usrp_source_0 = None
+            self.rx_clock_offset = 0.0
+        elif replay:
+            # Offline replay of a recorded IQ file instead of the radio.  A
+            # detached header from --record restores the rx_time tags and
+            # the host/device clock offset of the original capture.
+            self.uhd_usrp_source_0 = None
+            hdr_path = replay + '.hdr'
+            if os.path.isfile(hdr_path):
+                rx_rate, extras = read_iq_metadata(hdr_path)
+                if rx_rate != samp_rate:
+                    print(f"[RX] Warning: {replay} was recorded at {rx_rate} S/s, "
+                          f"replaying at samp_rate={samp_rate}")
+                self.rx_clock_offset = extras.get('rx_clock_offset', 0.0)
+                self.blocks_replay_source = blocks.file_meta_source(replay, False, True, hdr_path)
+            else:
+                self.rx_clock_offset = 0.0
+                self.blocks_replay_source = blocks.file_source(gr.sizeof_gr_complex*1, replay, False, 0, 0)
+            if throttle > 0:
+                # ignore_tags so the rx_rate tags of a recording cannot
+                # override the requested replay rate
+                self.blocks_throttle_0 = blocks.throttle(gr.sizeof_gr_complex*1, throttle, True)
+        else:
+            self.uhd_usrp_source_0 = uhd.usrp_source(
+                ",".join(("", args)),
+                uhd.stream_args(
+                    cpu_format="fc32",
+                    args='',
+                    channels=list(range(0,1)),
+                ),
+            )
+            self.uhd_usrp_source_0.set_center_freq(freq, 0)
+            self.uhd_usrp_source_0.set_gain(gainrx, 0)
+            self.uhd_usrp_source_0.set_antenna('RX2', 0)
+            self.uhd_usrp_source_0.set_samp_rate(samp_rate)
+            self.uhd_usrp_source_0.set_time_unknown_pps(uhd.time_spec())
+            self.rx_clock_offset = 0.0
+        # Host/device clock offset of the slot attribution; only a live USRP
+        # is measured, and re-estimated every clock_interval s as it drifts
+        self.rx_clock = ClockTracker(self.uhd_usrp_source_0, clock_interval,
+                                     offset=self.rx_clock_offset)
+        self.rx_clock_offset = self.rx_clock.initial
+        if record:
+            # Raw IQ to *record*; rx_time/rx_rate tags and the clock offset go
+            # to the detached header *record*.hdr for --replay
+            extras = pmt.dict_add(pmt.make_dict(), pmt.intern('rx_clock_offset'),
+                                  pmt.from_double(self.rx_clock_offset))
+            self.blocks_record_sink = blocks.file_meta_sink(
+                gr.sizeof_gr_complex*1, record, samp_rate, 1, blocks.GR_FILE_FLOAT,
+                True, 1000000, pmt.serialize_str(extras), True)
+            self.blocks_record_sink.set_unbuffered(False)
+        # Overflow count for the --metrics endpoint
+        self.blocks_overflow_counter = None
+        if health and self.uhd_usrp_source_0 is not None:
+            self.blocks_overflow_counter = radio_health.RxOverflowCounter()
+        self.blocks_multiply_xx_0 = blocks.multiply_vcc(1)
+        self.analog_sig_source_x_0 = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, -offset, 1, 0, 0)
+        if self.tdm_gating:
+            self.blocks_tdm_gate = TdmRxGate(
+                uav_id, num_uavs, slot_duration, guard_interval, samp_rate,
+                schedule=self.tdm_schedule, clock=self.rx_clock)
+        if access == 'fdma':
+            # One channelizer output per FDMA channel; a measurement chain for
+            # every other UAV's channel (fixed tx_uav_id), nothing for our own
+            self.pfb_channelizer_ccf_0 = pfb.channelizer_ccf(
+                fdma_channels, self._channelizer_taps(), fdma_oversample, 100)
+            self.chains = [
+                (tx_id, CSwSNRChain(chain_rate, chain_sps, gainrx, noise, nfilts, alpha, lbc, agc_ratio_rate,
+                                     moving_average_max_iter))
+                for tx_id in range(num_uavs) if tx_id != uav_id]
+            self.blocks_null_sinks = [blocks.null_sink(gr.sizeof_gr_complex*1) for _ in range(fdma_channels)]
+        else:
+            self.chains = [(None, CSwSNRChain(samp_rate, sps, gainrx, noise, nfilts, alpha, lbc, agc_ratio_rate,
+                                              moving_average_max_iter))]
+
+        ##################################################
+        # Connections
+        ##################################################
+        if source is not None:
+            self.blocks_source = source
+        elif replay:
+            self.blocks_source = self.blocks_replay_source
+            if throttle > 0:
+                self.connect((self.blocks_replay_source, 0), (self.blocks_throttle_0, 0))
+                self.blocks_source = self.blocks_throttle_0
+        else:
+            self.blocks_source = self.uhd_usrp_source_0
+            if record:
+                self.connect((self.uhd_usrp_source_0, 0), (self.blocks_record_sink, 0))
+            if self.blocks_overflow_counter is not None:
+                self.connect((self.uhd_usrp_source_0, 0), (self.blocks_overflow_counter, 0))
+
+        if access == 'fdma':
+            self.connect((self.blocks_source, 0), (self.pfb_channelizer_ccf_0, 0))
+            used = {}
+            for tx_id, chain in self.chains:
+                channel = fdma_channel(tx_id, fdma_channels)
+                self.connect((self.pfb_channelizer_ccf_0, channel), (chain, 0))
+                used[channel] = chain
+            for channel in range(fdma_channels):
+                if channel not in used:
+                    self.connect((self.pfb_channelizer_ccf_0, channel), (self.blocks_null_sinks[channel], 0))
+        else:
+            self.connect((self.blocks_source, 0), (self.blocks_multiply_xx_0, 0))
+            self.connect((self.analog_sig_source_x_0, 0), (self.blocks_multiply_xx_0, 1))
+            if self.tdm_gating:
+                # Skip guard intervals and our own TX slot ahead of all DSP
+                self.connect((self.blocks_multiply_xx_0, 0), (self.blocks_tdm_gate, 0))
+                self.connect((self.blocks_tdm_gate, 0), (self.chains[0][1], 0))
+            else:
+                self.connect((self.blocks_multiply_xx_0, 0), (self.chains[0][1], 0))
+
+        ##################################################
+        # Metric sinks
+        ##################################################
+        # One writer per output file, shared by the sinks of every chain
+        self.metric_sinks = []
+        self.metric_writers = []
+        if metrics_layout == 'aligned':
+            writer = self._metric_writer(
+                os.path.join(output_dir, 'Metrics'), TdmMetricsSink.NAMES, num_uavs=num_uavs,
+                slot_duration=slot_duration, record_format=metric_format, timestamps=True,
+                flush_interval=flush_interval, percentiles=percentiles, segment_size=segment_size,
+                segment_seconds=segment_seconds, compress=compress)
+            self.metric_writers.append(writer)
+            for tx_id, chain in self.chains:
+                sink = TdmMetricsSink(
+                    None, num_uavs, slot_duration, guard_interval, metric_rate, metric_rate,
+                    tx_id=tx_id, writer=writer, schedule=self.tdm_schedule,
+                    clock=self.rx_clock)
+                for port in range(5):
+                    self.connect((chain, port), (sink, port))
+                self.metric_sinks.append(sink)
+        else:
+            for port, name in enumerate(self.METRIC_FILES):
+                writer = self._metric_writer(
+                    os.path.join(output_dir, name), ['value'], num_uavs=num_uavs,
+                    slot_duration=slot_duration, record_format=metric_format,
+                    flush_interval=flush_interval, percentiles=percentiles,
+                    segment_size=segment_size, segment_seconds=segment_seconds,
+                    compress=compress)
+                self.metric_writers.append(writer)
+                for tx_id, chain in self.chains:
+                    sink = TdmTaggedFileSink(
+                        None, num_uavs, slot_duration, guard_interval, metric_rate,
+                        tx_id=tx_id, writer=writer, schedule=self.tdm_schedule,
+                        clock=self.rx_clock)
+                    self.connect((chain, port), (sink, 0))
+                    self.metric_sinks.append(sink)
+        if self.metric_process is not None:
+            self.metric_process.start()
+
+    def _metric_writer(self, filepath, names, **kwargs):
+        """Writer of one metric file, in this process or the writer process."""
+        if self.metric_process is not None:
+            return self.metric_process.writer(filepath, names, **kwargs)
+        return MetricRecordWriter(filepath, names, schedule=self.tdm_schedule,
+                                  publisher=self.metric_publisher, **kwargs)
+
+    def _chain_rate_sps(self):
+        """Sample rate and samples per chip at the measurement chain input."""
+        if self.access != 'fdma':
+            return self.samp_rate, self.sps
+        chain_sps = self.sps * self.fdma_oversample / self.fdma_channels
+        if chain_sps != int(chain_sps) or chain_sps < 2:
+            raise ValueError(f"FDMA needs sps*oversample/channels to be an integer >= 2 "
+                             f"(got {self.sps}*{self.fdma_oversample}/{self.fdma_channels})")
+        return self.samp_rate * self.fdma_oversample / self.fdma_channels, int(chain_sps)
+
+    def _channelizer_taps(self):
+        # Pass the occupied band of one channel (+-symbol rate for alpha
+        # ~1), stop at the next channel's edge
+        spacing = self.samp_rate / self.fdma_channels
+        return firdes.low_pass_2(1, self.samp_rate, spacing/2, spacing/4, 60)
 
     def get_args(self):
         return self.args
@@ -358,23 +1258,27 @@ class CSwSNRRX(gr.top_block):
 
     def set_freq(self, freq):
         self.freq = freq
-        self.uhd_usrp_source_0.set_center_freq(self.freq, 0)
+        if self.uhd_usrp_source_0 is not None:
+            self.uhd_usrp_source_0.set_center_freq(self.freq, 0)
 
     def get_gainrx(self):
         return self.gainrx
 
     def set_gainrx(self, gainrx):
         self.gainrx = gainrx
-        self.blocks_add_const_vxx_0.set_k(-self.gainrx)
-        self.uhd_usrp_source_0.set_gain(self.gainrx, 0)
-        self.uhd_usrp_source_0.set_gain(self.gainrx, 1)
+        for _, chain in self.chains:
+            chain.set_gainrx(self.gainrx)
+        if self.uhd_usrp_source_0 is not None:
+            self.uhd_usrp_source_0.set_gain(self.gainrx, 0)
+            self.uhd_usrp_source_0.set_gain(self.gainrx, 1)
 
     def get_noise(self):
         return self.noise
 
     def set_noise(self, noise):
         self.noise = noise
-        self.blocks_add_const_vxx_0_0.set_k(-self.noise)
+        for _, chain in self.chains:
+            chain.set_noise(self.noise)
 
     def get_offset(self):
         return self.offset
@@ -388,19 +1292,29 @@ class CSwSNRRX(gr.top_block):
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
+        self.set_metric_rate(self.samp_rate/self.sps/4095)
         self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts*self.samp_rate, self.samp_rate/self.sps, self.alpha, 11*self.sps*self.nfilts))
+        chain_rate, _ = self._chain_rate_sps()
+        for _, chain in self.chains:
+            chain.set_samp_rate(chain_rate)
+        if self.access == 'fdma':
+            self.pfb_channelizer_ccf_0.set_taps(self._channelizer_taps())
         self.analog_sig_source_x_0.set_sampling_freq(self.samp_rate)
-        self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
+        if self.tdm_gating:
+            self.blocks_tdm_gate.set_samp_rate(self.samp_rate)
+        if self.uhd_usrp_source_0 is not None:
+            self.uhd_usrp_source_0.set_samp_rate(self.samp_rate)
 
     def get_sps(self):
         return self.sps
 
     def set_sps(self, sps):
         self.sps = sps
+        self.set_metric_rate(self.samp_rate/self.sps/4095)
         self.set_rrc_taps(firdes.root_raised_cosine(self.nfilts, self.nfilts*self.samp_rate, self.samp_rate/self.sps, self.alpha, 11*self.sps*self.nfilts))
-        self.blocks_moving_average_xx_0.set_length_and_scale(self.sps, 1)
-        self.blocks_moving_average_xx_0_0.set_length_and_scale(self.sps, 1)
-        self.digital_fll_band_edge_cc_0_0.set_loop_bandwidth(2*math.pi/self.sps/100)
+        _, chain_sps = self._chain_rate_sps()
+        for _, chain in self.chains:
+            chain.set_sps(chain_sps)
 
     def get_nfilts(self):
         return self.nfilts
@@ -427,14 +1341,109 @@ class CSwSNRRX(gr.top_block):
 
     def set_lbc(self, lbc):
         self.lbc = lbc
-        self.digital_costas_loop_cc_0.set_loop_bandwidth(self.lbc)
+        for _, chain in self.chains:
+            chain.set_lbc(self.lbc)
+
+    def get_metric_rate(self):
+        return self.metric_rate
+
+    def set_metric_rate(self, metric_rate):
+        self.metric_rate = metric_rate
+        for sink in self.metric_sinks:
+            sink.set_item_rate(self.metric_rate)
+            if self.metrics_layout == 'aligned':
+                sink.set_freq_rate(self.metric_rate)
+
+    def get_agc_ratio_rate(self):
+        return self.agc_ratio_rate
+
+    def set_agc_ratio_rate(self, agc_ratio_rate):
+        self.agc_ratio_rate = agc_ratio_rate
+        for _, chain in self.chains:
+            chain.set_agc_ratio_rate(self.agc_ratio_rate)
+
+    def get_uav_id(self):
+        return self.uav_id
+
+    def set_uav_id(self, uav_id):
+        self.uav_id = uav_id
+        if self.tdm_gating:
+            self.blocks_tdm_gate.set_uav_id(self.uav_id)
+
+    def get_num_uavs(self):
+        return self.num_uavs
+
+    def set_num_uavs(self, num_uavs):
+        self.num_uavs = num_uavs
+        self._set_static_schedule()
+        if self.tdm_gating:
+            self.blocks_tdm_gate.set_num_uavs(self.num_uavs)
+
+    def get_slot_duration(self):
+        return self.slot_duration
+
+    def set_slot_duration(self, slot_duration):
+        self.slot_duration = slot_duration
+        self._set_static_schedule()
+
+    def get_guard_interval(self):
+        return self.guard_interval
 
-    def get_fun_prob(self):
-        return self.fun_prob
+    def set_guard_interval(self, guard_interval):
+        self.guard_interval = guard_interval
+        self._set_static_schedule()
+
+    def _set_static_schedule(self):
+        self.tdm_schedule.set_static(self.num_uavs, self.slot_duration, self.guard_interval)
+        if self.metric_process is not None:
+            self.metric_process.set_static(self.num_uavs, self.slot_duration, self.guard_interval)
+
+    def get_output_dir(self):
+        return self.output_dir
+
+    def start_logging(self, output_dir=None):
+        """Start new metric files in *output_dir* (default: the current
+        one), ending any files being written."""
+        if output_dir:
+            self.output_dir = output_dir
+            os.makedirs(self.output_dir, exist_ok=True)
+        for writer in self.metric_writers:
+            writer.reopen(os.path.join(self.output_dir, writer.name))
+        return self.output_dir
+
+    def stop_logging(self):
+        """Close the metric files; measurement (and publishing) continues."""
+        for writer in self.metric_writers:
+            writer.reopen(None)
+
+    def health(self):
+        """Counters for the --metrics endpoint (radio_health.HealthMonitor)."""
+        health = {'samples_total': int(self.blocks_source.nitems_written(0))}
+        if self.blocks_overflow_counter is not None:
+            health['overflows'] = self.blocks_overflow_counter.overflows
+        if self.uhd_usrp_source_0 is not None:
+            health['clock_offset'] = self.rx_clock.offset
+            health['clock_drift'] = self.rx_clock.drift()
+            health['clock_drift_ppm'] = self.rx_clock.drift_ppm()
+        if self.metric_process is not None:
+            health['sink_backlog_bytes'] = self.metric_process.backlog()
+            health['sink_dropped'] = self.metric_process.dropped()
+        elif self.metric_publisher is not None:
+            health['sink_dropped'] = self.metric_publisher.dropped
+        if self.access == 'fdma':
+            health['tdm_duty'] = {tx_id: 1.0 for tx_id, _ in self.chains}
+        else:
+            health['tdm_duty'] = self.tdm_schedule.duty(time.time())
+        return health
+
+    def close_metrics(self):
+        """Release the metric publisher and writer process once the
+        flowgraph has stopped."""
+        if self.metric_publisher is not None:
+            self.metric_publisher.close()
+        if self.metric_process is not None:
+            self.metric_process.stop()
 
-    def set_fun_prob(self, fun_prob):
-        self.fun_prob = fun_prob
-        self.analog_const_source_x_0_0.set_offset(self.fun_prob)
 
 def argument_parser():
     parser = ArgumentParser()
@@ -473,6 +1482,98 @@ def argument_parser():
     parser.add_argument(
         "--guard-interval", dest="guard_interval", type=float, default=None,
         help="TDM guard interval in seconds [default: 0.05 or from client.yaml]")
+    parser.add_argument(
+        "--metric-format", dest="metric_format", choices=['csv', 'binary', 'aggregate'],
+        default='csv',
+        help="Record format of the metric files: 'csv' text rows, packed "
+             "int8 tx_id + float32 value, or one row of statistics per "
+             "(TDM frame, tx_id) [default=%(default)r]")
+    parser.add_argument(
+        "--flush-interval", dest="flush_interval", type=float, default=0.1,
+        help="Seconds between metric file flushes [default=%(default)r]")
+    parser.add_argument(
+        "--percentiles", dest="percentiles",
+        type=lambda s: tuple(float(q) for q in s.split(',') if q.strip()), default=(5, 95),
+        help="Comma-separated percentiles reported by --metric-format aggregate "
+             "[default: 5,95]")
+    parser.add_argument(
+        "--metrics-layout", dest="metrics_layout", choices=['split', 'aligned'], default='split',
+        help="'split' writes SNR, Power, Quality, NoiseFloor and FreqOffset files "
+             "to --output-dir; 'aligned' writes one Metrics file with "
+             "timestamp,tx_uav_id,snr,power,quality,noise_floor,freq_offset rows "
+             "[default=%(default)r]")
+    parser.add_argument(
+        "--segment-size", dest="segment_size", type=float, default=0,
+        help="Write each metric file as indexed segments of about this many MB, "
+             "0 for one unbounded file [default=%(default)r]")
+    parser.add_argument(
+        "--segment-seconds", dest="segment_seconds", type=float, default=0,
+        help="Close metric file segments after this many seconds of samples, "
+             "0 for no time bound [default=%(default)r]")
+    parser.add_argument(
+        "--compress", dest="compress", choices=['none', 'gzip', 'xz'], default='gzip',
+        help="Background compression of closed segments [default=%(default)r]")
+    parser.add_argument(
+        "--tdm-gating", dest="tdm_gating", action="store_true",
+        help="Drop guard-interval and own-TX-slot samples before the DSP chain "
+             "instead of measuring and discarding them")
+    parser.add_argument(
+        "--publish", dest="publish", type=str, default=None, metavar="ADDRESS",
+        help="Publish per-slot aggregate metrics live on a local datagram socket, "
+             "udp:HOST:PORT or unix:PATH (see metric_stream.py)")
+    parser.add_argument(
+        "--writer-process", dest="writer_process", action="store_true",
+        help="Tag, aggregate, publish and write the metrics in a separate process "
+             "fed through shared-memory rings, so storage never stalls the DSP")
+    parser.add_argument(
+        "--ring-size", dest="ring_size", type=float, default=16,
+        help="Size in MB of each --writer-process metric ring [default=%(default)r]")
+    parser.add_argument(
+        "--clock-interval", dest="clock_interval", type=float, default=5.0,
+        help="Seconds between re-estimates of the host/USRP clock offset used "
+             "for slot attribution, 0 = estimate once [default=%(default)r]")
+    parser.add_argument(
+        "--metrics", dest="metrics", type=str, default=None, metavar="ADDRESS",
+        help="Serve throughput, per-block and overflow metrics on http:HOST:PORT "
+             "or unix:PATH (see radio_health.py)")
+    parser.add_argument(
+        "--control", dest="control", type=str, default=None, metavar="PATH",
+        help="Keep running and accept get/set and logging commands on the Unix "
+             "socket PATH instead of waiting for Enter (see radio_control.py)")
+    parser.add_argument(
+        "--tdm-schedule", dest="tdm_schedule", type=str, default=None, metavar="PATH",
+        help="Adaptive TDM schedule file shared with the TX (see tdm_schedule.py) "
+             "[default: tdm.schedule_file from client.yaml, or the static schedule]")
+    parser.add_argument(
+        "--access", dest="access", choices=['tdm', 'fdma'], default=None,
+        help="Multiple access scheme shared with the transmitters "
+             "[default: tdm or multiple_access from client.yaml]")
+    parser.add_argument(
+        "--fdma-channels", dest="fdma_channels", type=int, default=None,
+        help="Number of FDMA channels across samp_rate "
+             "[default: 8 or fdma.channels from client.yaml]")
+    parser.add_argument(
+        "--fdma-oversample", dest="fdma_oversample", type=int, default=None,
+        help="Channelizer oversampling ratio "
+             "[default: 2 or fdma.oversample from client.yaml]")
+    parser.add_argument(
+        "--output-dir", dest="output_dir", type=str, default='/root',
+        help="Directory the metric files are written to [default=%(default)r]")
+    parser.add_argument(
+        "--replay", dest="replay", type=str, default=None, metavar="IQ_FILE",
+        help="Process a recorded complex64 IQ file instead of the USRP; runs as "
+             "fast as the CPU allows unless --throttle/--realtime is given")
+    parser.add_argument(
+        "--throttle", dest="throttle", type=eng_float, default=0,
+        help="Replay rate in samples/s, 0 for unthrottled [default=%(default)r]")
+    parser.add_argument(
+        "--realtime", dest="realtime", action="store_true",
+        help="Replay at samp_rate (same as --throttle <samp_rate>)")
+    parser.add_argument(
+        "--record", dest="record", type=str, default=None, metavar="IQ_FILE",
+        help="Tee the raw USRP IQ to IQ_FILE (with an IQ_FILE.hdr header of "
+             "rx_time tags) for later --replay")
+    radio_performance.add_arguments(parser)
     return parser
 
 
@@ -493,6 +1594,7 @@ def _resolve_tdm_options(options):
             cfg = yaml.safe_load(f) or {}
 
     tdm_cfg = cfg.get('tdm', {})
+    fdma_cfg = cfg.get('fdma', {})
 
     if options.uav_id is None:
         options.uav_id = int(cfg.get('uav_id', 0))
@@ -508,6 +1610,15 @@ def _resolve_tdm_options(options):
             print(f"[TDM] Warning: could not derive num_uavs from scenario.csv: {e}")
             print("[TDM] Defaulting to num_uavs=1 (TDM effectively disabled)")
             options.num_uavs = 1
+    if options.tdm_schedule is None:
+        options.tdm_schedule = tdm_cfg.get('schedule_file') or None
+    if options.access is None:
+        options.access = str(cfg.get('multiple_access', 'tdm')).lower()
+    if options.fdma_channels is None:
+        options.fdma_channels = int(fdma_cfg.get('channels', 8))
+    if options.fdma_oversample is None:
+        options.fdma_oversample = int(fdma_cfg.get('oversample', 2))
+    options.performance = radio_performance.resolve(options, cfg)
 
     return options
 
@@ -517,37 +1628,96 @@ def main(top_block_cls=CSwSNRRX, options=None):
         options = argument_parser().parse_args()
 
     options = _resolve_tdm_options(options)
-
-    print(f"[TDM-RX] Config: uav_id={options.uav_id}, "
-          f"num_uavs={options.num_uavs}, slot={options.slot_duration}s, "
-          f"guard={options.guard_interval}s")
-    print(f"[TDM-RX] Receiver runs continuously; measurements from all "
-          f"TX slots interleave into output files.")
-
+    if options.replay and options.record:
+        print("[RX] --replay and --record are mutually exclusive")
+        sys.exit(1)
+    if options.realtime:
+        options.throttle = options.samp_rate
+
+    if options.access == 'fdma':
+        print(f"[FDMA-RX] Config: uav_id={options.uav_id}, "
+              f"num_uavs={options.num_uavs}, channels={options.fdma_channels}, "
+              f"oversample={options.fdma_oversample}")
+        print(f"[FDMA-RX] One measurement chain per transmitter; rows carry "
+              f"the TX channel's tx_uav_id.")
+    else:
+        print(f"[TDM-RX] Config: uav_id={options.uav_id}, "
+              f"num_uavs={options.num_uavs}, slot={options.slot_duration}s, "
+              f"guard={options.guard_interval}s")
+        print(f"[TDM-RX] Receiver runs continuously; measurements from all "
+              f"TX slots interleave into output files.")
+
+    if options.metrics:
+        radio_health.enable_perf_counters()
     tb = top_block_cls(
         args=options.args, freq=options.freq, gainrx=options.gainrx,
         noise=options.noise, offset=options.offset,
         samp_rate=options.samp_rate, sps=options.sps,
         uav_id=options.uav_id, num_uavs=options.num_uavs,
         slot_duration=options.slot_duration,
-        guard_interval=options.guard_interval)
-
-    def sig_handler(sig=None, frame=None):
+        guard_interval=options.guard_interval,
+        metric_format=options.metric_format,
+        flush_interval=options.flush_interval,
+        percentiles=options.percentiles,
+        metrics_layout=options.metrics_layout,
+        replay=options.replay, throttle=options.throttle, record=options.record,
+        output_dir=options.output_dir, tdm_gating=options.tdm_gating,
+        access=options.access, fdma_channels=options.fdma_channels,
+        fdma_oversample=options.fdma_oversample, tdm_schedule=options.tdm_schedule,
+        publish=options.publish, writer_process=options.writer_process,
+        ring_size=int(options.ring_size * (1 << 20)),
+        moving_average_max_iter=options.performance['moving_average_max_iter'],
+        health=bool(options.metrics), segment_size=int(options.segment_size * (1 << 20)),
+        segment_seconds=options.segment_seconds, compress=options.compress,
+        clock_interval=options.clock_interval)
+    pinned = radio_performance.apply(tb, options.performance)
+    radio_performance.report(tb, options.performance, pinned, 'RX')
+    monitor = radio_health.HealthMonitor(tb, options.metrics) if options.metrics else None
+
+    def shutdown():
         tb.stop()
         tb.wait()
+        tb.close_metrics()
+        if tb.uhd_usrp_source_0 is not None:
+            print(f"[RX] Clock drift {1e3 * tb.rx_clock.drift():+.3f} ms "
+                  f"({tb.rx_clock.drift_ppm():+.2f} ppm) over {tb.rx_clock.updates} re-estimates")
+        if monitor is not None:
+            monitor.close()
+
+    def sig_handler(sig=None, frame=None):
+        shutdown()
         sys.exit(0)
 
     signal.signal(signal.SIGINT, sig_handler)
     signal.signal(signal.SIGTERM, sig_handler)
 
-    tb.start()
+    radio_performance.start(tb, options.performance)
+    if monitor is not None:
+        monitor.start()
 
-    try:
-        input('Press Enter to quit: ')
-    except EOFError:
-        pass
-    tb.stop()
-    tb.wait()
+    if options.replay:
+        # The file source ends the flowgraph when the recording is exhausted
+        t0 = time.monotonic()
+        tb.wait()
+        elapsed = time.monotonic() - t0
+        nsamples = os.path.getsize(options.replay) // gr.sizeof_gr_complex
+        print(f"[RX] Replayed {nsamples} samples in {elapsed:.2f} s "
+              f"({nsamples / elapsed / 1e6:.2f} MS/s, "
+              f"{nsamples / elapsed / options.samp_rate:.1f}x real time)")
+        shutdown()
+        return
+
+    if options.control:
+        ControlServer(tb, options.control, tb.CONTROL_PARAMS, {
+            'start_logging': tb.start_logging,
+            'stop_logging': tb.stop_logging,
+        }).serve_forever()
+    else:
+        try:
+            input('Press Enter to quit: ')
+        except EOFError:
+            pass
+    shutdown()
 
 
 if __name__ == '__main__':
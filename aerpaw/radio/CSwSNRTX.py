@@ -24,6 +24,17 @@ from gnuradio.eng_arg import eng_float, intx
 from gnuradio import eng_notation
 from gnuradio import uhd
 import time
+import numpy
+import pmt
+from radio_control import ControlServer
+import radio_health
+import radio_performance
+import os
+import math
+from fractions import Fraction
+from epy_block_0 import glfsr_pn
+from tdm_schedule import TdmSchedule
+from radio_channel import fdma_offset, ClockTracker
 
 
 def derive_num_uavs_from_csv(csv_path=None):
@@ -52,18 +63,21 @@ class TdmScheduler(threading.Thread):
     wall-clock TDM schedule.
 
     Slot assignment:  current_slot = floor(utc_time / slot_duration) % num_uavs
+                      unless *schedule* (a TdmSchedule) says otherwise
     Guard interval:   the first *guard_interval* seconds of every slot are
                       always muted to avoid TX overlap due to clock skew.
     """
 
     def __init__(self, mute_block, uav_id, num_uavs,
-                 slot_duration=0.5, guard_interval=0.05):
+                 slot_duration=0.5, guard_interval=0.05, schedule=None):
         super().__init__(daemon=True)
         self.mute_block = mute_block
         self.uav_id = uav_id
         self.num_uavs = num_uavs
         self.slot_duration = slot_duration
         self.guard_interval = guard_interval
+        self.schedule = schedule if schedule is not None else TdmSchedule(
+            num_uavs, slot_duration, guard_interval)
         self._stop_event = threading.Event()
 
     def run(self):
@@ -71,15 +85,9 @@ class TdmScheduler(threading.Thread):
               f"num_uavs={self.num_uavs}, slot={self.slot_duration}s, "
               f"guard={self.guard_interval}s")
         while not self._stop_event.is_set():
-            now = time.time()
-            slot_time = now % (self.slot_duration * self.num_uavs)
-            current_slot = int(slot_time / self.slot_duration)
-            time_into_slot = slot_time - current_slot * self.slot_duration
-
-            my_slot = (current_slot == self.uav_id)
-            in_guard = (time_into_slot < self.guard_interval)
-
-            should_mute = (not my_slot) or in_guard
+            # -1 inside the guard interval
+            tx_id = int(self.schedule.slot_ids(time.time()))
+            should_mute = tx_id != self.uav_id
             self.mute_block.set_mute(should_mute)
 
             # Sleep ~1 ms for responsive timing without busy-waiting
@@ -89,10 +97,243 @@ class TdmScheduler(threading.Thread):
         self._stop_event.set()
 
 
+class TdmBurstTagger(gr.sync_block):
+    """Cut the continuous waveform into one timed UHD burst per TDM frame.
+
+    Each burst is (slot_duration - guard_interval) * samp_rate samples long
+    and starts guard_interval into this UAV's slot.  Its first sample
+    carries tx_sob and tx_time (device time, i.e. host time minus
+    *clock_offset*), its last sample tx_eob, so the USRP gates the
+    transmission to the sample and the host thread simply blocks in the
+    sink between slots.  A burst whose start is less than *lead_time* away
+    is skipped to the next frame so late samples never go out mistimed.
+    With a *schedule* (TdmSchedule) the bursts follow its slots, so their
+    spacing and length may change from frame to frame.  With a *clock*
+    (radio_channel.ClockTracker) the offset is re-estimated between bursts,
+    so device clock drift does not eat into the guard interval.
+    """
+
+    def __init__(self, uav_id, num_uavs, slot_duration, guard_interval, samp_rate,
+                 clock_offset=0.0, lead_time=0.05, schedule=None, clock=None):
+        gr.sync_block.__init__(
+            self,
+            name='TDM Burst Tagger',
+            in_sig=[numpy.complex64],
+            out_sig=[numpy.complex64])
+        self.uav_id = uav_id
+        self.num_uavs = num_uavs
+        self.slot_duration = slot_duration
+        self.guard_interval = guard_interval
+        self.samp_rate = samp_rate
+        self.clock = clock
+        self.clock_offset = clock.offset if clock is not None else clock_offset
+        self.lead_time = lead_time
+        self.schedule = schedule if schedule is not None else TdmSchedule(
+            num_uavs, slot_duration, guard_interval)
+        self.bursts = 0
+        self.late = 0
+        self._remaining = 0
+        self._next_start = None
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+
+    def _next_burst(self):
+        """Host (start, end) of the next burst: the first own slot after the
+        previous burst that is still at least lead_time away, or None while
+        the schedule gives this UAV no slot."""
+        earliest = time.time() + self.lead_time
+        if self._next_start is not None and self._next_start >= earliest:
+            earliest = self._next_start
+        elif self._next_start is not None:
+            self.late += 1
+        window = self.schedule.next_slot(self.uav_id, earliest)
+        if window is not None:
+            self._next_start = window[1]
+        return window
+
+    def work(self, input_items, output_items):
+        n = len(output_items[0])
+        nwritten = self.nitems_written(0)
+        pos = 0
+        while pos < n:
+            if self._remaining == 0:
+                if self.clock is not None:
+                    self.clock_offset = self.clock.update()
+                window = self._next_burst()
+                if window is None:
+                    # Not scheduled: send nothing and check the schedule again shortly
+                    if pos == 0:
+                        time.sleep(self.schedule.poll_interval)
+                    break
+                start = window[0] - self.clock_offset
+                secs = int(start)
+                self.add_item_tag(0, nwritten + pos, pmt.intern('tx_sob'), pmt.PMT_T)
+                self.add_item_tag(0, nwritten + pos, pmt.intern('tx_time'), pmt.make_tuple(
+                    pmt.from_uint64(secs), pmt.from_double(start - secs)))
+                self._remaining = max(int(round((window[1] - window[0]) * self.samp_rate)), 1)
+                self.bursts += 1
+            step = min(self._remaining, n - pos)
+            pos += step
+            self._remaining -= step
+            if self._remaining == 0:
+                self.add_item_tag(0, nwritten + pos - 1, pmt.intern('tx_eob'), pmt.PMT_T)
+        output_items[0][:pos] = input_items[0][:pos]
+        return pos
+
+
+# Longest precomputed waveform period, in samples (256 MiB of complex64)
+MAX_WAVEFORM_PERIOD = 1 << 25
+
+
+def pn_waveform(offset, samp_rate, sps, alpha, cache_dir=None):
+    """One period of the CSwSNRWaveform output as complex64 samples.
+
+    The shaped PN repeats every 4095*sps samples and the offset tone every
+    denominator(offset/samp_rate) samples, so the output repeats after their
+    lcm.  The RRC filter is applied as a circular convolution, which is the
+    FIR filter's steady state for a periodic input.  With *cache_dir* the
+    result is loaded from / saved to a .npy file keyed by
+    (sps, alpha, offset, samp_rate).
+    """
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f'cswsnr_sps{sps}_alpha{alpha:g}_'
+                                       f'offset{offset:g}_rate{samp_rate:g}.npy')
+        if os.path.isfile(path):
+            return numpy.load(path)
+
+    pn_len = 4095 * sps
+    step = Fraction(offset) / Fraction(samp_rate)
+    period = pn_len * step.denominator // math.gcd(pn_len, step.denominator)
+    if period > MAX_WAVEFORM_PERIOD:
+        raise ValueError(f"offset {offset} Hz at {samp_rate} S/s repeats only every "
+                         f"{period} samples; pick an offset with a shorter period")
+
+    chips = numpy.zeros(pn_len, dtype=numpy.complex128)
+    chips[::sps] = glfsr_pn(12, 0, 1)
+    taps = numpy.zeros(pn_len)
+    taps_rrc = numpy.asarray(firdes.root_raised_cosine(sps, samp_rate, samp_rate/sps, alpha, 10*sps+1))
+    taps[:len(taps_rrc)] = taps_rrc
+    shaped = numpy.fft.ifft(numpy.fft.fft(chips) * numpy.fft.fft(taps))
+    # Phase index kept modulo the tone period so it stays exact
+    n = numpy.arange(period) * step.numerator % step.denominator
+    tone = numpy.exp(2j * numpy.pi * n / step.denominator)
+    data = (numpy.tile(shaped, period // pn_len) * tone / 1.58).astype(numpy.complex64)
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        numpy.save(path, data)
+    return data
+
+
+class CSwSNRWaveform(gr.hier_block2):
+    """Channel sounder baseband waveform: the 4095-chip GLFSR PN sequence as
+    RRC-shaped BPSK at *sps* samples per chip, shifted up by *offset* Hz.
+
+    Has no hardware dependency so it can feed either the USRP sink or a
+    software channel (see CSwSNRBenchmark.py).  With *precompute* one
+    period of the output is computed once (see pn_waveform) and played from
+    a repeating vector source instead of running the filter chain.
+    """
+
+    def __init__(self, offset=250e3, samp_rate=2e6, sps=16, alpha=0.99,
+                 precompute=False, cache_dir=None):
+        gr.hier_block2.__init__(
+            self, "CSwSNRWaveform",
+            gr.io_signature(0, 0, 0),
+            gr.io_signature(1, 1, gr.sizeof_gr_complex*1),
+        )
+        self.offset = offset
+        self.samp_rate = samp_rate
+        self.sps = sps
+        self.alpha = alpha
+        self.precompute = precompute
+        self.cache_dir = cache_dir
+
+        if precompute:
+            self.blocks_vector_source_0 = blocks.vector_source_c(
+                pn_waveform(offset, samp_rate, sps, alpha, cache_dir), True, 1, [])
+            self.connect((self.blocks_vector_source_0, 0), (self, 0))
+            return
+
+        self.root_raised_cosine_filter_0 = filter.fir_filter_ccf(
+            1,
+            firdes.root_raised_cosine(
+                sps,
+                samp_rate,
+                samp_rate/sps,
+                alpha,
+                10*sps+1))
+        self.interp_fir_filter_xxx_0 = filter.interp_fir_filter_ccc(sps, [1]+[0]*(sps-1))
+        self.interp_fir_filter_xxx_0.declare_sample_delay(0)
+        self.digital_glfsr_source_x_0 = digital.glfsr_source_b(12, True, 0, 1)
+        self.digital_chunks_to_symbols_xx_0 = digital.chunks_to_symbols_bc((-1,1), 1)
+        self.blocks_multiply_xx_0 = blocks.multiply_vcc(1)
+        self.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(1/1.58)
+        self.analog_sig_source_x_0 = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, offset, 1, 0, 0)
+
+        self.connect((self.analog_sig_source_x_0, 0), (self.blocks_multiply_xx_0, 1))
+        self.connect((self.blocks_multiply_xx_0, 0), (self.blocks_multiply_const_vxx_0, 0))
+        self.connect((self.blocks_multiply_const_vxx_0, 0), (self, 0))
+        self.connect((self.digital_chunks_to_symbols_xx_0, 0), (self.interp_fir_filter_xxx_0, 0))
+        self.connect((self.digital_glfsr_source_x_0, 0), (self.digital_chunks_to_symbols_xx_0, 0))
+        self.connect((self.interp_fir_filter_xxx_0, 0), (self.root_raised_cosine_filter_0, 0))
+        self.connect((self.root_raised_cosine_filter_0, 0), (self.blocks_multiply_xx_0, 0))
+
+    def rrc_taps(self):
+        return firdes.root_raised_cosine(self.sps, self.samp_rate, self.samp_rate/self.sps, self.alpha, 10*self.sps+1)
+
+    def power(self):
+        """Mean output power (linear, per sample) of the unmuted waveform."""
+        return sum(t*t for t in self.rrc_taps()) / self.sps / 1.58**2
+
+    def _update_vector(self):
+        self.blocks_vector_source_0.set_data(
+            pn_waveform(self.offset, self.samp_rate, self.sps, self.alpha, self.cache_dir), [])
+
+    def set_offset(self, offset):
+        self.offset = offset
+        if self.precompute:
+            self._update_vector()
+            return
+        self.analog_sig_source_x_0.set_frequency(self.offset)
+
+    def set_samp_rate(self, samp_rate):
+        self.samp_rate = samp_rate
+        if self.precompute:
+            self._update_vector()
+            return
+        self.analog_sig_source_x_0.set_sampling_freq(self.samp_rate)
+        self.root_raised_cosine_filter_0.set_taps(self.rrc_taps())
+
+    def set_sps(self, sps):
+        self.sps = sps
+        if self.precompute:
+            self._update_vector()
+            return
+        self.interp_fir_filter_xxx_0.set_taps([1]+[0]*(self.sps-1))
+        self.root_raised_cosine_filter_0.set_taps(self.rrc_taps())
+
+    def set_alpha(self, alpha):
+        self.alpha = alpha
+        if self.precompute:
+            self._update_vector()
+            return
+        self.root_raised_cosine_filter_0.set_taps(self.rrc_taps())
+
+
 class CSwSNRTX(gr.top_block):
 
+    # Parameters exposed on the --control socket
+    CONTROL_PARAMS = ['freq', 'gaintx', 'offset',
+                      'uav_id', 'num_uavs', 'slot_duration', 'guard_interval']
+
     def __init__(self, args='', freq=3.32e9, gaintx=76, offset=250e3, samp_rate=2e6, sps=16,
-                 uav_id=0, num_uavs=1, slot_duration=0.5, guard_interval=0.05):
+                 uav_id=0, num_uavs=1, slot_duration=0.5, guard_interval=0.05,
+                 access='tdm', fdma_channels=8, tdm_burst=False, burst_lead=0.05,
+                 precompute=False, waveform_cache=None, tdm_schedule=None, health=False,
+                 clock_interval=5.0):
         gr.top_block.__init__(self, "CSwSNRTX")
 
         ##################################################
@@ -108,6 +349,14 @@ class CSwSNRTX(gr.top_block):
         self.num_uavs = num_uavs
         self.slot_duration = slot_duration
         self.guard_interval = guard_interval
+        self.access = access
+        self.fdma_channels = fdma_channels
+        self.tdm_burst = tdm_burst = tdm_burst and access == 'tdm'
+        # Static one-slot-per-UAV frame unless tdm_schedule names a schedule file
+        self.tdm_schedule = TdmSchedule(num_uavs, slot_duration, guard_interval, path=tdm_schedule)
+        if access == 'fdma':
+            # Each UAV transmits continuously on its own channel
+            self.offset = offset = fdma_offset(uav_id, samp_rate, fdma_channels)
 
         ##################################################
         # Variables
@@ -131,35 +380,37 @@ class CSwSNRTX(gr.top_block):
         self.uhd_usrp_sink_0.set_antenna('TX/RX', 0)
         self.uhd_usrp_sink_0.set_samp_rate(samp_rate)
         self.uhd_usrp_sink_0.set_time_unknown_pps(uhd.time_spec())
-        self.root_raised_cosine_filter_0 = filter.fir_filter_ccf(
-            1,
-            firdes.root_raised_cosine(
-                sps,
-                samp_rate,
-                samp_rate/sps,
-                alpha,
-                10*sps+1))
-        self.interp_fir_filter_xxx_0 = filter.interp_fir_filter_ccc(sps, [1]+[0]*(sps-1))
-        self.interp_fir_filter_xxx_0.declare_sample_delay(0)
-        self.digital_glfsr_source_x_0 = digital.glfsr_source_b(12, True, 0, 1)
-        self.digital_chunks_to_symbols_xx_0 = digital.chunks_to_symbols_bc((-1,1), 1)
-        self.blocks_multiply_xx_0 = blocks.multiply_vcc(1)
-        self.blocks_multiply_const_vxx_0 = blocks.multiply_const_cc(1/1.58)
-        self.blocks_mute_0 = blocks.mute_cc(True)  # TDM: start muted
-        self.analog_sig_source_x_0 = analog.sig_source_c(samp_rate, analog.GR_COS_WAVE, offset, 1, 0, 0)
+        self.waveform = CSwSNRWaveform(offset, samp_rate, sps, alpha,
+                                       precompute=precompute, cache_dir=waveform_cache)
+        self.blocks_mute_0 = blocks.mute_cc(access != 'fdma')  # TDM: start muted
+        # Host/device clock offset for tx_time, re-estimated every clock_interval s
+        self.tx_clock = ClockTracker(self.uhd_usrp_sink_0, clock_interval) if tdm_burst else None
+        if tdm_burst:
+            self.blocks_tdm_burst = TdmBurstTagger(
+                uav_id, num_uavs, slot_duration, guard_interval, samp_rate,
+                lead_time=burst_lead, schedule=self.tdm_schedule, clock=self.tx_clock)
+        # Underflow/late count for the --metrics endpoint
+        self.uhd_async_counter = radio_health.UhdAsyncCounter() if health else None
+        # Mute thread of the polled TDM mode; main() starts and stops it
+        self.tdm_scheduler = None
+        if access != 'fdma' and not tdm_burst:
+            self.tdm_scheduler = TdmScheduler(
+                self.blocks_mute_0, uav_id, num_uavs, slot_duration, guard_interval,
+                schedule=self.tdm_schedule)
 
 
         ##################################################
         # Connections
         ##################################################
-        self.connect((self.analog_sig_source_x_0, 0), (self.blocks_multiply_xx_0, 1))
-        self.connect((self.blocks_multiply_const_vxx_0, 0), (self.blocks_mute_0, 0))
-        self.connect((self.blocks_mute_0, 0), (self.uhd_usrp_sink_0, 0))
-        self.connect((self.blocks_multiply_xx_0, 0), (self.blocks_multiply_const_vxx_0, 0))
-        self.connect((self.digital_chunks_to_symbols_xx_0, 0), (self.interp_fir_filter_xxx_0, 0))
-        self.connect((self.digital_glfsr_source_x_0, 0), (self.digital_chunks_to_symbols_xx_0, 0))
-        self.connect((self.interp_fir_filter_xxx_0, 0), (self.root_raised_cosine_filter_0, 0))
-        self.connect((self.root_raised_cosine_filter_0, 0), (self.blocks_multiply_xx_0, 0))
+        if tdm_burst:
+            # The USRP gates each slot from the burst tags; no mute needed
+            self.connect((self.waveform, 0), (self.blocks_tdm_burst, 0))
+            self.connect((self.blocks_tdm_burst, 0), (self.uhd_usrp_sink_0, 0))
+        else:
+            self.connect((self.waveform, 0), (self.blocks_mute_0, 0))
+            self.connect((self.blocks_mute_0, 0), (self.uhd_usrp_sink_0, 0))
+        if self.uhd_async_counter is not None:
+            self.msg_connect((self.uhd_usrp_sink_0, 'async_msgs'), (self.uhd_async_counter, 'async_msgs'))
 
 
     def get_args(self):
@@ -187,15 +438,16 @@ class CSwSNRTX(gr.top_block):
 
     def set_offset(self, offset):
         self.offset = offset
-        self.analog_sig_source_x_0.set_frequency(self.offset)
+        self.waveform.set_offset(self.offset)
 
     def get_samp_rate(self):
         return self.samp_rate
 
     def set_samp_rate(self, samp_rate):
         self.samp_rate = samp_rate
-        self.analog_sig_source_x_0.set_sampling_freq(self.samp_rate)
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(self.sps, self.samp_rate, self.samp_rate/self.sps, self.alpha, 10*self.sps+1))
+        self.waveform.set_samp_rate(self.samp_rate)
+        if self.tdm_burst:
+            self.blocks_tdm_burst.set_samp_rate(self.samp_rate)
         self.uhd_usrp_sink_0.set_samp_rate(self.samp_rate)
 
     def get_sps(self):
@@ -203,15 +455,63 @@ class CSwSNRTX(gr.top_block):
 
     def set_sps(self, sps):
         self.sps = sps
-        self.interp_fir_filter_xxx_0.set_taps([1]+[0]*(self.sps-1))
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(self.sps, self.samp_rate, self.samp_rate/self.sps, self.alpha, 10*self.sps+1))
+        self.waveform.set_sps(self.sps)
 
     def get_alpha(self):
         return self.alpha
 
     def set_alpha(self, alpha):
         self.alpha = alpha
-        self.root_raised_cosine_filter_0.set_taps(firdes.root_raised_cosine(self.sps, self.samp_rate, self.samp_rate/self.sps, self.alpha, 10*self.sps+1))
+        self.waveform.set_alpha(self.alpha)
+
+    def get_uav_id(self):
+        return self.uav_id
+
+    def set_uav_id(self, uav_id):
+        self.uav_id = uav_id
+        if self.access == 'fdma':
+            self.set_offset(fdma_offset(self.uav_id, self.samp_rate, self.fdma_channels))
+        if self.tdm_burst:
+            self.blocks_tdm_burst.uav_id = self.uav_id
+        if self.tdm_scheduler is not None:
+            self.tdm_scheduler.uav_id = self.uav_id
+
+    def get_num_uavs(self):
+        return self.num_uavs
+
+    def set_num_uavs(self, num_uavs):
+        self.num_uavs = num_uavs
+        self.tdm_schedule.set_static(self.num_uavs, self.slot_duration, self.guard_interval)
+
+    def get_slot_duration(self):
+        return self.slot_duration
+
+    def set_slot_duration(self, slot_duration):
+        self.slot_duration = slot_duration
+        self.tdm_schedule.set_static(self.num_uavs, self.slot_duration, self.guard_interval)
+
+    def get_guard_interval(self):
+        return self.guard_interval
+
+    def set_guard_interval(self, guard_interval):
+        self.guard_interval = guard_interval
+        self.tdm_schedule.set_static(self.num_uavs, self.slot_duration, self.guard_interval)
+
+    def health(self):
+        """Counters for the --metrics endpoint (radio_health.HealthMonitor)."""
+        health = {'samples_total': int(self.uhd_usrp_sink_0.nitems_read(0))}
+        if self.uhd_async_counter is not None:
+            health['underflows'] = self.uhd_async_counter.underflows
+            health['late'] = self.uhd_async_counter.late
+        if self.tx_clock is not None:
+            health['clock_offset'] = self.tx_clock.offset
+            health['clock_drift'] = self.tx_clock.drift()
+            health['clock_drift_ppm'] = self.tx_clock.drift_ppm()
+        if self.access == 'fdma':
+            health['tdm_duty'] = {self.uav_id: 1.0}
+        else:
+            health['tdm_duty'] = {self.uav_id: self.tdm_schedule.duty(time.time()).get(self.uav_id, 0.0)}
+        return health
 
 
 def argument_parser():
@@ -249,6 +549,48 @@ def argument_parser():
     parser.add_argument(
         "--guard-interval", dest="guard_interval", type=float, default=None,
         help="TDM guard interval in seconds [default: 0.05 or from client.yaml]")
+    parser.add_argument(
+        "--metrics", dest="metrics", type=str, default=None, metavar="ADDRESS",
+        help="Serve throughput, per-block and underflow metrics on http:HOST:PORT "
+             "or unix:PATH (see radio_health.py)")
+    parser.add_argument(
+        "--control", dest="control", type=str, default=None, metavar="PATH",
+        help="Keep running and accept get/set and logging commands on the Unix "
+             "socket PATH instead of waiting for Enter (see radio_control.py)")
+    parser.add_argument(
+        "--tdm-schedule", dest="tdm_schedule", type=str, default=None, metavar="PATH",
+        help="Adaptive TDM schedule file shared with the RX (see tdm_schedule.py) "
+             "[default: tdm.schedule_file from client.yaml, or the static schedule]")
+    parser.add_argument(
+        "--access", dest="access", choices=['tdm', 'fdma'], default=None,
+        help="Multiple access scheme; fdma replaces --offset with this UAV's "
+             "channel offset [default: tdm or multiple_access from client.yaml]")
+    parser.add_argument(
+        "--fdma-channels", dest="fdma_channels", type=int, default=None,
+        help="Number of FDMA channels across samp_rate "
+             "[default: 8 or fdma.channels from client.yaml]")
+    parser.add_argument(
+        "--tdm-burst", dest="tdm_burst", action="store_true", default=None,
+        help="Send each TDM slot as a timed UHD burst (tx_time/tx_sob/tx_eob) "
+             "instead of muting from a 1 ms polling thread "
+             "[default: tdm.burst from client.yaml]")
+    parser.add_argument(
+        "--burst-lead", dest="burst_lead", type=float, default=0.05,
+        help="Minimum time in seconds between tagging a burst and its "
+             "tx_time [default=%(default)r]")
+    parser.add_argument(
+        "--clock-interval", dest="clock_interval", type=float, default=5.0,
+        help="Seconds between re-estimates of the host/USRP clock offset used "
+             "for burst tx_time, 0 = estimate once [default=%(default)r]")
+    parser.add_argument(
+        "--precompute", dest="precompute", action="store_true",
+        help="Compute one period of the waveform at startup and replay it "
+             "instead of running the PN/RRC/offset filter chain")
+    parser.add_argument(
+        "--waveform-cache", dest="waveform_cache", type=str, default=None, metavar="DIR",
+        help="Load/save the precomputed waveform in DIR, keyed by sps, alpha, "
+             "offset and samp_rate (implies --precompute)")
+    radio_performance.add_arguments(parser)
     return parser
 
 
@@ -269,6 +611,7 @@ def _resolve_tdm_options(options):
             cfg = yaml.safe_load(f) or {}
 
     tdm_cfg = cfg.get('tdm', {})
+    fdma_cfg = cfg.get('fdma', {})
 
     if options.uav_id is None:
         options.uav_id = int(cfg.get('uav_id', 0))
@@ -284,6 +627,15 @@ def _resolve_tdm_options(options):
             print(f"[TDM] Warning: could not derive num_uavs from scenario.csv: {e}")
             print("[TDM] Defaulting to num_uavs=1 (TDM effectively disabled)")
             options.num_uavs = 1
+    if options.tdm_schedule is None:
+        options.tdm_schedule = tdm_cfg.get('schedule_file') or None
+    if options.access is None:
+        options.access = str(cfg.get('multiple_access', 'tdm')).lower()
+    if options.fdma_channels is None:
+        options.fdma_channels = int(fdma_cfg.get('channels', 8))
+    if options.tdm_burst is None:
+        options.tdm_burst = bool(tdm_cfg.get('burst', False))
+    options.performance = radio_performance.resolve(options, cfg)
 
     return options
 
@@ -294,43 +646,68 @@ def main(top_block_cls=CSwSNRTX, options=None):
 
     options = _resolve_tdm_options(options)
 
+    if options.metrics:
+        radio_health.enable_perf_counters()
     tb = top_block_cls(
         args=options.args, freq=options.freq, gaintx=options.gaintx,
         offset=options.offset, samp_rate=options.samp_rate, sps=options.sps,
         uav_id=options.uav_id, num_uavs=options.num_uavs,
         slot_duration=options.slot_duration,
-        guard_interval=options.guard_interval)
-
-    tdm_sched = TdmScheduler(
-        tb.blocks_mute_0,
-        uav_id=options.uav_id,
-        num_uavs=options.num_uavs,
-        slot_duration=options.slot_duration,
-        guard_interval=options.guard_interval)
-
-    def sig_handler(sig=None, frame=None):
-        tdm_sched.stop()
+        guard_interval=options.guard_interval,
+        access=options.access, fdma_channels=options.fdma_channels,
+        tdm_burst=options.tdm_burst, burst_lead=options.burst_lead,
+        precompute=options.precompute or bool(options.waveform_cache),
+        waveform_cache=options.waveform_cache, tdm_schedule=options.tdm_schedule,
+        health=bool(options.metrics), clock_interval=options.clock_interval)
+    pinned = radio_performance.apply(tb, options.performance)
+    radio_performance.report(tb, options.performance, pinned, 'TX')
+    monitor = radio_health.HealthMonitor(tb, options.metrics) if options.metrics else None
+
+    if options.access == 'fdma':
+        print(f"[FDMA] uav_id={options.uav_id} transmitting on "
+              f"{tb.get_offset() / 1e3:+.1f} kHz ({options.fdma_channels} channels)")
+    elif tb.tdm_burst:
+        print(f"[TDM] Burst mode: uav_id={options.uav_id}, "
+              f"num_uavs={options.num_uavs}, slot={options.slot_duration}s, "
+              f"guard={options.guard_interval}s, "
+              f"clock_offset={tb.blocks_tdm_burst.clock_offset:.6f}s")
+    tdm_sched = tb.tdm_scheduler
+
+    def shutdown():
+        if tdm_sched is not None:
+            tdm_sched.stop()
         tb.stop()
         tb.wait()
+        if tb.tdm_burst:
+            burst = tb.blocks_tdm_burst
+            print(f"[TDM] {burst.bursts} bursts, {burst.late} skipped late; clock drift "
+                  f"{1e3 * tb.tx_clock.drift():+.3f} ms ({tb.tx_clock.drift_ppm():+.2f} ppm) "
+                  f"over {tb.tx_clock.updates} re-estimates")
+        if monitor is not None:
+            monitor.close()
+
+    def sig_handler(sig=None, frame=None):
+        shutdown()
         sys.exit(0)
 
     signal.signal(signal.SIGINT, sig_handler)
     signal.signal(signal.SIGTERM, sig_handler)
 
-    tb.start()
-    tdm_sched.start()
+    radio_performance.start(tb, options.performance)
+    if tdm_sched is not None:
+        tdm_sched.start()
+    if monitor is not None:
+        monitor.start()
 
-    try:
-        input('Press Enter to quit: ')
-    except EOFError:
-        pass
-    tdm_sched.stop()
-    tb.stop()
-    tb.wait()
+    if options.control:
+        ControlServer(tb, options.control, tb.CONTROL_PARAMS).serve_forever()
+    else:
+        try:
+            input('Press Enter to quit: ')
+        except EOFError:
+            pass
+    shutdown()
 
 
 if __name__ == '__main__':
     main()
-(END)
-
-
@@ -0,0 +1,101 @@
+"""
+PN correlator for the channel sounder receiver (CSwSNRRX epy_block_0).
+
+Each input vector holds one PN period (2**degree - 1 symbols) of the
+demodulated BPSK stream.  The block circularly correlates every vector with
+the PN sequence the transmitter's glfsr_source_b produces and rotates the
+result so the correlation peak lands at PEAK_INDEX.  CSwSNRRX reads the peak
+from the bins around PEAK_INDEX and the noise floor from bins far from it.
+
+All vectors handed to one work() call are correlated with a single batched
+FFT.  scipy.fft is used when available so the FFT can run on *nthreads*
+cores, otherwise numpy.fft.
+"""
+
+import os
+
+import numpy
+from gnuradio import gr
+
+try:
+    import scipy.fft as _fft
+except ImportError:
+    _fft = None
+
+# Bin of the output vector the correlation peak is rotated to
+PEAK_INDEX = 2
+
+# Default feedback masks of gr::digital::glfsr (glfsr::glfsr_mask) for the
+# degrees the channel sounder uses
+GLFSR_MASKS = {12: 0x829}
+
+
+def glfsr_pn(degree=12, mask=0, seed=1):
+    """One period of the +-1 PN sequence produced by
+    ``digital.glfsr_source_b(degree, True, mask, seed)`` followed by
+    ``digital.chunks_to_symbols_bc((-1, 1))``.
+
+    A *mask* of 0 selects GNU Radio's default mask for *degree*.
+    """
+    if mask == 0:
+        mask = GLFSR_MASKS[degree]
+    length = (1 << degree) - 1
+    bits = numpy.empty(length, dtype=numpy.int8)
+    reg = seed
+    for i in range(length):
+        bit = reg & 1
+        reg >>= 1
+        if bit:
+            reg ^= mask
+        bits[i] = bit
+    return (2 * bits - 1).astype(numpy.float32)
+
+
+class blk(gr.sync_block):
+    """Batched FFT circular correlator against the GLFSR PN sequence.
+
+    Input and output are complex vectors of one PN period.  *batch* sets
+    the output multiple, i.e. the minimum number of periods correlated per
+    call (higher favours throughput over latency); *nthreads* of 0 uses
+    every CPU of the host.
+    """
+
+    def __init__(self, degree=12, mask=0, seed=1, batch=1, nthreads=0):
+        self.pn = glfsr_pn(degree, mask, seed)
+        self.vlen = len(self.pn)
+        gr.sync_block.__init__(
+            self,
+            name='PN Correlator',
+            in_sig=[(numpy.complex64, self.vlen)],
+            out_sig=[(numpy.complex64, self.vlen)])
+        self.set_batch(batch)
+        self.set_nthreads(nthreads)
+        self._pn_fft_conj = numpy.conj(self._fwd(self.pn.astype(numpy.complex64)))
+        self._bins = numpy.arange(self.vlen)
+
+    def set_batch(self, batch):
+        self.batch = max(int(batch), 1)
+        self.set_output_multiple(self.batch)
+
+    def set_nthreads(self, nthreads):
+        self.nthreads = nthreads if nthreads > 0 else (os.cpu_count() or 1)
+
+    def _fwd(self, x):
+        if _fft is not None:
+            return _fft.fft(x, axis=-1, workers=self.nthreads)
+        return numpy.fft.fft(x, axis=-1)
+
+    def _inv(self, x):
+        if _fft is not None:
+            return _fft.ifft(x, axis=-1, workers=self.nthreads)
+        return numpy.fft.ifft(x, axis=-1)
+
+    def work(self, input_items, output_items):
+        x = input_items[0]
+        n = len(x)
+        corr = self._inv(self._fwd(x) * self._pn_fft_conj)
+        # Rotate each row so its peak sits at PEAK_INDEX
+        peaks = numpy.argmax(corr.real**2 + corr.imag**2, axis=1)
+        cols = (self._bins[None, :] + (peaks - PEAK_INDEX)[:, None]) % self.vlen
+        output_items[0][:n] = corr[numpy.arange(n)[:, None], cols]
+        return n
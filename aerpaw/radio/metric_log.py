@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Segmented CSwSNRRX metric logs.
+
+With --segment-size and/or --segment-seconds each metric file ``<base>``
+(e.g. /root/SNR) is written as numbered segments ``<base>.00000``,
+``<base>.00001``, ... that close when they reach the size or span the time
+bound (by sample capture time).  Every segment starts with the file's
+header, so it can be read on its own.  A background thread compresses each
+closed segment (``.gz`` or ``.xz``) and then appends it to the index
+``<base>.index``::
+
+    segment,start,end,rows,bytes,raw_bytes,tx_ids
+    SNR.00000.gz,1792348870.012,1792348930.004,3662,5120,21874,0;1;2
+
+start/end are the first and last sample times, rows the samples (or
+aggregate records) written, bytes the size of the segment file as stored
+(compressed), raw_bytes its size uncompressed and tx_ids the transmitters
+seen outside guard intervals, so readers can open only the segments of a
+time window or transmitter.  Run this module to print the segments covering a window::
+
+    python3 metric_log.py /root/SNR --start 1792348900 --end 1792348960 --tx-id 1
+"""
+
+import csv
+import gzip
+import lzma
+import os
+import queue
+import threading
+from argparse import ArgumentParser
+
+import numpy
+
+COMPRESSORS = {'none': None, 'gzip': '.gz', 'xz': '.xz'}
+INDEX_COLUMNS = ['segment', 'start', 'end', 'rows', 'bytes', 'raw_bytes', 'tx_ids']
+
+
+class SegmentedFile(object):
+    """Write-only file object splitting its output into segments of at most
+    about *max_bytes* bytes and *max_seconds* seconds of samples (0 for no
+    bound).  *header* is written at the start of every segment.  Callers
+    report the samples of each write with :meth:`note`."""
+
+    def __init__(self, base, header=b'', buffer_size=1 << 20, max_bytes=0, max_seconds=0,
+                 compress='gzip'):
+        if compress not in COMPRESSORS:
+            raise ValueError(f"Unknown compression '{compress}'; expected none, gzip or xz")
+        self.base = base
+        self._header = header
+        self._buffer_size = buffer_size
+        self._max_bytes = max_bytes
+        self._max_seconds = max_seconds
+        self._compress = compress
+        self._number = 0
+        self._f = None
+        # Closed segments waiting for compression and indexing
+        self._jobs = queue.Queue()
+        with open(self.index_path(base), 'w') as f:
+            f.write(','.join(INDEX_COLUMNS) + '\n')
+        self._worker = threading.Thread(target=self._work, name='segment-compressor', daemon=True)
+        self._worker.start()
+        self._open_segment()
+
+    @staticmethod
+    def index_path(base):
+        return base + '.index'
+
+    def _open_segment(self):
+        self._path = f'{self.base}.{self._number:05d}'
+        self._number += 1
+        self._f = open(self._path, 'wb', buffering=self._buffer_size)
+        self._f.write(self._header)
+        self._start = self._end = None
+        self._rows = 0
+        self._tx_ids = set()
+
+    def note(self, times, tx_ids):
+        """Account the samples (capture *times*, *tx_ids*) of the data
+        written since the last note."""
+        if len(times) == 0:
+            return
+        if self._start is None:
+            self._start = float(times[0])
+        self._end = float(times[-1])
+        self._rows += len(times)
+        self._tx_ids.update(int(t) for t in numpy.unique(tx_ids) if t >= 0)
+
+    def write(self, data):
+        self._f.write(data)
+
+    def flush(self):
+        self._f.flush()
+
+    def maybe_rotate(self):
+        """Start a new segment if the current one reached a bound."""
+        if self._max_bytes and self._f.tell() >= self._max_bytes:
+            self.rotate()
+        elif (self._max_seconds and self._start is not None
+              and self._end - self._start >= self._max_seconds):
+            self.rotate()
+
+    def rotate(self):
+        self._close_segment()
+        self._open_segment()
+
+    def _close_segment(self):
+        size = self._f.tell()
+        self._f.close()
+        if self._rows == 0:
+            os.unlink(self._path)
+            return
+        self._jobs.put((self._path, self._start, self._end, self._rows, size, sorted(self._tx_ids)))
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            path, start, end, rows, raw_size, tx_ids = job
+            suffix = COMPRESSORS[self._compress]
+            if suffix:
+                opener = gzip.open if suffix == '.gz' else lzma.open
+                with open(path, 'rb') as src, opener(path + suffix + '.tmp', 'wb') as dst:
+                    while True:
+                        chunk = src.read(1 << 20)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                os.replace(path + suffix + '.tmp', path + suffix)
+                os.unlink(path)
+                path += suffix
+            with open(self.index_path(self.base), 'a') as f:
+                f.write(f"{os.path.basename(path)},{start:.6f},{end:.6f},{rows},"
+                        f"{os.path.getsize(path)},{raw_size},{';'.join(map(str, tx_ids))}\n")
+
+    def close(self):
+        """Close the last segment and wait until every segment is
+        compressed and indexed."""
+        if self._f is None:
+            return
+        self._close_segment()
+        self._f = None
+        self._jobs.put(None)
+        self._worker.join()
+
+
+def read_index(base):
+    """Index rows of the segmented log *base* (segment paths made
+    absolute, times as floats, tx_ids as a list of ints)."""
+    rows = []
+    with open(SegmentedFile.index_path(base), 'r') as f:
+        for row in csv.DictReader(f):
+            rows.append({
+                'segment': os.path.join(os.path.dirname(base), row['segment']),
+                'start': float(row['start']), 'end': float(row['end']),
+                'rows': int(row['rows']), 'bytes': int(row['bytes']),
+                'raw_bytes': int(row['raw_bytes']),
+                'tx_ids': [int(t) for t in row['tx_ids'].split(';') if t],
+            })
+    return rows
+
+
+def segments(base, start=None, end=None, tx_id=None):
+    """Index rows of the segments overlapping [*start*, *end*] that contain
+    samples of *tx_id* (None: any)."""
+    return [row for row in read_index(base)
+            if (start is None or row['end'] >= start)
+            and (end is None or row['start'] <= end)
+            and (tx_id is None or tx_id in row['tx_ids'])]
+
+
+def open_segment(path):
+    """Binary file object of a plain, .gz or .xz segment."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.xz'):
+        return lzma.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def argument_parser():
+    description = 'List the segments of a CSwSNRRX metric log covering a time window'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "base", type=str,
+        help="Metric log base path, e.g. /root/SNR")
+    parser.add_argument(
+        "--start", dest="start", type=float, default=None,
+        help="Window start, host time in seconds [default: log start]")
+    parser.add_argument(
+        "--end", dest="end", type=float, default=None,
+        help="Window end, host time in seconds [default: log end]")
+    parser.add_argument(
+        "--tx-id", dest="tx_id", type=int, default=None,
+        help="Only segments with samples from this transmitter")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    for row in segments(options.base, options.start, options.end, options.tx_id):
+        print(f"{row['segment']} {row['start']:.3f}-{row['end']:.3f} "
+              f"rows={row['rows']} tx_ids={','.join(map(str, row['tx_ids']))}")
+
+
+if __name__ == '__main__':
+    main()
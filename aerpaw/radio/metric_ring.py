@@ -0,0 +1,122 @@
+"""
+Single-producer/single-consumer ring buffer of metric sample blocks in a
+memory-mapped file, for handing CSwSNRRX metric streams to a separate
+writer process without locks or system calls on the producer side.
+
+The file starts with a 64-byte header (magic, capacity, head, tail, dropped
+counters) followed by *capacity* bytes of messages.  head and tail are
+monotonically increasing byte counters: only the producer stores head, only
+the consumer stores tail, each as one aligned 8-byte store made after the
+message bytes it publishes or releases (x86 keeps stores in order).  Each
+message is 8-byte aligned::
+
+    u4 length, u2 writer, i1 tx_uav_id, u1 pad, u4 stream, u4 n, u4 ncols, u4 pad,
+    f8 times[n], f4 vals[n * ncols], padding
+
+A message that does not fit before the end of the buffer is preceded by a
+filler message (writer PAD_WRITER) up to the end, or by nothing if fewer
+than a message header's bytes remain.  push() never blocks: when
+the consumer falls behind the block is dropped and counted.
+"""
+
+import mmap
+import os
+import struct
+
+import numpy
+
+MAGIC = 0x4353574d52494e47  # 'CSWMRING'
+HEADER_SIZE = 64
+MSG = struct.Struct('<IHbxIIII')
+PAD_WRITER = 0xFFFF
+
+
+class MetricRing(object):
+    """Open (or with *capacity*, create) the ring at *path*."""
+
+    def __init__(self, path, capacity=None):
+        self.path = path
+        if capacity is not None:
+            capacity = (int(capacity) + 7) // 8 * 8
+            with open(path, 'wb') as f:
+                f.truncate(HEADER_SIZE + capacity)
+        self._fd = os.open(path, os.O_RDWR)
+        self._map = mmap.mmap(self._fd, 0)
+        self._ctl = numpy.frombuffer(self._map, dtype='<u8', count=8)
+        if capacity is not None:
+            self._ctl[1] = capacity
+            self._ctl[2:5] = 0
+            self._ctl[0] = MAGIC
+        elif self._ctl[0] != MAGIC:
+            raise ValueError(f"{path} is not a metric ring")
+        self.capacity = int(self._ctl[1])
+        self._data = numpy.frombuffer(self._map, dtype=numpy.uint8, offset=HEADER_SIZE,
+                                      count=self.capacity)
+
+    @property
+    def dropped(self):
+        return int(self._ctl[4])
+
+    @property
+    def head(self):
+        """Producer position: pop(until=head) stops after what is pushed now."""
+        return int(self._ctl[2])
+
+    def backlog(self):
+        """Bytes written but not yet consumed."""
+        return int(self._ctl[2]) - int(self._ctl[3])
+
+    def push(self, writer, tx_id, stream, times, vals):
+        """Append one block; returns False (and counts a drop) if full."""
+        n = len(times)
+        vals = numpy.ascontiguousarray(vals, dtype=numpy.float32).reshape(n, -1)
+        ncols = vals.shape[1]
+        length = (MSG.size + 8 * n + 4 * n * ncols + 7) // 8 * 8
+        head, tail = int(self._ctl[2]), int(self._ctl[3])
+        pos = head % self.capacity
+        filler = self.capacity - pos if pos + length > self.capacity else 0
+        if length + filler > self.capacity - (head - tail):
+            self._ctl[4] += 1
+            return False
+        if filler:
+            if filler >= MSG.size:
+                MSG.pack_into(self._data, pos, filler, PAD_WRITER, 0, 0, 0, 0, 0)
+            pos = 0
+        MSG.pack_into(self._data, pos, length, writer, tx_id, stream, n, ncols, 0)
+        a = pos + MSG.size
+        self._data[a:a + 8 * n] = numpy.asarray(times, dtype='<f8').view(numpy.uint8)
+        a += 8 * n
+        self._data[a:a + 4 * n * ncols] = vals.astype('<f4', copy=False).reshape(-1).view(numpy.uint8)
+        # Publish only after the message bytes are in place
+        self._ctl[2] = head + filler + length
+        return True
+
+    def pop(self, until=None):
+        """Next block as (writer, tx_id, stream, times, vals), or None if
+        the ring is empty (or consumed up to position *until*).  The arrays
+        are copies."""
+        while True:
+            head, tail = int(self._ctl[2]), int(self._ctl[3])
+            if until is not None:
+                head = min(head, until)
+            if tail >= head:
+                return None
+            pos = tail % self.capacity
+            if self.capacity - pos < MSG.size:
+                self._ctl[3] = tail + self.capacity - pos
+                continue
+            length, writer, tx_id, stream, n, ncols, _ = MSG.unpack_from(self._data, pos)
+            if writer == PAD_WRITER:
+                self._ctl[3] = tail + length
+                continue
+            a = pos + MSG.size
+            times = self._data[a:a + 8 * n].view('<f8').copy()
+            a += 8 * n
+            vals = self._data[a:a + 4 * n * ncols].view('<f4').reshape(n, ncols).copy()
+            self._ctl[3] = tail + length
+            return writer, tx_id, stream, times, vals
+
+    def close(self):
+        self._ctl = self._data = None
+        self._map.close()
+        os.close(self._fd)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Live per-slot link metrics from CSwSNRRX over a local datagram socket.
+
+CSwSNRRX --publish ADDRESS sends every per-(TDM slot, tx_uav_id) aggregate
+record (see SlotAggregator) as soon as the slot completes, so subscribers
+see a slot at most one slot plus one metric period after it ends.  ADDRESS
+is ``udp:HOST:PORT`` or ``unix:PATH`` (a bare absolute path means unix).
+
+Subscribers send any datagram to ADDRESS to subscribe and must repeat it
+within the publisher's *ttl* (default 10 s) to stay subscribed.  Sends never
+block the receiver: a subscriber that cannot keep up loses datagrams.
+
+Every datagram starts with HEADER (magic, version, kind):
+
+* KIND_SCHEMA -- UTF-8 JSON ``{stream: [column, ...]}``, sent on subscribe.
+* KIND_RECORDS -- STREAM_HEADER (stream name, values per record, record
+  count) followed by packed records of record_dtype(n_values):
+  tx_uav_id, frame, timestamp, count and the float32 statistics in schema
+  column order.
+
+Run this module to print the records of a running receiver::
+
+    python3 metric_stream.py udp:127.0.0.1:5600
+"""
+
+import json
+import os
+import socket
+import struct
+import time
+from argparse import ArgumentParser
+
+import numpy
+
+MAGIC = b'CSWM'
+VERSION = 1
+KIND_SCHEMA = 0
+KIND_RECORDS = 1
+HEADER = struct.Struct('<4sBB')
+STREAM_HEADER = struct.Struct('<16sHH')
+# Largest datagram payload we send
+MAX_DATAGRAM = 60000
+
+
+def record_dtype(n_values):
+    return numpy.dtype([('tx_uav_id', '<i1'), ('frame', '<i8'), ('timestamp', '<f8'),
+                        ('count', '<u4'), ('values', '<f4', (n_values,))])
+
+
+def parse_address(address):
+    """``(family, sockaddr)`` of a ``udp:HOST:PORT`` / ``unix:PATH`` address."""
+    if address.startswith('udp:'):
+        host, _, port = address[4:].rpartition(':')
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[5:]
+    if address.startswith('/'):
+        return socket.AF_UNIX, address
+    raise ValueError(f"Unknown metric address '{address}'; expected udp:HOST:PORT or unix:PATH")
+
+
+class MetricPublisher(object):
+    """Non-blocking datagram publisher of aggregate metric records."""
+
+    def __init__(self, address, ttl=10.0):
+        self.address = address
+        self.ttl = ttl
+        family, self._sockaddr = parse_address(address)
+        self._sock = socket.socket(family, socket.SOCK_DGRAM)
+        if family == socket.AF_UNIX and os.path.exists(self._sockaddr):
+            os.unlink(self._sockaddr)
+        self._sock.bind(self._sockaddr)
+        self._sock.setblocking(False)
+        self._schemas = {}
+        self._subscribers = {}
+        self.sent = 0
+        self.dropped = 0
+
+    def register(self, stream, columns):
+        """Announce the aggregate *columns* of *stream* to subscribers."""
+        self._schemas[stream] = list(columns)
+        for addr in list(self._subscribers):
+            self._send_schema(addr)
+
+    def _send_schema(self, addr):
+        self._send(addr, HEADER.pack(MAGIC, VERSION, KIND_SCHEMA)
+                   + json.dumps(self._schemas).encode('utf-8'))
+
+    def _send(self, addr, data):
+        try:
+            self._sock.sendto(data, addr)
+            self.sent += 1
+        except (BlockingIOError, InterruptedError):
+            self.dropped += 1
+        except OSError:
+            # Subscriber went away (e.g. its unix socket was removed)
+            self._subscribers.pop(addr, None)
+
+    def _poll_subscriptions(self):
+        now = time.monotonic()
+        while True:
+            try:
+                _, addr = self._sock.recvfrom(64)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                break
+            if not addr:
+                continue
+            if addr not in self._subscribers:
+                self._send_schema(addr)
+            self._subscribers[addr] = now + self.ttl
+        for addr, expiry in list(self._subscribers.items()):
+            if expiry < now:
+                del self._subscribers[addr]
+
+    def publish(self, stream, rows):
+        """Send aggregate *rows* (SlotAggregator output) of *stream*."""
+        self._poll_subscriptions()
+        if not self._subscribers or len(rows) == 0:
+            return
+        n_values = rows.shape[1] - 4
+        rec = numpy.empty(len(rows), dtype=record_dtype(n_values))
+        rec['tx_uav_id'] = rows[:, 0]
+        rec['frame'] = rows[:, 1]
+        rec['timestamp'] = rows[:, 2]
+        rec['count'] = rows[:, 3]
+        rec['values'] = rows[:, 4:]
+        per_datagram = max((MAX_DATAGRAM - HEADER.size - STREAM_HEADER.size) // rec.itemsize, 1)
+        name = stream.encode('ascii')[:16]
+        for i in range(0, len(rec), per_datagram):
+            chunk = rec[i:i + per_datagram]
+            data = (HEADER.pack(MAGIC, VERSION, KIND_RECORDS)
+                    + STREAM_HEADER.pack(name, n_values, len(chunk)) + chunk.tobytes())
+            for addr in list(self._subscribers):
+                self._send(addr, data)
+
+    def close(self):
+        self._sock.close()
+        if self._sock.family == socket.AF_UNIX and os.path.exists(self._sockaddr):
+            os.unlink(self._sockaddr)
+
+
+def decode(data):
+    """``('schema', {stream: columns})`` or ``('records', stream, records)``
+    for one datagram; None if it is not a metric message."""
+    if len(data) < HEADER.size:
+        return None
+    magic, version, kind = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    body = data[HEADER.size:]
+    if kind == KIND_SCHEMA:
+        return 'schema', json.loads(body.decode('utf-8'))
+    name, n_values, count = STREAM_HEADER.unpack_from(body)
+    records = numpy.frombuffer(body, dtype=record_dtype(n_values), count=count,
+                               offset=STREAM_HEADER.size)
+    return 'records', name.rstrip(b'\0').decode('ascii'), records
+
+
+def subscribe(address, renew=2.0, timeout=None):
+    """Yield decoded messages from the publisher at *address* (or from every
+    publisher in a list of addresses of one family), renewing the
+    subscription every *renew* seconds."""
+    addresses = [address] if isinstance(address, str) else list(address)
+    parsed = [parse_address(a) for a in addresses]
+    family = parsed[0][0]
+    if any(f != family for f, _ in parsed):
+        raise ValueError("Cannot subscribe to udp and unix publishers at once")
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    # Unix datagram subscribers need an address to be replied to; '' autobinds
+    sock.bind('' if family == socket.AF_UNIX else ('', 0))
+    sock.settimeout(min(renew, timeout) if timeout else renew)
+    next_renew = 0.0
+    deadline = time.monotonic() + timeout if timeout else None
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            if time.monotonic() >= next_renew:
+                for _, sockaddr in parsed:
+                    try:
+                        sock.sendto(b'S', sockaddr)
+                    except OSError:
+                        pass
+                next_renew = time.monotonic() + renew
+            try:
+                data = sock.recv(MAX_DATAGRAM + 64)
+            except socket.timeout:
+                continue
+            except OSError:
+                time.sleep(renew)
+                continue
+            msg = decode(data)
+            if msg is not None:
+                yield msg
+    finally:
+        sock.close()
+
+
+def argument_parser():
+    description = 'Print live CSwSNRRX link metrics'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "address", type=str,
+        help="Publisher address, udp:HOST:PORT or unix:PATH")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    schemas = {}
+    for msg in subscribe(options.address):
+        if msg[0] == 'schema':
+            schemas = msg[1]
+            continue
+        _, stream, records = msg
+        columns = schemas.get(stream, [])[4:]
+        for rec in records:
+            values = ' '.join(f'{c}={v:.2f}' for c, v in zip(columns, rec['values']))
+            print(f"{stream} t={rec['timestamp']:.3f} tx={rec['tx_uav_id']} "
+                  f"frame={rec['frame']} n={rec['count']} {values}", flush=True)
+
+
+if __name__ == '__main__':
+    main()
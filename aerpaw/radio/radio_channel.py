@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+FDMA channel plan and USRP clock alignment shared by CSwSNRTX and CSwSNRRX.
+
+Both ends must agree on which polyphase channel each UAV occupies, and both
+compare host wall-clock TDM slot boundaries against device-time stream tags.
+"""
+
+import threading
+import time
+
+
+def fdma_channel(uav_id, num_channels):
+    """Polyphase channelizer output assigned to *uav_id* in FDMA mode.
+
+    Channel 0 (DC, LO leakage) and, for even *num_channels*, the Nyquist
+    channel num_channels/2 are never assigned; the rest go out in order
+    1, 2, ..., num_channels-1.
+    """
+    usable = [c for c in range(1, num_channels) if 2 * c != num_channels]
+    if not 0 <= uav_id < len(usable):
+        raise ValueError(f"FDMA with {num_channels} channels supports at most "
+                         f"{len(usable)} UAVs (uav_id={uav_id})")
+    return usable[uav_id]
+
+
+def fdma_offset(uav_id, samp_rate, num_channels):
+    """Baseband centre frequency (Hz) of *uav_id*'s FDMA channel."""
+    channel = fdma_channel(uav_id, num_channels)
+    if 2 * channel > num_channels:
+        channel -= num_channels
+    return channel * samp_rate / num_channels
+
+
+def estimate_clock_offset(usrp, reads=10):
+    """Estimate host wall-clock time minus USRP device time, in seconds.
+
+    rx_time and tx_time tags carry device time, while TDM schedules run on
+    the host clock.  The read with the shortest host round trip is kept.
+    """
+    best_rtt, offset = None, 0.0
+    for _ in range(reads):
+        t0 = time.time()
+        dev = usrp.get_time_now().get_real_secs()
+        t1 = time.time()
+        if best_rtt is None or t1 - t0 < best_rtt:
+            best_rtt, offset = t1 - t0, 0.5 * (t0 + t1) - dev
+    return offset
+
+
+class ClockTracker(object):
+    """Host-minus-device clock offset of *usrp*, kept current.
+
+    set_time_unknown_pps does not discipline the device clock, so it drifts
+    from the host clock by a few ppm, tens of milliseconds over a flight.
+    update() re-estimates the offset once every *interval* seconds (0 keeps
+    the first estimate); call it as often as convenient, it returns the
+    current offset at once when no estimate is due.  Without a *usrp* the
+    offset stays at *offset*.
+    """
+
+    def __init__(self, usrp, interval=5.0, offset=0.0, reads=10):
+        self.usrp = usrp
+        self.interval = interval
+        self.reads = reads
+        self.offset = self.initial = (estimate_clock_offset(usrp, reads)
+                                      if usrp is not None else offset)
+        self.updates = 0
+        self._start = self._last = time.time()
+        self._lock = threading.Lock()
+
+    def update(self):
+        """Current offset, re-estimated first if *interval* has passed."""
+        if (self.usrp is None or self.interval <= 0
+                or time.time() - self._last < self.interval
+                or not self._lock.acquire(blocking=False)):
+            return self.offset
+        try:
+            self.offset = estimate_clock_offset(self.usrp, self.reads)
+            self._last = time.time()
+            self.updates += 1
+        finally:
+            self._lock.release()
+        return self.offset
+
+    def drift(self):
+        """Change of the offset since the first estimate, in seconds."""
+        return self.offset - self.initial
+
+    def drift_ppm(self):
+        """Average drift rate since the first estimate, in ppm."""
+        elapsed = self._last - self._start
+        return 1e6 * self.drift() / elapsed if elapsed > 0 else 0.0
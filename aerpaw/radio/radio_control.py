@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Local control socket for a resident CSwSNRTX/CSwSNRRX flowgraph.
+
+With ``--control PATH`` the TX/RX scripts keep their flowgraph running and
+serve a line protocol on the Unix stream socket PATH instead of waiting for
+Enter, so a new experiment only retunes the warm flowgraph.  One command
+per line, one JSON reply per line::
+
+    get NAME               -> {"ok": true, "value": ...}
+    set NAME VALUE         -> {"ok": true, "value": <new value>}
+    status                 -> {"ok": true, "value": {NAME: value, ...}}
+    <command> [ARGS...]    -> script specific, e.g. start_logging DIR
+    quit                   -> {"ok": true}; the script shuts down
+
+NAME is one of the parameters the script exposes (get_NAME/set_NAME on the
+top block).  Run this module as a client::
+
+    python3 radio_control.py /tmp/cswsnr_rx.sock set freq 3.4e9
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+from argparse import ArgumentParser
+
+
+def parse_value(text):
+    """int, float or eng-notation ('3.32G', '250k') value of *text*."""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    scale = {'k': 1e3, 'M': 1e6, 'G': 1e9, 'm': 1e-3, 'u': 1e-6}
+    if text and text[-1] in scale:
+        return float(text[:-1]) * scale[text[-1]]
+    return text
+
+
+class ControlServer(object):
+    """Serve get/set of *params* and the extra *commands* (name ->
+    callable taking the string arguments) of top block *tb* on the Unix
+    socket *path*.  Commands run one at a time, in the serving thread."""
+
+    def __init__(self, tb, path, params, commands=None):
+        self.tb = tb
+        self.path = path
+        self.params = list(params)
+        self.commands = dict(commands or {})
+        self._stop = threading.Event()
+        if os.path.exists(path):
+            os.unlink(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(path)
+        self._sock.listen(4)
+        self._sock.settimeout(0.5)
+
+    def handle(self, line):
+        """Reply dict for one command line."""
+        words = line.split()
+        if not words:
+            return {'ok': False, 'error': 'empty command'}
+        cmd, args = words[0], words[1:]
+        try:
+            if cmd == 'quit':
+                self._stop.set()
+                return {'ok': True}
+            if cmd == 'status':
+                return {'ok': True, 'value': {p: getattr(self.tb, 'get_' + p)() for p in self.params}}
+            if cmd in ('get', 'set'):
+                if not args or args[0] not in self.params:
+                    return {'ok': False, 'error': f"unknown parameter; one of {self.params}"}
+                if cmd == 'set':
+                    if len(args) != 2:
+                        return {'ok': False, 'error': 'usage: set NAME VALUE'}
+                    getattr(self.tb, 'set_' + args[0])(parse_value(args[1]))
+                return {'ok': True, 'value': getattr(self.tb, 'get_' + args[0])()}
+            if cmd in self.commands:
+                return {'ok': True, 'value': self.commands[cmd](*args)}
+            return {'ok': False, 'error': f"unknown command '{cmd}'"}
+        except Exception as e:
+            return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+
+    def _serve_connection(self, conn):
+        with conn, conn.makefile('rwb') as f:
+            for raw in f:
+                reply = self.handle(raw.decode('utf-8', 'replace'))
+                f.write((json.dumps(reply, default=str) + '\n').encode('utf-8'))
+                f.flush()
+                if self._stop.is_set():
+                    return
+
+    def serve_forever(self):
+        """Serve until a ``quit`` command or stop()."""
+        print(f"[CTRL] Listening on {self.path}")
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                try:
+                    self._serve_connection(conn)
+                except OSError:
+                    pass
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self._sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def request(path, line, timeout=5.0):
+    """Send one command line to the control socket at *path*; returns the
+    decoded reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        with sock.makefile('rwb') as f:
+            f.write((line.strip() + '\n').encode('utf-8'))
+            f.flush()
+            return json.loads(f.readline())
+
+
+def argument_parser():
+    description = 'Send one command to a CSwSNRTX/CSwSNRRX control socket'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "path", type=str,
+        help="Control socket given to --control")
+    parser.add_argument(
+        "command", nargs='+',
+        help="Command and arguments, e.g. set freq 3.4e9")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    reply = request(options.path, ' '.join(options.command))
+    print(json.dumps(reply))
+    sys.exit(0 if reply.get('ok') else 1)
+
+
+if __name__ == '__main__':
+    main()
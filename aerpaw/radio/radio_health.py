@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Health and throughput endpoint of a running CSwSNRTX/CSwSNRRX flowgraph.
+
+With ``--metrics ADDRESS`` the TX/RX scripts sample their flowgraph every
+second and serve the latest snapshot as text, one gauge per line in the
+Prometheus exposition format.  ADDRESS is ``http:HOST:PORT`` (any GET, e.g.
+``curl http://127.0.0.1:9100/metrics``) or ``unix:PATH`` (connect and read
+until EOF)::
+
+    cswsnr_samples_total                      radio samples through the source/sink
+    cswsnr_samples_per_second                 over the last sampling interval
+    cswsnr_overflows_total                    RX 'O' (a new rx_time tag mid-stream)
+    cswsnr_underflows_total                   TX 'U' (USRP async underflow events)
+    cswsnr_late_total                         TX bursts the USRP got too late
+    cswsnr_clock_offset_seconds               host minus USRP time, latest estimate
+    cswsnr_clock_drift_seconds                change of that offset since startup
+    cswsnr_clock_drift_ppm                    average drift rate since startup
+    cswsnr_sink_backlog_bytes                 RX metrics not yet taken by the writer process
+    cswsnr_sink_dropped_total                 RX metric blocks or datagrams dropped
+    cswsnr_tdm_duty{tx_uav_id="k"}            frame share UAV k transmits in
+    cswsnr_block_busy{block="..."}            work time / wall time, per block
+    cswsnr_block_work_seconds_total{block=...}
+    cswsnr_block_buffer_full{block="..."}     average output (sinks: input) buffer fullness
+
+The block gauges come from the GNU Radio performance counters, which the
+scripts switch on when --metrics is given.  Run this module to print the
+snapshot of a Unix socket endpoint::
+
+    python3 radio_health.py unix:/tmp/cswsnr_rx.metrics
+"""
+
+import os
+import socket
+import socketserver
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy
+import pmt
+from gnuradio import gr
+
+import radio_performance
+
+RX_TIME = pmt.intern('rx_time')
+ASYNC_MSGS = pmt.intern('async_msgs')
+EVENT_CODE = pmt.intern('event_code')
+# uhd::async_metadata_t event codes
+EVENT_UNDERFLOW = 0x2
+EVENT_UNDERFLOW_IN_PACKET = 0x4
+EVENT_TIME_ERROR = 0x10
+
+
+def enable_perf_counters():
+    """Switch the GNU Radio performance counters on for blocks created from
+    now on (their state is read when a block is constructed)."""
+    os.environ.setdefault('GR_CONF_PERFCOUNTERS_ON', 'True')
+
+
+class RxOverflowCounter(gr.sync_block):
+    """Sink on the USRP source output counting overflows: the source tags
+    the first sample after every overflow with a fresh rx_time, so every
+    rx_time tag after the first is one 'O'.  Only tags are read."""
+
+    def __init__(self):
+        gr.sync_block.__init__(
+            self,
+            name='RX Overflow Counter',
+            in_sig=[numpy.complex64],
+            out_sig=None)
+        self._tags = 0
+
+    @property
+    def overflows(self):
+        return max(self._tags - 1, 0)
+
+    def work(self, input_items, output_items):
+        n = len(input_items[0])
+        self._tags += len(self.get_tags_in_window(0, 0, n, RX_TIME))
+        return n
+
+
+class UhdAsyncCounter(gr.basic_block):
+    """Count the underflow and late-burst events a USRP sink posts on its
+    ``async_msgs`` message port."""
+
+    def __init__(self):
+        gr.basic_block.__init__(
+            self,
+            name='UHD Async Counter',
+            in_sig=None,
+            out_sig=None)
+        self.message_port_register_in(ASYNC_MSGS)
+        self.set_msg_handler(ASYNC_MSGS, self.handle_msg)
+        self.underflows = 0
+        self.late = 0
+
+    def handle_msg(self, msg):
+        try:
+            code = pmt.to_long(pmt.dict_ref(msg, EVENT_CODE, pmt.from_long(0)))
+        except Exception:
+            return
+        if code & (EVENT_UNDERFLOW | EVENT_UNDERFLOW_IN_PACKET):
+            self.underflows += 1
+        if code & EVENT_TIME_ERROR:
+            self.late += 1
+
+
+def block_stats(tb):
+    """(name, work seconds, buffer fullness) per block from the performance
+    counters; blocks without counters are skipped."""
+    try:
+        tps = gr.high_res_timer_tps()
+    except AttributeError:
+        tps = 1e9
+    rows = []
+    for name, b in radio_performance.iter_blocks(tb):
+        try:
+            work = b.pc_work_time_total() / tps
+        except (AttributeError, RuntimeError):
+            continue
+        full = None
+        for getter in ('pc_output_buffers_full_avg', 'pc_input_buffers_full_avg'):
+            try:
+                full = float(getattr(b, getter)(0))
+                break
+            except (AttributeError, RuntimeError, IndexError, TypeError):
+                pass
+        rows.append((name, work, full))
+    return rows
+
+
+class HealthMonitor(object):
+    """Sample top block *tb* every *interval* seconds and serve the text
+    snapshot on *address*.  *tb* provides ``health()``, a dict of
+    ``samples_total`` and optionally ``overflows``, ``underflows``,
+    ``late``, ``sink_backlog_bytes``, ``sink_dropped``, ``clock_offset``,
+    ``clock_drift``, ``clock_drift_ppm`` and ``tdm_duty`` ({uav_id: fraction})."""
+
+    def __init__(self, tb, address, interval=1.0):
+        self.tb = tb
+        self.address = address
+        self.interval = interval
+        self._text = ''
+        self._prev = None
+        self._stop = threading.Event()
+        self._server = self._make_server(address)
+        self._threads = [threading.Thread(target=self._server.serve_forever, daemon=True),
+                         threading.Thread(target=self._sample_loop, daemon=True)]
+
+    def _make_server(self, address):
+        monitor = self
+
+        if address.startswith('http:'):
+            host, _, port = address[5:].rpartition(':')
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = monitor.text().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            return HTTPServer((host or '127.0.0.1', int(port)), Handler)
+
+        if address.startswith('unix:') or address.startswith('/'):
+            path = address[5:] if address.startswith('unix:') else address
+            if os.path.exists(path):
+                os.unlink(path)
+
+            class StreamHandler(socketserver.BaseRequestHandler):
+                def handle(self):
+                    self.request.sendall(monitor.text().encode('utf-8'))
+
+            return socketserver.UnixStreamServer(path, StreamHandler)
+
+        raise ValueError(f"Unknown metrics address '{address}'; expected http:HOST:PORT or unix:PATH")
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        print(f"[HEALTH] Serving flowgraph metrics on {self.address}")
+
+    def text(self):
+        return self._text
+
+    def _sample_loop(self):
+        while True:
+            try:
+                self._text = self.sample()
+            except Exception as e:
+                self._text = f'# sampling failed: {type(e).__name__}: {e}\n'
+            if self._stop.wait(self.interval):
+                return
+
+    def sample(self):
+        """Take one snapshot; returns its text."""
+        now = time.monotonic()
+        health = self.tb.health()
+        blocks = block_stats(self.tb)
+        prev, self._prev = self._prev, (now, health.get('samples_total', 0), dict(
+            (name, work) for name, work, _ in blocks))
+        lines = [f"cswsnr_samples_total {health.get('samples_total', 0)}"]
+        if prev is not None and now > prev[0]:
+            dt = now - prev[0]
+            lines.append(f"cswsnr_samples_per_second {(health.get('samples_total', 0) - prev[1]) / dt:.1f}")
+        for key in ('overflows', 'underflows', 'late', 'sink_dropped'):
+            if key in health:
+                lines.append(f"cswsnr_{key}_total {health[key]}")
+        if 'sink_backlog_bytes' in health:
+            lines.append(f"cswsnr_sink_backlog_bytes {health['sink_backlog_bytes']}")
+        for key in ('clock_offset', 'clock_drift'):
+            if key in health:
+                lines.append(f"cswsnr_{key}_seconds {health[key]:.9f}")
+        if 'clock_drift_ppm' in health:
+            lines.append(f"cswsnr_clock_drift_ppm {health['clock_drift_ppm']:.3f}")
+        for tx, duty in sorted(health.get('tdm_duty', {}).items()):
+            lines.append(f'cswsnr_tdm_duty{{tx_uav_id="{tx}"}} {duty:.4f}')
+        for name, work, full in blocks:
+            label = f'{{block="{name}"}}'
+            lines.append(f"cswsnr_block_work_seconds_total{label} {work:.6f}")
+            if prev is not None and name in prev[2]:
+                lines.append(f"cswsnr_block_busy{label} {(work - prev[2][name]) / (now - prev[0]):.4f}")
+            if full is not None:
+                lines.append(f"cswsnr_block_buffer_full{label} {full:.4f}")
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+        if isinstance(self._server, socketserver.UnixStreamServer) and os.path.exists(self._server.server_address):
+            os.unlink(self._server.server_address)
+
+
+def read(address, timeout=5.0):
+    """Snapshot text of the Unix socket endpoint at *address*."""
+    path = address[5:] if address.startswith('unix:') else address
+    chunks = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            chunks.append(data)
+    return b''.join(chunks).decode('utf-8')
+
+
+def argument_parser():
+    description = 'Print the metrics snapshot of a CSwSNRTX/CSwSNRRX --metrics unix: endpoint'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "address", type=str,
+        help="Endpoint given to --metrics, unix:PATH")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    print(read(options.address), end='')
+
+
+if __name__ == '__main__':
+    main()
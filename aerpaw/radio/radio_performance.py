@@ -0,0 +1,185 @@
+"""
+Per-host performance profile of the CSwSNRTX/CSwSNRRX flowgraphs.
+
+The ``performance:`` section of client.yaml (each key overridden by the
+matching command line flag) sets::
+
+    performance:
+      scheduler: tpb              # tpb (thread per block) or sts (single thread)
+      max_noutput_items: 0        # cap on items per work() call, 0 = GNU Radio default
+      max_output_buffer: 0        # cap on every block's output buffer in items, 0 = default
+      fft_threads: 0              # PN correlator FFT workers per chain, 0 = all cores
+      moving_average_max_iter: 4000
+      affinity:                   # block name pattern -> CPU list, first match wins
+        "uhd_*": [0]
+        "chains0.*": [1]
+        "*": [2, 3]
+
+Block names are the top block attribute names, with hierarchical blocks and
+block lists expanded as in ``chains0.epy_block_0`` or ``metric_sinks3``.
+Settings are applied before the flowgraph starts, and :func:`report` prints
+what is in effect.
+"""
+
+import fnmatch
+import os
+
+from gnuradio import gr
+
+SCHEDULERS = ('tpb', 'sts')
+
+DEFAULTS = {
+    'scheduler': 'tpb',
+    'max_noutput_items': 0,
+    'max_output_buffer': 0,
+    'fft_threads': 0,
+    'moving_average_max_iter': 4000,
+    'affinity': {},
+}
+
+
+def parse_cpus(text):
+    """CPU list from '2', '1-3' or '0,2-3' (or a YAML list)."""
+    if isinstance(text, (list, tuple)):
+        return [int(c) for c in text]
+    if isinstance(text, int):
+        return [text]
+    cpus = []
+    for part in str(text).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        lo, _, hi = part.partition('-')
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def parse_affinity(text):
+    """``{pattern: cpus}`` from ``'uhd_*=0;*=1-3'``."""
+    affinity = {}
+    for item in text.split(';'):
+        if not item.strip():
+            continue
+        pattern, sep, cpus = item.partition('=')
+        if not sep:
+            raise ValueError(f"Bad affinity '{item}'; expected PATTERN=CPUS")
+        affinity[pattern.strip()] = parse_cpus(cpus)
+    return affinity
+
+
+def add_arguments(parser):
+    """Add the performance flags to a script's argument parser."""
+    parser.add_argument(
+        "--scheduler", dest="scheduler", choices=SCHEDULERS, default=None,
+        help="GNU Radio scheduler: thread per block or single threaded "
+             "[default: tpb or performance.scheduler from client.yaml]")
+    parser.add_argument(
+        "--max-noutput-items", dest="max_noutput_items", type=int, default=None,
+        help="Cap on items per work() call, 0 for the GNU Radio default "
+             "[default: performance.max_noutput_items from client.yaml]")
+    parser.add_argument(
+        "--max-output-buffer", dest="max_output_buffer", type=int, default=None,
+        help="Cap on every block's output buffer in items, 0 for the default "
+             "[default: performance.max_output_buffer from client.yaml]")
+    parser.add_argument(
+        "--fft-threads", dest="fft_threads", type=int, default=None,
+        help="FFT workers of each PN correlator, 0 for all cores "
+             "[default: performance.fft_threads from client.yaml]")
+    parser.add_argument(
+        "--affinity", dest="affinity", type=parse_affinity, default=None,
+        metavar="PATTERN=CPUS[;...]",
+        help="CPU affinity of the blocks whose names match PATTERN, e.g. "
+             "'uhd_*=0;*=1-3' [default: performance.affinity from client.yaml]")
+    return parser
+
+
+def resolve(options, cfg):
+    """Effective profile from the command line *options* (flags left None
+    fall back to *cfg*'s ``performance`` section, then DEFAULTS)."""
+    perf_cfg = cfg.get('performance') or {}
+    profile = {}
+    for key, default in DEFAULTS.items():
+        value = getattr(options, key, None)
+        if value is None:
+            value = perf_cfg.get(key, default)
+        profile[key] = value
+    profile['scheduler'] = str(profile['scheduler']).lower()
+    if profile['scheduler'] not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{profile['scheduler']}'; expected tpb or sts")
+    for key in ('max_noutput_items', 'max_output_buffer', 'fft_threads', 'moving_average_max_iter'):
+        profile[key] = int(profile[key])
+    profile['affinity'] = {str(p): parse_cpus(c) for p, c in (profile['affinity'] or {}).items()}
+    return profile
+
+
+def iter_blocks(root):
+    """(name, block) for every leaf block reachable from *root*'s
+    attributes, expanding hierarchical blocks and lists of blocks (or of
+    (key, block) pairs like CSwSNRRX.chains)."""
+    seen = set()
+
+    def walk(obj, prefix):
+        for name, blk in sorted(vars(obj).items()):
+            if isinstance(blk, list):
+                items = [(f'{name}{i}', b[-1] if isinstance(b, tuple) else b)
+                         for i, b in enumerate(blk)]
+            else:
+                items = [(name, blk)]
+            for label, b in items:
+                if id(b) in seen:
+                    continue
+                if isinstance(b, gr.hier_block2):
+                    seen.add(id(b))
+                    yield from walk(b, f'{prefix}{label}.')
+                elif hasattr(b, 'set_processor_affinity'):
+                    seen.add(id(b))
+                    yield prefix + label, b
+    yield from walk(root, '')
+
+
+def apply(tb, profile):
+    """Apply *profile* to top block *tb*; call before tb.start().  Returns
+    the {name: cpus} affinities that were set."""
+    # Read by the top block when it starts
+    os.environ['GR_SCHEDULER'] = profile['scheduler'].upper()
+    pinned = {}
+    for name, blk in iter_blocks(tb):
+        if profile['max_output_buffer'] > 0:
+            try:
+                blk.set_max_output_buffer(profile['max_output_buffer'])
+            except (AttributeError, RuntimeError):
+                pass
+        if profile['fft_threads'] > 0 and hasattr(blk, 'set_nthreads'):
+            blk.set_nthreads(profile['fft_threads'])
+        for pattern, cpus in profile['affinity'].items():
+            if fnmatch.fnmatchcase(name, pattern):
+                if cpus:
+                    blk.set_processor_affinity(cpus)
+                    pinned[name] = cpus
+                break
+    return pinned
+
+
+def start(tb, profile):
+    """tb.start() honouring the profile's max_noutput_items."""
+    if profile['max_noutput_items'] > 0:
+        tb.start(profile['max_noutput_items'])
+    else:
+        tb.start()
+
+
+def report(tb, profile, pinned, tag):
+    """Print the effective settings of *tb* under log prefix *tag*."""
+    fft = sorted({blk.nthreads for _, blk in iter_blocks(tb) if hasattr(blk, 'nthreads')})
+    settings = [f"scheduler={profile['scheduler']}", f"cpus={os.cpu_count()}",
+                f"max_noutput_items={profile['max_noutput_items'] or 'default'}",
+                f"max_output_buffer={profile['max_output_buffer'] or 'default'}"]
+    if fft:
+        settings.append(f"fft_threads={','.join(map(str, fft))}")
+    if hasattr(tb, 'moving_average_max_iter'):
+        settings.append(f"moving_average_max_iter={tb.moving_average_max_iter}")
+    print(f"[{tag}] Performance: {', '.join(settings)}")
+    if not pinned:
+        print(f"[{tag}] Performance: no CPU affinity set")
+    for name, cpus in sorted(pinned.items()):
+        print(f"[{tag}]   {name} -> cpus {','.join(map(str, cpus))}")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Adaptive TDM: drop transmitters no receiver hears from the schedule.
+
+``monitor`` subscribes to the live slot records of every CSwSNRRX
+(``--publish udp:0.0.0.0:PORT`` on each RX, see metric_stream.py).  A
+transmitter is heard in a frame when some receiver's record for its slot has
+--metric at or above --threshold.  Once a transmitter holding slots in the
+current layout has gone unheard for --silent-frames frames, the monitor
+publishes a layout (tdm_schedule.publish) in which its slots go to the live
+transmitters in turn, so the frame keeps its length and the live UAVs
+measure more often.  After --retry seconds a dropped transmitter gets its
+slots back; if it is still silent it is dropped again::
+
+    python3 tdm_liveness.py monitor /root/tdm_schedule.json \\
+        --rx udp:10.0.0.1:5600,udp:10.0.0.2:5600,udp:10.0.0.3:5600 \\
+        --push udp:10.0.0.1:5610,udp:10.0.0.2:5610,udp:10.0.0.3:5610 \\
+        --num-uavs 3 --static-slot-duration 0.5 --static-guard-interval 0.05
+
+Run one monitor for the whole fleet.  Its schedule file is the master copy:
+it is sent as one datagram to every --push address each --push-interval
+seconds, and on every radio host ``follow`` writes what it receives to the
+schedule file the TX and RX poll (client.yaml tdm.schedule_file)::
+
+    python3 tdm_liveness.py follow /root/tdm_schedule.json --listen udp:0.0.0.0:5610
+
+A new layout takes effect --lead seconds after it is published, so several
+pushes reach each host before its epoch; a host that misses all of them
+switches late and measures the wrong transmitter until the next push.
+"""
+
+import json
+import math
+import os
+import queue
+import socket
+import threading
+import time
+from argparse import ArgumentParser
+
+import numpy
+
+from metric_stream import MAX_DATAGRAM, parse_address, subscribe
+from tdm_schedule import MAX_SLOTS, TdmSchedule, publish
+
+
+def _address_list(text):
+    return [a.strip() for a in text.split(',') if a.strip()]
+
+
+def reassign(slots, dead):
+    """*slots* with every slot of a *dead* UAV given to the live UAVs in
+    turn (in order of their first slot), or None if no UAV is live."""
+    live = [tx for tx in dict.fromkeys(slots) if tx not in dead]
+    if not live:
+        return None
+    spare = 0
+    out = []
+    for tx in slots:
+        if tx in dead:
+            tx = live[spare % len(live)]
+            spare += 1
+        out.append(tx)
+    return out
+
+
+class LivenessMonitor(object):
+    """Track which transmitters the receivers hear and publish a layout
+    without the silent ones.
+
+    *schedule* reads the schedule file the monitor publishes to, and
+    *static* is the (num_uavs, slot_duration, guard_interval) of the TX/RX
+    static layout.  The layout in effect when the monitor starts is the full
+    one every published layout is derived from.  Feed receiver records to
+    add() and call tick() at least once a slot.
+    """
+
+    def __init__(self, schedule, static, silent_frames=5, retry=60.0, lead=3.0, now=None):
+        self.schedule = schedule
+        self.static = static
+        self.silent_frames = silent_frames
+        self.retry = retry
+        self.lead = lead
+        now = time.time() if now is None else now
+        self.full = dict(self.schedule.active(now))
+        # UAV ID -> host time it was dropped
+        self.dead = {}
+        # UAV ID -> last frame it was heard in (or its slots started)
+        start = self.frame(now)
+        self._heard = {tx: start for tx in self.full['slots']}
+
+    def frame(self, t):
+        return int(self.schedule.slot_keys(t) // MAX_SLOTS)
+
+    def add(self, records, heard):
+        """Note the transmitters of the metric *records* (metric_stream
+        records) whose *heard* mask is set."""
+        for tx, frame in zip(records['tx_uav_id'][heard], records['frame'][heard]):
+            tx, frame = int(tx), int(frame)
+            if frame > self._heard.get(tx, frame - 1):
+                self._heard[tx] = frame
+
+    def tick(self, now=None):
+        """Publish a new layout if a transmitter went silent or is due a
+        retry.  Returns the new epoch, or None."""
+        now = time.time() if now is None else now
+        # Records of the newest frame may still be on their way
+        done = self.frame(now - self.schedule.active(now)['frame_len'])
+        dead = {tx: t for tx, t in self.dead.items()
+                if not (self.retry and now - t >= self.retry)}
+        for tx in dict.fromkeys(self.schedule.active(now)['slots']):
+            if tx not in dead and done - self._heard.get(tx, done) >= self.silent_frames:
+                dead[tx] = now
+        if dead.keys() == self.dead.keys():
+            return None
+        slots = reassign(self.full['slots'], dead)
+        if slots is None:
+            # Nothing is heard at all; a receiver outage is more likely
+            # than every transmitter failing, so keep the layout
+            return None
+        epoch = publish(self.schedule.path, slots, self.full['slot_duration'],
+                        self.full['guard_interval'], *self.static, lead=self.lead, now=now)
+        # Retried UAVs get --silent-frames frames from the switch-over
+        start = self.frame(epoch)
+        for tx in self.dead.keys() - dead.keys():
+            self._heard[tx] = start
+        dropped = sorted(dead.keys() - self.dead.keys())
+        retried = sorted(self.dead.keys() - dead.keys())
+        self.dead = dead
+        print(f"[TDM] {'dropped ' + str(dropped) + ' ' if dropped else ''}"
+              f"{'retrying ' + str(retried) + ' ' if retried else ''}"
+              f"-> slots={slots} from epoch {epoch:.3f} ({epoch - now:.2f} s from now)")
+        return epoch
+
+
+def push(sock, path, addresses):
+    """Send the schedule file at *path* to every udp *addresses*."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return
+    if len(data) > MAX_DATAGRAM:
+        print(f"[TDM] Warning: {path} is {len(data)} bytes, too large to push")
+        return
+    for address in addresses:
+        try:
+            sock.sendto(data, parse_address(address)[1])
+        except OSError as e:
+            print(f"[TDM] Warning: push to {address} failed: {e}")
+
+
+def monitor(options):
+    static = (options.num_uavs, options.static_slot_duration, options.static_guard_interval)
+    schedule = TdmSchedule(*static, path=options.path)
+    mon = LivenessMonitor(schedule, static, options.silent_frames, options.retry, options.lead)
+    print(f"[TDM] Monitoring {len(options.rx)} receiver(s); full layout slots={mon.full['slots']}, "
+          f"drop after {options.silent_frames} silent frames")
+
+    messages = queue.Queue()
+
+    def read():
+        for msg in subscribe(options.rx):
+            messages.put(msg)
+
+    threading.Thread(target=read, name='metric-subscriber', daemon=True).start()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    schemas = {}
+    next_push = 0.0
+    while True:
+        try:
+            msg = messages.get(timeout=options.tick)
+        except queue.Empty:
+            msg = None
+        if msg is not None and msg[0] == 'schema':
+            schemas.update(msg[1])
+        elif msg is not None:
+            _, stream, records = msg
+            columns = schemas.get(stream, [])
+            if stream == options.stream and options.metric in columns:
+                values = records['values'][:, columns.index(options.metric) - 4]
+                mon.add(records, numpy.isfinite(values) & (values >= options.threshold))
+        if mon.tick() is not None:
+            next_push = 0.0
+        if options.push and time.monotonic() >= next_push:
+            push(sock, options.path, options.push)
+            next_push = time.monotonic() + options.push_interval
+
+
+def follow(options):
+    family, sockaddr = parse_address(options.listen)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.bind(sockaddr)
+    print(f"[TDM] Writing schedules received on {options.listen} to {options.path}")
+    while True:
+        data = sock.recv(MAX_DATAGRAM + 64)
+        try:
+            frames = json.loads(data.decode('utf-8'))['frames']
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[TDM] Warning: ignoring datagram: {e}")
+            continue
+        try:
+            with open(options.path, 'rb') as f:
+                if f.read() == data:
+                    continue
+        except OSError:
+            pass
+        tmp = f'{options.path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        # Readers only ever see a complete file
+        os.replace(tmp, options.path)
+        last = frames[-1] if frames else {}
+        print(f"[TDM] Schedule updated: slots={last.get('slots')} "
+              f"from epoch {last.get('epoch', math.nan):.3f}")
+
+
+def argument_parser():
+    description = 'Drop silent transmitters from the TDM schedule and distribute it'
+    parser = ArgumentParser(description=description)
+    modes = parser.add_subparsers(dest='mode', required=True)
+
+    mon = modes.add_parser('monitor', help="Publish layouts without silent transmitters")
+    mon.add_argument(
+        "path", type=str,
+        help="Master copy of the schedule file")
+    mon.add_argument(
+        "--rx", dest="rx", type=_address_list, required=True,
+        help="Comma-separated CSwSNRRX --publish addresses (udp:HOST:PORT)")
+    mon.add_argument(
+        "--push", dest="push", type=_address_list, default=[],
+        help="Comma-separated follow --listen addresses (udp:HOST:PORT)")
+    mon.add_argument(
+        "--num-uavs", dest="num_uavs", type=int, required=True,
+        help="UAVs of the static layout in effect before the file's first epoch")
+    mon.add_argument(
+        "--static-slot-duration", dest="static_slot_duration", type=float, required=True,
+        help="Slot duration in seconds of the static layout (TX/RX --slot-duration)")
+    mon.add_argument(
+        "--static-guard-interval", dest="static_guard_interval", type=float, required=True,
+        help="Guard interval in seconds of the static layout (TX/RX --guard-interval)")
+    mon.add_argument(
+        "--stream", dest="stream", type=str, default='Metrics',
+        help="Metric stream to watch [default=%(default)r]")
+    mon.add_argument(
+        "--metric", dest="metric", type=str, default='snr_mean',
+        help="Record column that tells a transmitter is heard [default=%(default)r]")
+    mon.add_argument(
+        "--threshold", dest="threshold", type=float, default=3.0,
+        help="Lowest --metric of a heard transmitter [default=%(default)r]")
+    mon.add_argument(
+        "--silent-frames", dest="silent_frames", type=int, default=5,
+        help="Frames without being heard before a transmitter is dropped "
+             "[default=%(default)r]")
+    mon.add_argument(
+        "--retry", dest="retry", type=float, default=60.0,
+        help="Seconds before a dropped transmitter gets its slots back, 0 = "
+             "never [default=%(default)r]")
+    mon.add_argument(
+        "--lead", dest="lead", type=float, default=3.0,
+        help="Minimum seconds from publishing until a layout takes effect "
+             "[default=%(default)r]")
+    mon.add_argument(
+        "--push-interval", dest="push_interval", type=float, default=0.5,
+        help="Seconds between pushes of the schedule file [default=%(default)r]")
+    mon.add_argument(
+        "--tick", dest="tick", type=float, default=0.1,
+        help="Seconds between liveness checks [default=%(default)r]")
+
+    fol = modes.add_parser('follow', help="Write pushed schedules to the local schedule file")
+    fol.add_argument(
+        "path", type=str,
+        help="Schedule file the TX and RX poll (client.yaml tdm.schedule_file)")
+    fol.add_argument(
+        "--listen", dest="listen", type=str, default='udp:0.0.0.0:5610',
+        help="Address to receive schedules on [default=%(default)r]")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    try:
+        if options.mode == 'monitor':
+            monitor(options)
+        else:
+            follow(options)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+TDM schedule shared by the channel sounder transmitter and receiver.
+
+Without a schedule file every UAV owns one fixed slot per frame, as in the
+original wall-clock arithmetic:
+
+    current_slot = floor(utc_time / slot_duration) % num_uavs
+
+A schedule file replaces that with a list of frame layouts, each taking
+effect at its epoch (host wall-clock seconds)::
+
+    {"frames": [
+        {"epoch": 1792348870.0, "slots": [0, 1, 2],
+         "slot_duration": 0.5, "guard_interval": 0.05},
+        {"epoch": 1792348901.5, "slots": [0, 2],
+         "slot_duration": 0.4, "guard_interval": 0.02}
+    ]}
+
+"slots" lists the transmitting UAV of each slot in frame order, so dead UAVs
+can be left out and live ones may appear more than once.  TX and RX poll the
+file and switch layouts at the same epoch.
+
+tdm_liveness.py publishes layouts without the transmitters no receiver
+hears and pushes the file to every host.  Run this module to publish a
+layout by hand at the next frame boundary, e.g.::
+
+    python3 tdm_schedule.py /root/tdm_schedule.json --slots 0,2 --slot-duration 0.4 \
+        --num-uavs 3 --static-slot-duration 0.5 --static-guard-interval 0.05
+
+--num-uavs and the --static-* options describe the layout the TX and RX start
+with (client.yaml tdm section, scenario.csv); boundaries are computed from it
+until the file has a layout of its own.
+"""
+
+import json
+import math
+import os
+import time
+from argparse import ArgumentParser
+
+import numpy
+
+# Slot keys are frame * MAX_SLOTS + slot index (tx_uav_id is an int8)
+MAX_SLOTS = 128
+
+
+class TdmSchedule(object):
+    """Frame layouts in effect over time, optionally reloaded from *path*.
+
+    The layout before the first file epoch (or forever, without a file) is
+    the static one-slot-per-UAV frame of *num_uavs* slots.  The file is
+    re-read when its mtime changes, at most every *poll_interval* seconds;
+    an unreadable file keeps the previous layouts.
+    """
+
+    def __init__(self, num_uavs, slot_duration, guard_interval, path=None, poll_interval=0.1):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._static = self._entry(0.0, list(range(max(num_uavs, 1))), slot_duration, guard_interval)
+        self._entries = self._number([self._static])
+        self._mtime = None
+        self._next_poll = 0.0
+        self.poll()
+
+    @staticmethod
+    def _entry(epoch, slots, slot_duration, guard_interval):
+        slots = [int(s) for s in slots]
+        if len(slots) >= MAX_SLOTS or any(not 0 <= s < MAX_SLOTS for s in slots):
+            raise ValueError(f"TDM slots must be < {MAX_SLOTS} UAV IDs in [0, {MAX_SLOTS})")
+        return {'epoch': float(epoch), 'slots': slots,
+                'slot_duration': float(slot_duration), 'guard_interval': float(guard_interval)}
+
+    @staticmethod
+    def _number(entries):
+        """Add each layout's end time and global number of its first frame."""
+        entries = sorted(entries, key=lambda e: e['epoch'])
+        frame0 = None
+        for i, e in enumerate(entries):
+            e['frame_len'] = e['slot_duration'] * max(len(e['slots']), 1)
+            e['end'] = entries[i + 1]['epoch'] if i + 1 < len(entries) else math.inf
+            if frame0 is None:
+                frame0 = math.floor(e['epoch'] / e['frame_len'])
+            e['frame0'] = frame0
+            if e['end'] != math.inf:
+                frame0 += math.ceil((e['end'] - e['epoch']) / e['frame_len'])
+        return entries
+
+    def poll(self):
+        """Reload the schedule file if it changed; cheap to call often."""
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.path, 'r') as f:
+                frames = json.load(f).get('frames', [])
+            entries = [self._entry(e['epoch'], e['slots'], e['slot_duration'],
+                                   e.get('guard_interval', self._static['guard_interval']))
+                       for e in frames]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"[TDM] Warning: ignoring schedule {self.path}: {e}")
+            return
+        self._mtime = mtime
+        if not entries or entries[0]['epoch'] > 0:
+            entries.insert(0, dict(self._static))
+        # Swap in a new list so concurrent readers see one consistent schedule
+        self._entries = self._number(entries)
+
+    def set_static(self, num_uavs, slot_duration, guard_interval):
+        """Replace the static layout (in effect before the file's first
+        epoch, or always without a file)."""
+        self._static = self._entry(0.0, list(range(max(num_uavs, 1))), slot_duration, guard_interval)
+        entries = [e for e in self._entries if e['epoch'] > 0]
+        self._entries = self._number([dict(self._static)] + entries)
+
+    def entries(self):
+        return self._entries
+
+    def active(self, t):
+        """Layout in effect at host time *t*."""
+        for e in reversed(self._entries):
+            if e['epoch'] <= t:
+                return e
+        return self._entries[0]
+
+    def _locate(self, times):
+        """Per time: layout index, frame number and slot index in frame."""
+        self.poll()
+        entries = self._entries
+        times = numpy.asarray(times, dtype=numpy.float64)
+        epochs = numpy.array([e['epoch'] for e in entries])
+        idx = numpy.clip(numpy.searchsorted(epochs, times, side='right') - 1, 0, len(entries) - 1)
+        epoch = epochs[idx]
+        frame_len = numpy.array([e['frame_len'] for e in entries])[idx]
+        slot_duration = numpy.array([e['slot_duration'] for e in entries])[idx]
+        frame0 = numpy.array([e['frame0'] for e in entries])[idx]
+        rel = times - epoch
+        frame = numpy.floor(rel / frame_len)
+        into_frame = rel - frame * frame_len
+        slot = numpy.floor(into_frame / slot_duration)
+        return entries, idx, (frame0 + frame).astype(numpy.int64), slot, into_frame - slot * slot_duration
+
+    def slot_ids(self, times):
+        """Map host times (seconds, scalar or array) to the TX UAV ID whose
+        slot contains them, or -1 inside the guard interval."""
+        entries, idx, _, slot, into_slot = self._locate(times)
+        ids = numpy.full(numpy.shape(idx), -1, dtype=numpy.int8)
+        for i, e in enumerate(entries):
+            sel = (idx == i) & (into_slot >= e['guard_interval'])
+            if e['slots'] and numpy.any(sel):
+                lut = numpy.array(e['slots'], dtype=numpy.int8)
+                ids[sel] = lut[numpy.minimum(slot[sel].astype(numpy.int64), len(lut) - 1)]
+        return ids
+
+    def slot_keys(self, times):
+        """Globally increasing slot index of host *times*
+        (frame * MAX_SLOTS + slot in frame); key // MAX_SLOTS is the frame."""
+        _, _, frame, slot, _ = self._locate(times)
+        return frame * MAX_SLOTS + slot.astype(numpy.int64)
+
+    def locate(self, times):
+        """Slot geometry of host *times*, guard intervals included: dict of
+        arrays 'owner' and 'prev_owner' (UAV of the slot and of the slot
+        before it, -1 for an empty layout), 'into_slot', 'slot_duration'
+        and 'guard_interval'."""
+        entries, idx, _, slot, into_slot = self._locate(times)
+        slot = slot.astype(numpy.int64)
+        owner = numpy.full(numpy.shape(idx), -1, dtype=numpy.int64)
+        prev_owner = numpy.full(numpy.shape(idx), -1, dtype=numpy.int64)
+        for i, e in enumerate(entries):
+            sel = idx == i
+            if e['slots'] and numpy.any(sel):
+                lut = numpy.array(e['slots'], dtype=numpy.int64)
+                k = numpy.minimum(slot[sel], len(lut) - 1)
+                owner[sel] = lut[k]
+                prev_owner[sel] = lut[(k - 1) % len(lut)]
+        return {'owner': owner, 'prev_owner': prev_owner, 'into_slot': into_slot,
+                'slot_duration': numpy.array([e['slot_duration'] for e in entries])[idx],
+                'guard_interval': numpy.array([e['guard_interval'] for e in entries])[idx]}
+
+    def duty(self, t):
+        """{uav_id: fraction of the frame it transmits} of the layout in
+        effect at host time *t*, guard intervals excluded."""
+        e = self.active(t)
+        share = max(e['slot_duration'] - e['guard_interval'], 0.0) / e['frame_len']
+        duty = {}
+        for tx in e['slots']:
+            duty[tx] = duty.get(tx, 0.0) + share
+        return duty
+
+    def next_slot(self, uav_id, after):
+        """(start, end) host times of *uav_id*'s next transmit window -- a
+        slot minus its guard interval -- starting at or after *after*, or
+        None if no known layout gives it a slot."""
+        self.poll()
+        for e in self._entries:
+            if e['end'] <= after or uav_id not in e['slots']:
+                continue
+            t = max(after, e['epoch'])
+            n = math.floor((t - e['epoch']) / e['frame_len'])
+            for frame in (n, n + 1):
+                base = e['epoch'] + frame * e['frame_len']
+                for k, tx in enumerate(e['slots']):
+                    start = base + k * e['slot_duration'] + e['guard_interval']
+                    if tx == uav_id and start >= t and start < e['end']:
+                        return start, min(base + (k + 1) * e['slot_duration'], e['end'])
+        return None
+
+
+def publish(path, slots, slot_duration, guard_interval,
+            num_uavs, static_slot_duration, static_guard_interval, lead=1.0, now=None):
+    """Append a layout to the schedule file at *path*, taking effect at the
+    first frame boundary of the current layout at least *lead* seconds from
+    now.  Layouts not yet in effect by then are replaced; past ones are kept
+    so frame numbers stay the same for every reader.  Returns the new epoch.
+    *now* defaults to the current host time.
+
+    *num_uavs*, *static_slot_duration* and *static_guard_interval* describe
+    the TX/RX static layout in effect before the file's first epoch and must
+    match it for the boundaries to line up; *slot_duration* and
+    *guard_interval* only apply to the published layout."""
+    schedule = TdmSchedule(num_uavs, static_slot_duration, static_guard_interval, path=path)
+    now = time.time() if now is None else now
+    current = schedule.active(now + lead)
+    frames = math.ceil((now + lead - current['epoch']) / current['frame_len'])
+    epoch = current['epoch'] + frames * current['frame_len']
+    keep = [e for e in schedule.entries() if 0 < e['epoch'] < epoch]
+    keep.append(TdmSchedule._entry(epoch, slots, slot_duration, guard_interval))
+    frames = [{k: e[k] for k in ('epoch', 'slots', 'slot_duration', 'guard_interval')}
+              for e in keep]
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'frames': frames}, f, indent=1)
+    # Readers only ever see a complete file
+    os.replace(tmp, path)
+    return epoch
+
+
+def argument_parser():
+    description = 'Publish a TDM frame layout for CSwSNRTX/CSwSNRRX --tdm-schedule'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "path", type=str,
+        help="Schedule file shared with the TX and RX")
+    parser.add_argument(
+        "--slots", dest="slots", required=True,
+        type=lambda s: [int(v) for v in s.split(',') if v.strip()],
+        help="Comma-separated UAV ID of each slot in frame order, e.g. 0,2,1,2")
+    parser.add_argument(
+        "--slot-duration", dest="slot_duration", type=float, default=0.5,
+        help="Slot duration in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--guard-interval", dest="guard_interval", type=float, default=0.05,
+        help="Guard interval in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--num-uavs", dest="num_uavs", type=int, required=True,
+        help="UAVs of the static layout in effect before the file's first epoch")
+    parser.add_argument(
+        "--static-slot-duration", dest="static_slot_duration", type=float, required=True,
+        help="Slot duration in seconds of the static layout (TX/RX --slot-duration)")
+    parser.add_argument(
+        "--static-guard-interval", dest="static_guard_interval", type=float, required=True,
+        help="Guard interval in seconds of the static layout (TX/RX --guard-interval)")
+    parser.add_argument(
+        "--lead", dest="lead", type=float, default=1.0,
+        help="Minimum seconds from now until the layout takes effect "
+             "[default=%(default)r]")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+    epoch = publish(options.path, options.slots, options.slot_duration,
+                    options.guard_interval, options.num_uavs,
+                    options.static_slot_duration, options.static_guard_interval,
+                    options.lead)
+    print(f"[TDM] slots={options.slots} slot={options.slot_duration}s "
+          f"guard={options.guard_interval}s from epoch {epoch:.3f} "
+          f"({epoch - time.time():.2f} s from now)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Offline TDM slot/guard tuning from recorded CSwSNRRX metric logs.
+
+Reads a timestamped metric log (the aligned ``Metrics`` layout, or any CSV
+metric file with a timestamp column, plain or segmented), classifies every
+measurement as signal present or absent from one metric column, and
+estimates per transmitter where its signal really starts and stops relative
+to the nominal TDM slot (slot start + guard interval, slot end).  Positive
+offsets are late.  A measurement integrates one PN period T before its
+timestamp, so edges are taken at the 50% on-fraction point minus T/2.
+
+Every candidate (slot_duration, guard_interval) is then simulated with
+those offsets: a measurement is usable when its whole integration window
+lies inside its own transmitter's signal, after the RX guard, and clear of
+the neighbouring slots' signals.  The report lists per candidate the usable
+fraction of receive time, the per-link measurement rate and whether the
+slots stay clear of each other with *margin* to spare::
+
+    python3 tdm_tuning.py /root/Metrics --num-uavs 3 --slot-duration 0.5 \\
+        --guard-interval 0.05 --slot-durations 0.1,0.2,0.5 --guard-intervals 0.005,0.01,0.05
+"""
+
+import math
+import os
+import sys
+from argparse import ArgumentParser
+
+import numpy
+
+from metric_log import SegmentedFile, open_segment, read_index
+from tdm_schedule import TdmSchedule
+
+
+def _float_list(text):
+    return [float(v) for v in text.split(',') if v.strip()]
+
+
+def load_log(path):
+    """Structured array of a CSV metric log *path*, or of all segments of
+    the segmented log *path*, in time order."""
+    if os.path.isfile(SegmentedFile.index_path(path)):
+        parts = []
+        for row in read_index(path):
+            with open_segment(row['segment']) as f:
+                parts.append(numpy.atleast_1d(numpy.genfromtxt(f, delimiter=',', names=True)))
+        data = numpy.concatenate(parts) if parts else numpy.empty(0)
+    else:
+        data = numpy.atleast_1d(numpy.genfromtxt(path, delimiter=',', names=True))
+    if data.dtype.names is None or 'timestamp' not in data.dtype.names:
+        raise ValueError(f"{path} has no timestamp column; record with "
+                         f"--metrics-layout aligned or a timestamped format")
+    return data[numpy.argsort(data['timestamp'], kind='stable')]
+
+
+def classify(values, threshold=None):
+    """Signal-present mask of *values* and the threshold used.  The default
+    threshold is halfway between the means of the two clusters (signal and
+    noise) of the values, however unequal their sizes."""
+    finite = values[numpy.isfinite(values)]
+    if threshold is None:
+        lo, hi = numpy.percentile(finite, [1, 99]) if len(finite) else (0.0, 0.0)
+        for _ in range(20):
+            threshold = 0.5 * (lo + hi)
+            below, above = finite[finite < threshold], finite[finite >= threshold]
+            if len(below) == 0 or len(above) == 0:
+                break
+            lo, hi = below.mean(), above.mean()
+        threshold = 0.5 * (lo + hi)
+    return numpy.isfinite(values) & (values >= threshold), threshold
+
+
+def estimate_offsets(times, on, schedule, period, bin_width):
+    """{uav_id: (start offset, end offset, samples)} of each transmitter's
+    observed signal against its nominal slot window.  An end offset that
+    reaches the recorded guard is a lower bound and comes back as +inf."""
+    geo = schedule.locate(times)
+    offsets = {}
+    for k in sorted(set(geo['owner'][geo['owner'] >= 0].tolist())):
+        own = geo['owner'] == k
+        nxt = (geo['prev_owner'] == k) & (geo['into_slot'] < geo['guard_interval'])
+        sel = own | nxt
+        if not numpy.any(own):
+            continue
+        # Phase from the start of k's slot; the next slot's guard follows on
+        phase = numpy.where(own, geo['into_slot'], geo['slot_duration'] + geo['into_slot'])[sel]
+        slot = float(numpy.median(geo['slot_duration'][own]))
+        guard = float(numpy.median(geo['guard_interval'][own]))
+        edges = numpy.arange(0.0, slot + guard + bin_width, bin_width)
+        total, _ = numpy.histogram(phase, edges)
+        hits, _ = numpy.histogram(phase, edges, weights=on[sel].astype(float))
+        frac = numpy.where(total > 0, hits / numpy.maximum(total, 1), numpy.nan)
+        centres = 0.5 * (edges[:-1] + edges[1:])
+        present = numpy.flatnonzero(frac >= 0.5)
+        if len(present) == 0:
+            offsets[k] = (math.nan, math.nan, int(own.sum()))
+            continue
+        # The run of consecutive signal bins holding the slot centre (or
+        # else the longest one)
+        runs = numpy.split(present, numpy.flatnonzero(numpy.diff(present) > 1) + 1)
+        mid = numpy.searchsorted(centres, 0.5 * (guard + slot))
+        run = next((r for r in runs if r[0] <= mid <= r[-1]), max(runs, key=len))
+        first, last = run[0], run[-1]
+        start = centres[first] - 0.5 * bin_width - 0.5 * period - guard
+        end = centres[last] + 0.5 * bin_width - 0.5 * period - slot
+        if last == len(centres) - 1:
+            end = math.inf
+        offsets[k] = (start, end, int(own.sum()))
+    return offsets
+
+
+def simulate(slots, slot_duration, guard_interval, offsets, period, margin):
+    """Usable receive time of a frame of *slots* (UAV IDs in order) with the
+    per-UAV (start, end) *offsets*.  Returns (usable fraction, {uav_id:
+    measurements/s}, safe)."""
+    frame = slot_duration * len(slots)
+    usable = {k: 0.0 for k in slots}
+    safe = True
+    for i, k in enumerate(slots):
+        prev, nxt = slots[i - 1], slots[(i + 1) % len(slots)]
+        ds, de = offsets.get(k, (0.0, 0.0, 0))[:2]
+        de_prev = offsets.get(prev, (0.0, 0.0, 0))[1]
+        ds_next = offsets.get(nxt, (0.0, 0.0, 0))[0]
+        if not all(map(math.isfinite, (ds, de, de_prev, ds_next))):
+            safe = False
+            continue
+        if len(slots) > 1 and de_prev > guard_interval + ds - margin:
+            # The previous transmitter is still on when this one starts
+            safe = False
+        lo = max(guard_interval, guard_interval + ds + period, de_prev + period)
+        hi = min(slot_duration, slot_duration + de, slot_duration + guard_interval + ds_next)
+        usable[k] += max(hi - lo, 0.0)
+    if any(u <= 0 for u in usable.values()):
+        safe = False
+    fraction = sum(usable.values()) / frame
+    rates = {k: u / frame / period for k, u in usable.items()}
+    return fraction, rates, safe
+
+
+def argument_parser():
+    description = 'Estimate TDM slot misalignment from RX metric logs and rank slot/guard settings'
+    parser = ArgumentParser(description=description)
+    parser.add_argument(
+        "log", type=str,
+        help="Timestamped metric log (e.g. /root/Metrics), plain or segmented")
+    parser.add_argument(
+        "--num-uavs", dest="num_uavs", type=int, required=True,
+        help="UAVs in the recorded TDM frame")
+    parser.add_argument(
+        "--slot-duration", dest="slot_duration", type=float, default=0.5,
+        help="Recorded slot duration in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--guard-interval", dest="guard_interval", type=float, default=0.05,
+        help="Recorded guard interval in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--tdm-schedule", dest="tdm_schedule", type=str, default=None, metavar="PATH",
+        help="Schedule file in effect during the recording, if any")
+    parser.add_argument(
+        "--metric", dest="metric", type=str, default='quality',
+        help="Column that tells signal from no signal [default=%(default)r]")
+    parser.add_argument(
+        "--threshold", dest="threshold", type=float, default=None,
+        help="Signal-present threshold of --metric [default: halfway between "
+             "its signal and noise levels]")
+    parser.add_argument(
+        "--bin", dest="bin", type=float, default=0.005,
+        help="Phase histogram resolution in seconds [default=%(default)r]")
+    parser.add_argument(
+        "--slot-durations", dest="slot_durations", type=_float_list,
+        default=[0.1, 0.2, 0.25, 0.5, 1.0],
+        help="Candidate slot durations [default: 0.1,0.2,0.25,0.5,1.0]")
+    parser.add_argument(
+        "--guard-intervals", dest="guard_intervals", type=_float_list,
+        default=[0.005, 0.01, 0.02, 0.05, 0.1],
+        help="Candidate guard intervals [default: 0.005,0.01,0.02,0.05,0.1]")
+    parser.add_argument(
+        "--margin", dest="margin", type=float, default=0.005,
+        help="Extra clearance in seconds required between transmitters "
+             "[default=%(default)r]")
+    return parser
+
+
+def main(options=None):
+    if options is None:
+        options = argument_parser().parse_args()
+
+    data = load_log(options.log)
+    if options.metric not in data.dtype.names:
+        print(f"[TUNE] {options.log} has no '{options.metric}' column "
+              f"(columns: {', '.join(data.dtype.names)})")
+        sys.exit(2)
+    times = data['timestamp']
+    period = float(numpy.median(numpy.diff(times))) if len(times) > 1 else 0.0
+    if len(times) < 2 or period <= 0:
+        print(f"[TUNE] Not enough measurements in {options.log}")
+        sys.exit(2)
+    on, threshold = classify(data[options.metric], options.threshold)
+    schedule = TdmSchedule(options.num_uavs, options.slot_duration, options.guard_interval,
+                           path=options.tdm_schedule)
+    duration = times[-1] - times[0]
+    guard_share = numpy.mean(data['tx_uav_id'] < 0) if 'tx_uav_id' in data.dtype.names else math.nan
+    print(f"[TUNE] {len(times)} measurements over {duration:.1f} s, period T={1e3 * period:.1f} ms; "
+          f"{options.metric} >= {threshold:.2f} counts as signal ({100 * on.mean():.1f}%)")
+    print(f"[TUNE] Recorded slot={options.slot_duration}s guard={options.guard_interval}s "
+          f"discarded {100 * guard_share:.1f}% of measurements as guard")
+
+    offsets = estimate_offsets(times, on, schedule, period, options.bin)
+    print(f"[TUNE] Signal edges vs. nominal slot window (positive = late, "
+          f"+-{1e3 * max(options.bin, period / 2):.0f} ms):")
+    for k, (start, end, n) in offsets.items():
+        end_text = f">= {1e3 * options.guard_interval:+.1f}" if math.isinf(end) else f"{1e3 * end:+.1f}"
+        print(f"[TUNE]   tx {k}: start {1e3 * start:+.1f} ms, end {end_text} ms ({n} measurements)")
+
+    slots = schedule.active(times[-1])['slots']
+    rows = []
+    for slot_duration in options.slot_durations:
+        for guard_interval in options.guard_intervals:
+            if guard_interval >= slot_duration:
+                continue
+            fraction, rates, safe = simulate(slots, slot_duration, guard_interval, offsets,
+                                             period, options.margin)
+            rows.append((slot_duration, guard_interval, fraction, rates, safe))
+    rows.sort(key=lambda r: (not r[4], -r[2]))
+
+    print(f"[TUNE] {'slot s':>7} {'guard s':>8} {'usable %':>9} {'min link/s':>11} "
+          f"{'frame s':>8}  safe")
+    for slot_duration, guard_interval, fraction, rates, safe in rows:
+        recorded = (slot_duration == options.slot_duration
+                    and guard_interval == options.guard_interval)
+        print(f"[TUNE] {slot_duration:7.3f} {guard_interval:8.3f} {100 * fraction:9.1f} "
+              f"{min(rates.values()):11.2f} {slot_duration * len(slots):8.2f}  "
+              f"{'yes' if safe else 'NO '}{'  (recorded)' if recorded else ''}")
+    best = next((r for r in rows if r[4]), None)
+    if best is None:
+        print("[TUNE] No candidate is safe; widen --guard-intervals")
+        sys.exit(1)
+    print(f"[TUNE] Best safe setting: slot_duration={best[0]}, guard_interval={best[1]} "
+          f"({100 * best[2]:.1f}% usable, "
+          + ', '.join(f"tx {k} {r:.2f}/s" for k, r in sorted(best[3].items())) + ")")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,17 @@ cp startchannelsounderRXGRC.sh /root/Profiles/ProfileScripts/Radio/Helpers/.
 cp startchannelsounderTXGRC.sh /root/Profiles/ProfileScripts/Radio/Helpers/.
 cp CSwSNRRX.py /root/Profiles/SDR_control/Channel_Sounderv3/.
 cp CSwSNRTX.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp epy_block_0.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp tdm_schedule.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp tdm_liveness.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp radio_channel.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp metric_stream.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp radio_control.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp metric_ring.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp radio_performance.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp radio_health.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp metric_log.py /root/Profiles/SDR_control/Channel_Sounderv3/.
+cp tdm_tuning.py /root/Profiles/SDR_control/Channel_Sounderv3/.
 
 # Replace start scripts
 cp ../scripts/startexperiment.sh /root/.
@@ -10,7 +10,11 @@ function R = readRadioLogs(logPath)
     [~, dirName] = fileparts(logPath);
     rxID = int32(sscanf(dirName, 'uav%d'));
 
-    metrics = ["quality", "snr", "power", "noisefloor", "freqoffset"];
+    metrics = ["quality", "snr", "power", "noisefloor", "freqoffset", "metrics"];
+
+    % Columns of the row-aligned metrics file (CSwSNRRX --metrics-layout aligned)
+    alignedNames = ["snr", "power", "quality", "noise_floor", "freq_offset"];
+    tableNames   = ["SNR", "Power", "Quality", "NoiseFloor", "FreqOffset"];
     logs = dir(logPath);
     logs = logs(endsWith({logs(:).name}, metrics + "_log.txt"));
 
@@ -33,25 +37,54 @@ function R = readRadioLogs(logPath)
         % Skip header lines: some files have 2 tail-error lines + 1 column
         % header ("tx_uav_id,value"), others start with data immediately.
         % Read until a line that looks like a data record, then rewind to it.
+        % Files written with --metric-format aggregate or --metrics-layout
+        % aligned have a header naming their columns.
         dataPattern = '^\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+\] [-\d]';
+        header = string.empty;
         linePos = ftell(fid);
         while true
             line = fgetl(fid);
             if ~ischar(line)
                 break;  % EOF
             end
+            if contains(line, "tx_uav_id")
+                header = split(string(extractAfter(line, "] ")), ",")';
+            end
             if ~isempty(regexp(line, dataPattern, 'once'))
                 fseek(fid, linePos, 'bof');  % rewind to start of this line
                 break;
             end
             linePos = ftell(fid);
         end
-        data = textscan(fid, '[%26c] %d,%f');
-        fclose(fid);
 
-        ts = datetime(cellstr(data{1}), 'InputFormat', 'yyyy-MM-dd HH:mm:ss.SSSSSS');
-        txId = int32(data{2});
-        val = data{3};
+        if isempty(header) || isequal(header, ["tx_uav_id", "value"])
+            % Per-sample records: tx_uav_id,value
+            data = textscan(fid, '[%26c] %d,%f');
+            ts = datetime(cellstr(data{1}), 'InputFormat', 'yyyy-MM-dd HH:mm:ss.SSSSSS');
+            txId = int32(data{2});
+            val = data{3};
+        else
+            % Self-describing records: use each record's own capture time,
+            % and the slot mean for per-slot aggregate records
+            data = textscan(fid, ['[%26c] ', char(strjoin(repmat("%f", 1, numel(header)), ","))]);
+            col = @(name) data{1 + find(header == name)};
+            ts = datetime(col("timestamp"), 'ConvertFrom', 'posixtime', 'TimeZone', 'local');
+            ts.TimeZone = '';
+            txId = int32(col("tx_uav_id"));
+            if metric == "metrics"
+                val = NaN(numel(ts), numel(alignedNames));
+                for m = 1:numel(alignedNames)
+                    if any(header == alignedNames(m))
+                        val(:, m) = col(alignedNames(m));
+                    else
+                        val(:, m) = col(alignedNames(m) + "_mean");
+                    end
+                end
+            else
+                val = col("mean");
+            end
+        end
+        fclose(fid);
 
         n = numel(ts);
         t = table(ts, txId, repmat(rxID, n, 1), NaN(n,1), NaN(n,1), NaN(n,1), NaN(n,1), NaN(n,1), ...
@@ -63,6 +96,7 @@ function R = readRadioLogs(logPath)
             case "quality",    t.Quality = val;
             case "noisefloor", t.NoiseFloor = val;
             case "freqoffset", t.FreqOffset = val;
+            case "metrics",    t{:, tableNames} = val;
         end
 
         R = [R; t]; %#ok<AGROW>
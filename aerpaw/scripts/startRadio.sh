@@ -13,58 +13,21 @@ vals = [v.strip() for v in row[col].strip().split(',') if v.strip()]
 print(len(vals) // 3)
 " 2>/dev/null || echo 0)
 
-cd $PROFILE_DIR"/ProfileScripts/Radio/Helpers"
-
-if [ "$NUM_UAVS" -eq 2 ]; then
-    # Direct 1-to-1 mode: UAV 0 = TX only, UAV 1 = RX only
-    echo "[Radio] 2-UAV direct mode: UAV_ID=$UAV_ID"
-
-    if [ "$UAV_ID" -eq 0 ]; then
-        # TX only (--num-uavs 1 disables TDM muting)
-        screen -S txGRC -dm \
-               bash -c "stdbuf -oL -eL ./startchannelsounderTXGRC.sh --num-uavs 1 \
-               2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_radio_channelsoundertxgrc_log.txt"
-    else
-        # RX only (--num-uavs 1 disables TDM tagging)
-        screen -S rxGRC -dm \
-               bash -c "stdbuf -oL -eL ./startchannelsounderRXGRC.sh --num-uavs 1 \
-               2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_radio_channelsounderrxgrc_log.txt"
+# RX metric logs: single files under /root copied out through tail/tee, or
+# (RX_SEGMENT_SECONDS > 0) indexed, compressed segments written by the RX
+# straight into $RESULTS_DIR (see radio/metric_log.py)
+RX_SEGMENT_SECONDS=${RX_SEGMENT_SECONDS:-0}
+RX_LOG_ARGS=""
+if [ "$RX_SEGMENT_SECONDS" != "0" ]; then
+    RX_LOG_DIR="$RESULTS_DIR/${LOG_PREFIX}_rx_metrics"
+    mkdir -p "$RX_LOG_DIR"
+    RX_LOG_ARGS="--output-dir $RX_LOG_DIR --segment-seconds $RX_SEGMENT_SECONDS"
+fi
 
-        screen -S power -dm \
-               bash -c "stdbuf -oL -eL tail -F /root/Power\
-                2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_power_log.txt"
-
-        screen -S quality -dm \
-               bash -c "stdbuf -oL -eL tail -F /root/Quality\
-                2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_quality_log.txt"
-
-        screen -S snr -dm \
-               bash -c "stdbuf -oL -eL tail -F /root/SNR\
-                2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_snr_log.txt"
-
-        screen -S noisefloor -dm \
-              bash -c "stdbuf -oL -eL tail -F /root/NoiseFloor\
-                2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_noisefloor_log.txt"
-
-        screen -S freqoffset -dm \
-               bash -c "stdbuf -oL -eL tail -F /root/FreqOffset\
-                2>&1 | ts $TS_FORMAT \
-               | tee $RESULTS_DIR/$LOG_PREFIX\_freqoffset_log.txt"
+start_metric_tails() {
+    if [ -n "$RX_LOG_ARGS" ]; then
+        return
     fi
-else
-    # 3+ UAVs: full TDM mode — every node runs both TX and RX
-    echo "[Radio] TDM mode: $NUM_UAVS UAVs, UAV_ID=$UAV_ID"
-
-    screen -S rxGRC -dm \
-           bash -c "stdbuf -oL -eL ./startchannelsounderRXGRC.sh \
-           2>&1 | ts $TS_FORMAT \
-           | tee $RESULTS_DIR/$LOG_PREFIX\_radio_channelsounderrxgrc_log.txt"
 
     screen -S power -dm \
            bash -c "stdbuf -oL -eL tail -F /root/Power\
@@ -91,6 +54,45 @@ else
             2>&1 | ts $TS_FORMAT \
            | tee $RESULTS_DIR/$LOG_PREFIX\_freqoffset_log.txt"
 
+    # Row-aligned metrics (startchannelsounderRXGRC.sh --metrics-layout aligned)
+    screen -S metrics -dm \
+           bash -c "stdbuf -oL -eL tail -F /root/Metrics\
+            2>&1 | ts $TS_FORMAT \
+           | tee $RESULTS_DIR/$LOG_PREFIX\_metrics_log.txt"
+}
+
+cd $PROFILE_DIR"/ProfileScripts/Radio/Helpers"
+
+if [ "$NUM_UAVS" -eq 2 ]; then
+    # Direct 1-to-1 mode: UAV 0 = TX only, UAV 1 = RX only
+    echo "[Radio] 2-UAV direct mode: UAV_ID=$UAV_ID"
+
+    if [ "$UAV_ID" -eq 0 ]; then
+        # TX only (--num-uavs 1 disables TDM muting)
+        screen -S txGRC -dm \
+               bash -c "stdbuf -oL -eL ./startchannelsounderTXGRC.sh --num-uavs 1 \
+               2>&1 | ts $TS_FORMAT \
+               | tee $RESULTS_DIR/$LOG_PREFIX\_radio_channelsoundertxgrc_log.txt"
+    else
+        # RX only (--num-uavs 1 disables TDM tagging)
+        screen -S rxGRC -dm \
+               bash -c "stdbuf -oL -eL ./startchannelsounderRXGRC.sh --num-uavs 1 $RX_LOG_ARGS \
+               2>&1 | ts $TS_FORMAT \
+               | tee $RESULTS_DIR/$LOG_PREFIX\_radio_channelsounderrxgrc_log.txt"
+
+        start_metric_tails
+    fi
+else
+    # 3+ UAVs: full TDM mode — every node runs both TX and RX
+    echo "[Radio] TDM mode: $NUM_UAVS UAVs, UAV_ID=$UAV_ID"
+
+    screen -S rxGRC -dm \
+           bash -c "stdbuf -oL -eL ./startchannelsounderRXGRC.sh $RX_LOG_ARGS \
+           2>&1 | ts $TS_FORMAT \
+           | tee $RESULTS_DIR/$LOG_PREFIX\_radio_channelsounderrxgrc_log.txt"
+
+    start_metric_tails
+
     screen -S txGRC -dm \
            bash -c "stdbuf -oL -eL ./startchannelsounderTXGRC.sh \
            2>&1 | ts $TS_FORMAT \